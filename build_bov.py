@@ -2,23 +2,60 @@
 """
 Build script for 9015 Owensmouth Ave BOV Web Presentation.
 Generates a single self-contained index.html with embedded images, CSS, JS, and Leaflet maps.
+
+Importing this module does no I/O: financial figures are computed when
+first read (build_bov.current_noi, build_bov.model["dcf"]), images when
+the document is built, and NumPy and Pillow are loaded on first use.
 """
 
 import base64
+import functools
+import hashlib
+import importlib.util
+import json
 import os
 import sys
 import io
+import threading
+import time
+import types
+from array import array
 import math
+import re
+
+
+def _lazy_import(name):
+    """Return `name` as a module that is executed on first attribute access,
+    or None when it is not installed."""
+    if name in sys.modules:
+        return sys.modules[name]
+    try:
+        spec = importlib.util.find_spec(name)
+    except ImportError:
+        spec = None
+    if spec is None:
+        return None
+    spec.loader = importlib.util.LazyLoader(spec.loader)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
 
-sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8')
+Image = _lazy_import("PIL.Image")  # Pillow is optional; without it images are embedded at full size
+ImageOps = _lazy_import("PIL.ImageOps")
+np = _lazy_import("numpy")  # NumPy is optional; without it the sensitivity tables are left out
+brotli = _lazy_import("brotli")  # optional; without it --precompress writes only .gz
 
 # ============================================================
 # CONFIGURATION
 # ============================================================
 
-BRAND_DIR = "C:\\Users\\gscher\\LAAA-AI-Prompts\\branding"
-PHOTOS_DIR = "C:\\Users\\gscher\\temp-bov-read\\pictures"
-OUTPUT_FILE = "C:\\Users\\gscher\\9015-owensmouth-bov\\index.html"
+# Override with BOV_BRAND_DIR / BOV_PHOTOS_DIR / BOV_OUTPUT_FILE.
+BRAND_DIR = os.environ.get("BOV_BRAND_DIR", "C:\\Users\\gscher\\LAAA-AI-Prompts\\branding")
+PHOTOS_DIR = os.environ.get("BOV_PHOTOS_DIR", "C:\\Users\\gscher\\temp-bov-read\\pictures")
+OUTPUT_FILE = os.environ.get("BOV_OUTPUT_FILE", "C:\\Users\\gscher\\9015-owensmouth-bov\\index.html")
+CACHE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".bov_cache")
 
 # Photo assignments
 HERO_PHOTO = os.path.join(PHOTOS_DIR, "image (5).jpg")
@@ -34,6 +71,32 @@ HEADSHOT_GLEN = os.path.join(BRAND_DIR, "headshots", "Glen_Scher.png")
 HEADSHOT_FILIP = os.path.join(BRAND_DIR, "headshots", "Filip_Niculete.png")
 HEADSHOT_BLAKE = os.path.join(BRAND_DIR, "headshots", "Blake_Lewitt.png")
 
+# Responsive images: each role is resized to the widths it is displayed at
+# (1x and 2x of its CSS box). IMAGE_FORMAT is "JPEG" or "WEBP"; images with
+# transparency stay PNG when the format is JPEG.
+IMAGE_FORMAT = "JPEG"
+IMAGE_QUALITY = 80
+IMAGE_ROLES = {
+    "cover": {"widths": (640, 1020, 1600), "sizes": "(max-width: 768px) 100vw, 1020px"},
+    "grid": {"widths": (504, 1008), "sizes": "(max-width: 768px) 100vw, 504px"},
+    "logo": {"widths": (320, 640), "sizes": "(max-width: 768px) 200px, 320px"},
+    "headshot": {"widths": (60, 120), "sizes": "60px"},
+}
+# A single-file build carries every srcset candidate inside the document, so by
+# default only the largest variant is embedded. Enable for URL-backed images.
+EMBED_SRCSET = False
+# Embed an image used in several places once and fill in the other <img>
+# tags by script (_SHARED_IMAGES_JS). Those stay blank wherever scripts do
+# not run (email, print previews), so only enable it (--share-images) for a
+# document that is always opened in a browser.
+SHARE_IMAGES = False
+# Images are read, resized and encoded on a bounded thread pool.
+IMAGE_WORKERS = 8
+# --precompress levels. Both are fixed (and gzip's header timestamp is
+# zeroed) so the same document always compresses to the same bytes.
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+
 
 # ============================================================
 # PROPERTY DATA
@@ -234,18 +297,344 @@ REGULATORY = [
     ("Landslide Zone", "No landslide susceptibility"),
 ]
 
+# ============================================================
+# TRANSACTION HISTORY
+# ============================================================
+
+# (date, event, amount or None, notes). The assessed value and the
+# suggested list price rows follow from PROPERTY.
+TRANSACTION_HISTORY = [
+    ("Feb 1986", "Acquisition", None, "Current owner (H & Y Investments LP) acquired property"),
+    ("Dec 2021", "Refinance", 1800000, "Symetra Life Insurance Co."),
+]
+
+# ============================================================
+# NARRATIVE
+# ============================================================
+
+# Property-specific copy by section, as lists of HTML paragraphs ("buyer_profile":
+# list items, "regulatory": condition notes). Each entry is a str.format()
+# template over narrative_figures(), e.g. {price} or {rent_upside}.
+NARRATIVE = {
+    "overview": [
+        "The LAAA Team is proud to present {address}, a {units}-unit townhouse-style multifamily community on an oversized {lot_acres}-acre parcel in the western San Fernando Valley's Canoga Park neighborhood. Constructed in {year_built}, the property comprises approximately {building_sf} square feet across {units} two-story units averaging approximately {unit_sf} square feet each. The unit mix includes {unit_mix}, totaling {bedrooms} bedrooms and {bathrooms} bathrooms. This family-sized product type commands premium rents in a market heavily saturated with studio and one-bedroom inventory and historically experiences lower tenant turnover.",
+        "The property is subject to the City of Los Angeles Rent Stabilization Ordinance (RSO). With nearly 40 years of continuous ownership under the current seller, in-place rents averaging {avg_current_rent}/month are significantly below market levels, where comparable unrenovated {comp_rents}. Costa-Hawkins vacancy decontrol allows rents to reset to market upon unit turnover, creating a phased value-add opportunity that preserves cash flow during execution. Interior renovations at turnover, estimated at $20,000-$30,000 per unit, can drive an additional 25-35% rent premium. Current annual income totals {current_gsr} with a pro forma gross of {market_gsr}, representing {rent_upside} upside.",
+        "<strong>Location.</strong> The subject property is situated in the western San Fernando Valley's Canoga Park neighborhood, a predominantly residential community experiencing significant investment momentum driven by its proximity to the Warner Center employment hub. The immediate area benefits from designation as a Transit Priority Area with access to the Metro G Line Bus Rapid Transit system, currently undergoing a $668M improvement project scheduled for completion in 2027 that will enhance connectivity to the Metro Red Line at North Hollywood. Canoga Park's western 91304 corridor provides convenient freeway access to the US-101 and SR-118. Ongoing area development, including 149 middle-income apartments under construction on Topanga Canyon Boulevard and a recently approved 211-unit mixed-use project on Vanowen Street, signals continued neighborhood evolution. With over 70% renter-occupied housing stock and a median home value of $847,600, the Canoga Park submarket demonstrates durable rental demand and sustained property appreciation.",
+    ],
+    "buyer_profile": [
+        "<strong>Value-Add Investors</strong> &mdash; Deep below-market rents ({rent_upside} upside) with Costa-Hawkins vacancy decontrol provide a clear path to NOI growth through phased rent resets at turnover. Interior renovations at $20K-$30K per unit drive an additional 25-35% rent premium.",
+        "<strong>Development-Oriented Buyers</strong> &mdash; The oversized 1.11-acre parcel is dramatically underbuilt at 18 units/acre. R3-1 zoning supports ~60 units by right, while TOC Tier 3 allows ~90 units with an affordable set-aside&mdash;a 4.5x increase over current density. Stacked incentives (Opportunity Zone, TPA, Housing Element Site) enhance feasibility.",
+        "<strong>1031 Exchange Investors</strong> &mdash; Immediate cash flow from 20 occupied units with {occupancy} occupancy provides stable day-one income while executing a long-term value-add strategy. The family-sized product type experiences lower turnover than studio/1BR inventory.",
+        "<strong>Small Portfolio Investors</strong> &mdash; The {price} price point ({price_per_unit}/unit) offers an accessible entry into the West Valley multifamily market at a basis well below comparable locations, with multiple paths to value creation.",
+    ],
+    "regulatory": [
+        "<strong>RSO & Vacancy Decontrol.</strong> The property is subject to the City of Los Angeles Rent Stabilization Ordinance. Under Costa-Hawkins, landlords may reset rents to market upon voluntary vacancy. With nearly 40 years of continuous ownership, in-place rents are substantially below market, creating significant upside upon turnover. Buyers should also verify the soft-story retrofit status with LADBS, as the property's pre-1978 wood-frame construction and likely tuck-under parking configuration may trigger mandatory retrofit requirements.",
+        "<strong>Flood Zone.</strong> The property carries a FEMA Zone A (100-year flood, contained in channel) designation, which may affect insurance costs. Buyers should obtain a flood insurance quote during due diligence.",
+    ],
+    "history": [
+        "The property has been held by the current ownership entity since February 1986&mdash;approximately 40 years of continuous ownership. The low assessed value of {assessed_value} reflects the Proposition 13 base and confirms long-term hold. The suggested list price of {price} ({price_per_unit}/unit) represents a significant premium to the tax basis, justified by the property's deep below-market rents, oversized lot with exceptional density upside, and multiple layers of development incentives.",
+    ],
+    "sales": [
+        "The subject's suggested pricing at {market_cap} pro forma cap rate reflects its deep below-market rents and exceptional density upside that is not available in the comparable set. Its larger unit sizes (avg. {unit_sf} SF) and family-oriented product type support premium pricing on a per-unit basis.",
+    ],
+    "rents": [
+        "The phased nature of RSO turnover ensures cash flow stability during the value-add execution.",
+    ],
+    "financials": [
+        "The pricing reflects the property's unique combination of immediate cash flow, phased value-add potential, and exceptional long-term density upside through TOC Tier 3 and Opportunity Zone incentives. At {price_per_unit}/unit, the basis is well below comparable West Valley multifamily locations and the replacement cost for family-sized townhome product.",
+    ],
+}
+
 # ============================================================
 # HELPER FUNCTIONS
 # ============================================================
 
+# Image cache layout under CACHE_DIR:
+#   index.json        path -> [size, mtime_ns, sha256]  (stat fast path)
+#   variants.json     variant key -> [width, height, mime]
+#   images/<key>.b64  base64 payload for a file digest or a resized variant
+_image_index = None
+_variant_index = None
+_stored_blobs = set()
+_cache_lock = threading.RLock()
+
+B64_BLOCK = 3 * 64 * 1024  # a multiple of 3, so encoded blocks concatenate cleanly
+COPY_BLOCK = 64 * 1024
+
+
+def _load_json_cache(name):
+    try:
+        with open(os.path.join(CACHE_DIR, name), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _tmp_path(path):
+    """A per-thread temporary name to write `path` through before os.replace()."""
+    return f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+
+
+def _save_json_cache(name, data):
+    cache_path = os.path.join(CACHE_DIR, name)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = _tmp_path(cache_path)
+    with _cache_lock, open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, cache_path)
+
+
+def _load_image_index():
+    global _image_index
+    with _cache_lock:
+        if _image_index is None:
+            _image_index = _load_json_cache("index.json")
+    return _image_index
+
+
+def _load_variant_index():
+    global _variant_index
+    with _cache_lock:
+        if _variant_index is None:
+            _variant_index = _load_json_cache("variants.json")
+    return _variant_index
+
+
+def _blob_path(key):
+    return os.path.join(CACHE_DIR, "images", key + ".b64")
+
+
+def _has_blob(key):
+    if key in _stored_blobs:
+        return True
+    if os.path.exists(_blob_path(key)):
+        _stored_blobs.add(key)
+        return True
+    return False
+
+
+def _store_blob(key, src):
+    """Base64-encode a binary file object into the blob for `key`, block by block."""
+    blob_path = _blob_path(key)
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    tmp_path = _tmp_path(blob_path)
+    with open(tmp_path, 'wb') as out:
+        while True:
+            block = src.read(B64_BLOCK)
+            if not block:
+                break
+            out.write(base64.b64encode(block))
+    os.replace(tmp_path, blob_path)
+    _stored_blobs.add(key)
+
+
+def _file_digest(path):
+    """Return the SHA-256 of a file.
+
+    An unchanged (size, mtime) is answered from the stat index without
+    touching the file; otherwise the file is hashed in fixed-size blocks.
+    """
+    index = _load_image_index()
+    key = os.path.abspath(path)
+    st = os.stat(path)
+    with _cache_lock:
+        entry = index.get(key)
+    if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+        return entry[2]
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(COPY_BLOCK), b""):
+            h.update(block)
+    digest = h.hexdigest()
+    with _cache_lock:
+        index[key] = [st.st_size, st.st_mtime_ns, digest]
+        _save_json_cache("index.json", index)
+    return digest
+
+
+def image_mime_type(path):
+    """Return the MIME type for an image path based on its extension."""
+    ext = os.path.splitext(path)[1].lower()
+    mime = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "gif": "image/gif", "webp": "image/webp"}
+    return mime.get(ext.lstrip('.'), "image/jpeg")
+
+
+class ImageRef:
+    """A cached, base64-encoded image that renders as a data URI on demand.
+
+    `name` is a file name for the image and `folder` the directory of the
+    source file it was made from.
+    """
+
+    def __init__(self, key, mime_type, name, folder=None):
+        self.key = key
+        self.mime_type = mime_type
+        self.name = name
+        self.folder = folder
+
+    def __str__(self):
+        with open(_blob_path(self.key), encoding='ascii') as f:
+            return f"data:{self.mime_type};base64,{f.read()}"
+
+    def write_to(self, out):
+        """Stream the data URI into a text file handle in fixed-size blocks."""
+        out.write(f"data:{self.mime_type};base64,")
+        with open(_blob_path(self.key), encoding='ascii') as f:
+            for block in iter(lambda: f.read(COPY_BLOCK), ""):
+                out.write(block)
+
+    def write_binary(self, out):
+        """Decode the image into a binary file handle in fixed-size blocks."""
+        with open(_blob_path(self.key), encoding='ascii') as f:
+            for block in iter(lambda: f.read(COPY_BLOCK), ""):
+                out.write(base64.b64decode(block))
+
+
+def image_ref(path):
+    """Return an ImageRef for an image file, encoding it into the cache if needed.
+
+    Results are cached on disk under CACHE_DIR, keyed by the SHA-256 of the
+    file content, so identical files are only encoded once.
+    """
+    digest = _file_digest(path)
+    if not _has_blob(digest):
+        with open(path, 'rb') as f:
+            _store_blob(digest, f)
+    return ImageRef(digest, image_mime_type(path), os.path.basename(path), os.path.dirname(os.path.abspath(path)))
+
+
 def encode_image(path):
     """Read an image file and return base64 data URI."""
-    ext = os.path.splitext(path)[1].lower()
-    mime = {"jpg": "image/jpeg", "jpeg": "image/jpeg", "png": "image/png", "gif": "image/gif"}
-    mime_type = mime.get(ext.lstrip('.'), "image/jpeg")
-    with open(path, 'rb') as f:
-        data = base64.b64encode(f.read()).decode('ascii')
-    return f"data:{mime_type};base64,{data}"
+    return str(image_ref(path))
+
+
+def _render_variant(path, width):
+    """Resize an image to at most `width` px wide and recompress it.
+
+    The image is turned upright per its EXIF orientation and keeps its
+    ICC profile. Returns (width, height, mime_type, encoded bytes as a
+    BytesIO).
+    """
+    with Image.open(path) as im:
+        im.load()
+        icc_profile = im.info.get("icc_profile")
+        im = ImageOps.exif_transpose(im)
+        if im.width > width:
+            height = max(1, round(im.height * width / im.width))
+            im = im.resize((width, height), Image.LANCZOS)
+        has_alpha = im.mode in ("RGBA", "LA", "PA") or (im.mode == "P" and "transparency" in im.info)
+        fmt = IMAGE_FORMAT.upper()
+        if fmt == "JPEG" and has_alpha:
+            fmt = "PNG"
+        buf = io.BytesIO()
+        if fmt == "JPEG":
+            im.convert("RGB").save(buf, "JPEG", quality=IMAGE_QUALITY, optimize=True, progressive=True,
+                                   icc_profile=icc_profile)
+        elif fmt == "WEBP":
+            im.save(buf, "WEBP", quality=IMAGE_QUALITY, method=6, icc_profile=icc_profile)
+        else:
+            im.save(buf, "PNG", optimize=True, icc_profile=icc_profile)
+        mime_type = {"JPEG": "image/jpeg", "WEBP": "image/webp", "PNG": "image/png"}[fmt]
+        buf.seek(0)
+        return im.width, im.height, mime_type, buf
+
+
+def image_variant(path, width):
+    """Return a cached resized variant as {"src": ImageRef, "width", "height"}."""
+    digest = _file_digest(path)
+    key = hashlib.sha256(f"{digest}:{width}:{IMAGE_FORMAT.upper()}:{IMAGE_QUALITY}:upright".encode('ascii')).hexdigest()
+    variants = _load_variant_index()
+    with _cache_lock:
+        meta = variants.get(key)
+    if meta is None or not _has_blob(key):
+        w, h, mime_type, buf = _render_variant(path, width)
+        _store_blob(key, buf)
+        with _cache_lock:
+            meta = variants[key] = [w, h, mime_type]
+            _save_json_cache("variants.json", variants)
+    w, h, mime_type = meta
+    ext = {"image/jpeg": ".jpg", "image/webp": ".webp", "image/png": ".png"}[mime_type]
+    name = f"{os.path.splitext(os.path.basename(path))[0]}-{w}w{ext}"
+    return {"src": ImageRef(key, mime_type, name, os.path.dirname(os.path.abspath(path))), "width": w, "height": h}
+
+
+def responsive_image(path, role):
+    """Build the resized variants of an image for one of IMAGE_ROLES.
+
+    Returns {"src", "srcset", "sizes", "width", "height"}, where srcset is a
+    list of (ImageRef, width). Without Pillow the original file is embedded.
+    """
+    if Image is None:
+        return {"src": image_ref(path), "srcset": [], "sizes": "", "width": None, "height": None}
+    spec = IMAGE_ROLES[role]
+    variants = []
+    for width in spec["widths"]:
+        v = image_variant(path, width)
+        if variants and v["width"] == variants[-1]["width"]:
+            break  # source is narrower than this width; no point upscaling
+        variants.append(v)
+    largest = variants[-1]
+    srcset = [(v["src"], v["width"]) for v in variants]
+    return {"src": largest["src"], "srcset": srcset, "sizes": spec["sizes"],
+            "width": largest["width"], "height": largest["height"]}
+
+
+class TextAsset:
+    """A stylesheet or script that is inlined or published as its own file."""
+
+    def __init__(self, name, ext, text):
+        self.name = name
+        self.ext = ext
+        self.text = text
+        self.key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    def tag(self, url=None):
+        if self.ext == "css":
+            return f'<link rel="stylesheet" href="{url}">' if url else f"<style>{self.text}</style>"
+        return f'<script src="{url}"></script>' if url else f"<script>{self.text}</script>"
+
+
+class ImgSource:
+    """The src/srcset/sizes attributes of one <img> for a responsive_image()."""
+
+    def __init__(self, src, candidates, sizes):
+        self.src = src
+        self.candidates = candidates
+        self.sizes = sizes
+        self.key = f"img:{src.key}:" + ",".join(f"{ref.key}:{w}" for ref, w in candidates)
+
+
+# Section templates only carry a short token where an image, stylesheet or
+# script goes. The renderer resolves each token for the output mode, so
+# section strings stay small and know nothing about inline vs external.
+_assets = []
+_asset_tokens = {}
+_ASSET_TOKEN_RE = re.compile("\x00asset(\\d+)\x00")
+
+
+def asset_token(asset):
+    """Return the placeholder token that the renderer replaces with `asset`."""
+    token = _asset_tokens.get(asset.key)
+    if token is None:
+        _assets.append(asset)
+        token = _asset_tokens[asset.key] = f"\x00asset{len(_assets) - 1}\x00"
+    return token
+
+
+def style_tag(css, name):
+    return asset_token(TextAsset(name, "css", css))
+
+
+def script_tag(js, name):
+    return asset_token(TextAsset(name, "js", js))
+
+
+def img_attrs(img):
+    """Render src/srcset/sizes/width/height attributes for a responsive_image()."""
+    attrs = asset_token(ImgSource(img["src"], img["srcset"], img["sizes"]))
+    if img["width"]:
+        attrs += f' width="{img["width"]}" height="{img["height"]}"'
+    return attrs
 
 
 def fmt_price(val):
@@ -274,220 +663,1545 @@ def calc_monthly_payment(principal, annual_rate, years):
     return principal * (r * (1 + r)**n) / ((1 + r)**n - 1)
 
 
+@functools.lru_cache(maxsize=None)
 def calc_loan_constant(annual_rate, years):
     """Calculate annual loan constant."""
     monthly = calc_monthly_payment(1, annual_rate, years)
     return monthly * 12
 
 
+# ============================================================
+# RENT ROLL INGESTION
+# ============================================================
+
+# Header names seen in property-manager exports, matched case-insensitively.
+# Rows above the header (report titles, dates) are skipped.
+RENT_ROLL_COLUMNS = {
+    "unit": ("unit", "unit #", "unit no", "unit number", "apt", "apt #"),
+    "type": ("type", "unit type", "bd/ba", "bed/bath", "floorplan", "floor plan"),
+    "sf": ("sf", "sq ft", "sqft", "square feet", "unit sf"),
+    "current_rent": ("current_rent", "current rent", "rent", "actual rent", "lease rent", "contract rent"),
+    "market_rent": ("market_rent", "market rent", "market"),
+}
+# Rent rolls longer than this are shown by unit type rather than unit by
+# unit, and read_rent_roll() stops keeping per-unit rows past it.
+RENT_ROLL_DETAIL_MAX = 100
+
+
+def _rent_roll_totals():
+    return {"units": 0, "sf": 0, "current_rent": 0, "market_rent": 0}
+
+
+def _tally(summary, unit_type, sf, current_rent, market_rent):
+    """Add one unit to a rent roll summary and its unit-type rollup."""
+    for totals in (summary, summary["by_type"].setdefault(unit_type, _rent_roll_totals())):
+        totals["units"] += 1
+        totals["sf"] += sf
+        totals["current_rent"] += current_rent
+        totals["market_rent"] += market_rent
+
+
+def bedrooms_of(unit_type):
+    """Bedroom count of a unit type label: "3 Bed / 1.5 Bath" and "3/2" -> 3,
+    "Studio" -> 0, anything else None."""
+    m = re.match(r"\s*(\d+)", str(unit_type))
+    if m:
+        return int(m.group(1))
+    return 0 if "studio" in str(unit_type).lower() else None
+
+
+def baths_of(unit_type):
+    """Bath count of a unit type label: "3 Bed / 1.5 Bath" -> 1.5, "3/2" -> 2,
+    anything else None."""
+    m = re.search(r"/\s*(\d+(?:\.\d+)?)", str(unit_type))
+    return float(m.group(1)) if m else None
+
+
+def bedroom_mix(summary):
+    """Roll a rent roll summary's unit types up by bedroom count."""
+    mix = {}
+    for unit_type, totals in summary["by_type"].items():
+        group = mix.setdefault(bedrooms_of(unit_type), _rent_roll_totals())
+        for key in group:
+            group[key] += totals[key]
+    return mix
+
+
+def summarize_rent_roll(rent_roll):
+    """Totals and per-unit-type rollups of a rent roll in one pass.
+
+    Returns {"units", "sf", "current_rent", "market_rent", "by_type": {type:
+    the same four totals}}, rents monthly. A RentRoll carries the summary
+    it built while loading.
+    """
+    if isinstance(rent_roll, RentRoll):
+        return rent_roll.summary
+    summary = {**_rent_roll_totals(), "by_type": {}}
+    for u in rent_roll:
+        _tally(summary, u["type"], u["sf"], u["current_rent"], u["market_rent"])
+    return summary
+
+
+class RentRoll:
+    """A rent roll stored as typed columns, summarized as it is built.
+
+    Iterating yields one dict per unit, like the RENT_ROLL literal. Unit
+    types are stored once and referenced by index. Once more than
+    `max_rows` units are appended the per-unit columns are dropped
+    (`detailed` becomes False) and only the summary keeps growing, so
+    memory is bounded by the number of unit types.
+    """
+
+    def __init__(self, max_rows=None):
+        self.max_rows = max_rows
+        self.detailed = True
+        self.summary = {**_rent_roll_totals(), "by_type": {}}
+        self.unit = []
+        self.types = []
+        self.type_code = array("H")
+        self.sf = array("d")
+        self.current_rent = array("d")
+        self.market_rent = array("d")
+        self._codes = {}
+
+    def append(self, unit, unit_type, sf, current_rent, market_rent):
+        _tally(self.summary, unit_type, sf, current_rent, market_rent)
+        if not self.detailed:
+            return
+        if self.max_rows is not None and len(self.unit) >= self.max_rows:
+            self._drop_rows()
+            return
+        code = self._codes.get(unit_type)
+        if code is None:
+            code = self._codes[unit_type] = len(self.types)
+            self.types.append(unit_type)
+        self.unit.append(unit)
+        self.type_code.append(code)
+        self.sf.append(sf)
+        self.current_rent.append(current_rent)
+        self.market_rent.append(market_rent)
+
+    def _drop_rows(self):
+        self.detailed = False
+        self.unit = self.types = self._codes = None
+        self.type_code = self.sf = self.current_rent = self.market_rent = None
+
+    def remarket(self, rents):
+        """A copy whose market rents are rents[bedrooms] for every unit type
+        with that bedroom count in `rents`."""
+        copy = RentRoll(self.max_rows)
+        if self.detailed:
+            for u in self:
+                copy.append(u["unit"], u["type"], u["sf"], u["current_rent"],
+                            rents.get(bedrooms_of(u["type"]), u["market_rent"]))
+            return copy
+        copy._drop_rows()
+        for unit_type, totals in self.summary["by_type"].items():
+            rent = rents.get(bedrooms_of(unit_type))
+            totals = {**totals, "market_rent": totals["units"] * rent if rent is not None else totals["market_rent"]}
+            copy.summary["by_type"][unit_type] = totals
+            for key in _rent_roll_totals():
+                copy.summary[key] += totals[key]
+        return copy
+
+    def __len__(self):
+        return self.summary["units"]
+
+    def __iter__(self):
+        if not self.detailed:
+            raise ValueError(f"rent roll has more than {self.max_rows} units; only the summary was kept")
+        for i, unit in enumerate(self.unit):
+            yield {
+                "unit": unit,
+                "type": self.types[self.type_code[i]],
+                "sf": self.sf[i],
+                "current_rent": self.current_rent[i],
+                "market_rent": self.market_rent[i],
+            }
+
+
+def _sheet_rows(path):
+    """Yield each row of a CSV or XLSX file as a tuple of cells."""
+    if os.path.splitext(path)[1].lower() in (".xlsx", ".xlsm"):
+        openpyxl = _lazy_import("openpyxl")
+        if openpyxl is None:
+            raise ImportError(f"reading {path} requires openpyxl")
+        book = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            yield from book.active.iter_rows(values_only=True)
+        finally:
+            book.close()
+    else:
+        import csv
+
+        with open(path, newline='', encoding='utf-8-sig') as f:
+            yield from csv.reader(f)
+
+
+def _cell_number(cell):
+    if cell is None or isinstance(cell, (int, float)):
+        return float(cell or 0)
+    text = str(cell).strip().replace("$", "").replace(",", "")
+    return float(text) if text else 0.0
+
+
+def read_rent_roll(path, max_rows=RENT_ROLL_DETAIL_MAX):
+    """Stream a property-manager rent roll export (CSV or XLSX) into a RentRoll.
+
+    Rows are parsed one at a time; blank rows and "Total" rows are
+    skipped. Unit, SF and rent columns are required; a missing type column
+    reads as "Unit" and a missing market rent as the current rent.
+    """
+    rows = _sheet_rows(path)
+    columns = None
+    for cells in rows:
+        names = [str(c).strip().lower() if c is not None else "" for c in cells]
+        found = {}
+        for field, aliases in RENT_ROLL_COLUMNS.items():
+            for i, name in enumerate(names):
+                if name in aliases:
+                    found[field] = i
+                    break
+        if {"unit", "sf", "current_rent"} <= found.keys():
+            columns = found
+            break
+    if columns is None:
+        raise ValueError(f"{path}: no header row with unit, SF and rent columns")
+
+    rent_roll = RentRoll(max_rows)
+    width = max(columns.values()) + 1
+    for cells in rows:
+        cells = tuple(cells) + (None,) * (width - len(cells))
+        unit = cells[columns["unit"]]
+        unit = str(unit).strip() if unit is not None else ""
+        if not unit or unit.lower().startswith("total"):
+            continue
+        try:
+            current = _cell_number(cells[columns["current_rent"]])
+            market = _cell_number(cells[columns["market_rent"]]) if "market_rent" in columns else current
+            rent_roll.append(
+                unit,
+                str(cells[columns["type"]] or "").strip() if "type" in columns else "Unit",
+                _cell_number(cells[columns["sf"]]),
+                current,
+                market,
+            )
+        except ValueError as e:
+            raise ValueError(f"{path}: unit {unit}: {e}") from None
+    return rent_roll
+
+
+# ============================================================
+# CALCULATION GRAPH
+# ============================================================
+
+def _same(a, b):
+    """Structural equality that also compares NumPy arrays element-wise."""
+    if a is b:
+        return True
+    if type(a) is not type(b):
+        return False
+    if isinstance(a, dict):
+        return a.keys() == b.keys() and all(_same(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)):
+        return len(a) == len(b) and all(map(_same, a, b))
+    if np is not None and isinstance(a, np.ndarray):
+        return a.shape == b.shape and bool(np.array_equal(a, b))
+    return bool(a == b)
+
+
+class Graph:
+    """Named values computed on demand from declared dependencies.
+
+    A node is a function whose parameter names are the values it uses;
+    `reads` lists any further module globals it reads directly. Names
+    that are not nodes are inputs, taken from `namespace` the first time
+    they are needed. Every value is memoized and mirrored into
+    `namespace`, so the module globals always hold current figures.
+    """
+
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self.nodes = {}       # name -> (fn, params, deps)
+        self.dependents = {}  # name -> {nodes that use it}
+        self.values = {}
+
+    def define(self, name, fn, reads=()):
+        params = fn.__code__.co_varnames[:fn.__code__.co_argcount]
+        deps = params + tuple(reads)
+        self.nodes[name] = (fn, params, deps)
+        for dep in deps:
+            self.dependents.setdefault(dep, set()).add(name)
+
+    def reads(self, *names):
+        """Decorator for a function that reads graph values as module globals.
+
+        The values are computed before each call, and the names are kept on
+        the wrapper as `.reads` for nodes built on the function to declare.
+        """
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                for name in names:
+                    self[name]
+                return fn(*args, **kwargs)
+            wrapper.reads = names
+            return wrapper
+        return decorate
+
+    def __getitem__(self, name):
+        if name not in self.values:
+            if name in self.nodes:
+                fn, params, deps = self.nodes[name]
+                for dep in deps:
+                    self[dep]
+                value = fn(*(self.values[p] for p in params))
+            else:
+                value = self.namespace[name]
+            self.values[name] = value
+            self.namespace[name] = value
+        return self.values[name]
+
+    def evaluate(self):
+        """Compute every node."""
+        for name in self.nodes:
+            self[name]
+
+    def downstream(self, names):
+        """Every node that depends, directly or not, on any of `names`."""
+        found = set()
+        stack = list(names)
+        while stack:
+            for node in self.dependents.get(stack.pop(), ()):
+                if node not in found:
+                    found.add(node)
+                    stack.append(node)
+        return found
+
+    def set(self, **inputs):
+        """Change inputs and recompute what depends on them.
+
+        Only nodes downstream of an input whose value actually changed are
+        invalidated; of those, the ones already computed are recomputed now
+        and the rest wait until they are read. Returns {name: new value} for
+        the changed inputs and every recomputed node whose value moved.
+        Pass new objects for list or dict inputs; a value mutated in place
+        compares equal to itself.
+        """
+        for name in inputs:
+            if name in self.nodes:
+                raise KeyError(f"{name!r} is computed; set its inputs instead")
+        return self._update({k: v for k, v in inputs.items() if not _same(self[k], v)})
+
+    def touch(self, *names):
+        """Recompute what depends on inputs whose content changed behind an
+        unchanged value, such as an image file replaced at the same path.
+        Returns {name: value} like set().
+        """
+        return self._update({name: self[name] for name in names})
+
+    def _update(self, moved):
+        before = {}
+        for node in self.downstream(moved):
+            if node in self.values:
+                before[node] = self.values.pop(node)
+        for name, value in moved.items():
+            self.values[name] = value
+            self.namespace[name] = value
+        changed = dict(moved)
+        for node, old in before.items():
+            if not _same(old, self[node]):
+                changed[node] = self.values[node]
+        return changed
+
+
+# Financial figures and images are nodes of this graph. Each becomes a
+# module global once computed; module attribute access computes it first.
+model = Graph(globals())
+
+
+def __getattr__(name):
+    if name in model.nodes:
+        return model[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
 # ============================================================
 # FINANCIAL CALCULATIONS
 # ============================================================
 
 # Rent roll aggregation
-total_sf = sum(u["sf"] for u in RENT_ROLL)
-total_current_monthly = sum(u["current_rent"] for u in RENT_ROLL)
-total_market_monthly = sum(u["market_rent"] for u in RENT_ROLL)
-current_gsr_annual = total_current_monthly * 12
-market_gsr_annual = total_market_monthly * 12
+# rent_roll is RENT_ROLL with market rents derived from the comps when
+# MARKET_RENT_METHOD is set (see COMP STATISTICS).
+model.define("rent_roll_summary", lambda rent_roll: summarize_rent_roll(rent_roll))
+model.define("unit_mix", lambda rent_roll_summary: bedroom_mix(rent_roll_summary))
+model.define("total_sf", lambda rent_roll_summary: rent_roll_summary["sf"])
+model.define("total_current_monthly", lambda rent_roll_summary: rent_roll_summary["current_rent"])
+model.define("total_market_monthly", lambda rent_roll_summary: rent_roll_summary["market_rent"])
+model.define("current_gsr_annual", lambda total_current_monthly: total_current_monthly * 12)
+model.define("market_gsr_annual", lambda total_market_monthly: total_market_monthly * 12)
 
 # Income
-current_vacancy = current_gsr_annual * VACANCY_RATE
-current_eri = current_gsr_annual - current_vacancy
-current_egi = current_eri + OTHER_INCOME_ANNUAL
+model.define("current_vacancy", lambda current_gsr_annual, VACANCY_RATE: current_gsr_annual * VACANCY_RATE)
+model.define("current_eri", lambda current_gsr_annual, current_vacancy: current_gsr_annual - current_vacancy)
+model.define("current_egi", lambda current_eri, OTHER_INCOME_ANNUAL: current_eri + OTHER_INCOME_ANNUAL)
 
-market_vacancy = market_gsr_annual * VACANCY_RATE
-market_eri = market_gsr_annual - market_vacancy
-market_egi = market_eri + OTHER_INCOME_ANNUAL
+model.define("market_vacancy", lambda market_gsr_annual, VACANCY_RATE: market_gsr_annual * VACANCY_RATE)
+model.define("market_eri", lambda market_gsr_annual, market_vacancy: market_gsr_annual - market_vacancy)
+model.define("market_egi", lambda market_eri, OTHER_INCOME_ANNUAL: market_eri + OTHER_INCOME_ANNUAL)
 
 # Expenses
-fixed_expenses = sum(EXPENSES.values())
-current_mgmt_fee = current_egi * MGMT_FEE_PCT
-market_mgmt_fee = market_egi * MGMT_FEE_PCT
-current_total_expenses = fixed_expenses + current_mgmt_fee
-market_total_expenses = fixed_expenses + market_mgmt_fee
+model.define("fixed_expenses", lambda EXPENSES: sum(EXPENSES.values()))
+model.define("current_mgmt_fee", lambda current_egi, MGMT_FEE_PCT: current_egi * MGMT_FEE_PCT)
+model.define("market_mgmt_fee", lambda market_egi, MGMT_FEE_PCT: market_egi * MGMT_FEE_PCT)
+model.define("current_total_expenses", lambda fixed_expenses, current_mgmt_fee: fixed_expenses + current_mgmt_fee)
+model.define("market_total_expenses", lambda fixed_expenses, market_mgmt_fee: fixed_expenses + market_mgmt_fee)
 
 # NOI
-current_noi = current_egi - current_total_expenses
-market_noi = market_egi - market_total_expenses
+model.define("current_noi", lambda current_egi, current_total_expenses: current_egi - current_total_expenses)
+model.define("market_noi", lambda market_egi, market_total_expenses: market_egi - market_total_expenses)
 
 # Financing
-price = PROPERTY["suggested_price"]
-loan_amount = price * LTV
-down_payment = price * (1 - LTV)
-loan_constant = calc_loan_constant(INTEREST_RATE, AMORT_YEARS)
-annual_debt_service = loan_amount * loan_constant
-monthly_payment = annual_debt_service / 12
+model.define("price", lambda PROPERTY: PROPERTY["suggested_price"])
+model.define("loan_amount", lambda price, LTV: price * LTV)
+model.define("down_payment", lambda price, LTV: price * (1 - LTV))
+model.define("loan_constant", lambda INTEREST_RATE, AMORT_YEARS: calc_loan_constant(INTEREST_RATE, AMORT_YEARS))
+model.define("annual_debt_service", lambda loan_amount, loan_constant: loan_amount * loan_constant)
+model.define("monthly_payment", lambda annual_debt_service: annual_debt_service / 12)
 
 # Returns at suggested price
-current_cap = current_noi / price
-market_cap = market_noi / price
-current_grm = price / current_gsr_annual
-market_grm = price / market_gsr_annual
-price_per_unit = price / PROPERTY["units"]
-price_per_sf = price / PROPERTY["building_sf"]
-current_coc = (current_noi - annual_debt_service) / down_payment
-market_coc = (market_noi - annual_debt_service) / down_payment
-current_dcr = current_noi / annual_debt_service
-market_dcr = market_noi / annual_debt_service
+model.define("current_cap", lambda current_noi, price: current_noi / price)
+model.define("market_cap", lambda market_noi, price: market_noi / price)
+model.define("current_grm", lambda price, current_gsr_annual: price / current_gsr_annual)
+model.define("market_grm", lambda price, market_gsr_annual: price / market_gsr_annual)
+model.define("price_per_unit", lambda price, PROPERTY: price / PROPERTY["units"])
+model.define("price_per_sf", lambda price, PROPERTY: price / PROPERTY["building_sf"])
+model.define("current_coc", lambda current_noi, annual_debt_service, down_payment:
+             (current_noi - annual_debt_service) / down_payment)
+model.define("market_coc", lambda market_noi, annual_debt_service, down_payment:
+             (market_noi - annual_debt_service) / down_payment)
+model.define("current_dcr", lambda current_noi, annual_debt_service: current_noi / annual_debt_service)
+model.define("market_dcr", lambda market_noi, annual_debt_service: market_noi / annual_debt_service)
 
 # Rent upside
-rent_upside_pct = (total_market_monthly - total_current_monthly) / total_current_monthly
-avg_current_rent_per_sf = total_current_monthly / total_sf
-avg_market_rent_per_sf = total_market_monthly / total_sf
+model.define("rent_upside_pct", lambda total_market_monthly, total_current_monthly:
+             (total_market_monthly - total_current_monthly) / total_current_monthly)
+model.define("avg_current_rent_per_sf", lambda total_current_monthly, total_sf: total_current_monthly / total_sf)
+model.define("avg_market_rent_per_sf", lambda total_market_monthly, total_sf: total_market_monthly / total_sf)
 
 # Pricing matrix at $50K increments
 MATRIX_LOW = 4600000
 MATRIX_HIGH = 5100000
 MATRIX_STEP = 50000
 
-pricing_matrix = []
-for p in range(MATRIX_LOW, MATRIX_HIGH + 1, MATRIX_STEP):
-    loan = p * LTV
-    dp = p * (1 - LTV)
-    ds = loan * loan_constant
-    row = {
-        "price": p,
-        "cap_current": current_noi / p,
-        "cap_market": market_noi / p,
-        "per_unit": p / PROPERTY["units"],
-        "per_sf": p / PROPERTY["building_sf"],
-        "grm": p / market_gsr_annual,
-        "coc": (market_noi - ds) / dp,
-        "dcr": market_noi / ds,
-        "highlight": p == price,
-    }
-    pricing_matrix.append(row)
+
+def _pricing_matrix(MATRIX_LOW, MATRIX_HIGH, MATRIX_STEP, PROPERTY, LTV, loan_constant,
+                    current_noi, market_noi, market_gsr_annual, price):
+    rows = []
+    for p in range(MATRIX_LOW, MATRIX_HIGH + 1, MATRIX_STEP):
+        loan = p * LTV
+        dp = p * (1 - LTV)
+        ds = loan * loan_constant
+        rows.append({
+            "price": p,
+            "cap_current": current_noi / p,
+            "cap_market": market_noi / p,
+            "per_unit": p / PROPERTY["units"],
+            "per_sf": p / PROPERTY["building_sf"],
+            "grm": p / market_gsr_annual,
+            "coc": (market_noi - ds) / dp,
+            "dcr": market_noi / ds,
+            "highlight": p == price,
+        })
+    return rows
+
+
+model.define("pricing_matrix", _pricing_matrix)
 
 
 # ============================================================
-# IMAGE ENCODING
+# SENSITIVITY ANALYSIS
 # ============================================================
 
-print("Encoding images...")
-hero_b64 = encode_image(HERO_PHOTO)
-grid_b64 = [encode_image(p) for p in GRID_PHOTOS]
-logo_b64 = encode_image(LOGO_WHITE)
-glen_b64 = encode_image(HEADSHOT_GLEN)
-filip_b64 = encode_image(HEADSHOT_FILIP)
-blake_b64 = encode_image(HEADSHOT_BLAKE)
-print("Images encoded.")
+# Cube axes; price rows reuse the pricing matrix range. Values not on an
+# axis are read at the nearest grid point.
+SENSITIVITY_RATES = (0.0525, 0.0550, 0.0575, 0.0600, 0.0625, 0.0650)
+SENSITIVITY_LTVS = (0.50, 0.55, 0.60, 0.65, 0.70)
+SENSITIVITY_VACANCIES = (0.03, 0.05, 0.07)
+SENSITIVITY_RENT_GROWTH = (0.0, 0.02, 0.04)
+
+SENSITIVITY_DIMS = ("price", "rate", "ltv", "vacancy", "rent_growth")
+
+
+@model.reads("price", "INTEREST_RATE", "LTV", "VACANCY_RATE")
+def sensitivity_base():
+    """The underwritten deal as a point in the cube: {dim: value}."""
+    return {"price": price, "rate": INTEREST_RATE, "ltv": LTV, "vacancy": VACANCY_RATE, "rent_growth": 0.0}
+
+
+def loan_constants(annual_rates, years):
+    """Vectorized calc_loan_constant() over an array of annual rates."""
+    r = np.asarray(annual_rates, dtype=float) / 12
+    n = years * 12
+    growth = (1 + r) ** n
+    with np.errstate(divide='ignore', invalid='ignore'):
+        monthly = np.where(r == 0, 1 / n, r * growth / (growth - 1))
+    return monthly * 12
+
+
+@model.reads("market_gsr_annual", "OTHER_INCOME_ANNUAL", "MGMT_FEE_PCT", "fixed_expenses", "AMORT_YEARS")
+def sensitivity_cube(prices, rates, ltvs, vacancies, rent_growth, dtype=float):
+    """Evaluate pro forma returns over every price x rate x LTV x vacancy x rent growth.
+
+    Market GSR is grown by each rent-growth value, then run through the same
+    vacancy, other income, fixed expense and management fee logic as
+    market_noi. Returns {"axes": {dim: 1-D array}, "cap", "grm", "coc", "dcr"},
+    each metric an array of shape (prices, rates, ltvs, vacancies, growth).
+    Metrics that do not vary along a dimension are broadcast views, so only
+    cash-on-cash and DCR are materialized at full size.
+    """
+    axes = {dim: np.asarray(vals, dtype=dtype)
+            for dim, vals in zip(SENSITIVITY_DIMS, (prices, rates, ltvs, vacancies, rent_growth))}
+    p, r, l, v, g = np.ix_(*axes.values())
+    shape = tuple(len(a) for a in axes.values())
+
+    gsr = market_gsr_annual * (1 + g)
+    egi = gsr * (1 - v) + OTHER_INCOME_ANNUAL
+    noi = egi * (1 - MGMT_FEE_PCT) - fixed_expenses
+    debt_service = p * l * loan_constants(r, AMORT_YEARS).astype(dtype)
+    equity = p * (1 - l)
+
+    return {
+        "axes": axes,
+        "cap": np.broadcast_to(noi / p, shape),
+        "grm": np.broadcast_to(p / gsr, shape),
+        "coc": (noi - debt_service) / equity,
+        "dcr": noi / debt_service,
+    }
+
+
+def sensitivity_slice(cube, metric, rows, cols, **at):
+    """Return (row_values, col_values, 2-D grid) of one metric from a cube.
+
+    `rows` and `cols` name two dimensions; every other dimension is held at
+    the grid point nearest to `at[dim]`, defaulting to sensitivity_base().
+    """
+    base = sensitivity_base()
+    index = []
+    for dim in SENSITIVITY_DIMS:
+        if dim in (rows, cols):
+            index.append(slice(None))
+        else:
+            target = at.get(dim, base[dim])
+            index.append(int(np.abs(cube["axes"][dim] - target).argmin()))
+    grid = cube[metric][tuple(index)]
+    if SENSITIVITY_DIMS.index(rows) > SENSITIVITY_DIMS.index(cols):
+        grid = grid.T
+    return cube["axes"][rows], cube["axes"][cols], grid
+
+
+def _sensitivity(MATRIX_LOW, MATRIX_HIGH, MATRIX_STEP, SENSITIVITY_RATES, SENSITIVITY_LTVS,
+                 SENSITIVITY_VACANCIES, SENSITIVITY_RENT_GROWTH):
+    if np is None:
+        return None
+    return sensitivity_cube(
+        range(MATRIX_LOW, MATRIX_HIGH + 1, MATRIX_STEP),
+        SENSITIVITY_RATES, SENSITIVITY_LTVS, SENSITIVITY_VACANCIES, SENSITIVITY_RENT_GROWTH,
+    )
+
+
+model.define("sensitivity", _sensitivity, reads=sensitivity_cube.reads)
 
 
 # ============================================================
-# HTML GENERATION
+# AMORTIZATION
 # ============================================================
 
-def build_css():
-    return """
-@import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
+# Lender quotes to compare in the financing section, for example
+# {"lender": "Bank A", "rate": 0.0565, "amort_years": 30, "term_years": 5, "ltv": 0.60}
+LENDER_QUOTES = []
 
-* { margin: 0; padding: 0; box-sizing: border-box; }
-body { font-family: 'Inter', sans-serif; color: #333; background: #fff; line-height: 1.6; }
-.page { max-width: 1100px; margin: 0 auto; }
+# Per-$1 monthly schedules keyed by (rate, amort_years, term_months);
+# a loan's schedule is its unit schedule scaled by the principal.
+_unit_schedules = {}
 
-/* Cover */
-.cover { background: #1B3A5C; color: #fff; padding: 48px 40px; text-align: center; min-height: 100vh; display: flex; flex-direction: column; justify-content: center; align-items: center; }
-.cover-logo { width: 320px; margin-bottom: 30px; }
-.cover-label { font-size: 11px; font-weight: 600; text-transform: uppercase; letter-spacing: 3px; color: #C5A258; margin-bottom: 20px; }
-.cover-title { font-size: 42px; font-weight: 700; margin-bottom: 6px; }
-.cover-address { font-size: 22px; font-weight: 300; color: rgba(255,255,255,0.8); margin-bottom: 24px; }
-.cover-divider { width: 80px; height: 2px; background: #C5A258; margin: 0 auto 24px; }
-.cover-price-label { font-size: 12px; font-weight: 600; text-transform: uppercase; letter-spacing: 2px; color: #C5A258; margin-bottom: 8px; }
-.cover-price { font-size: 48px; font-weight: 700; margin-bottom: 28px; }
-.cover-stats { display: flex; gap: 36px; justify-content: center; margin-bottom: 28px; flex-wrap: wrap; }
-.cover-stat { text-align: center; }
-.cover-stat-value { font-size: 24px; font-weight: 700; display: block; }
-.cover-stat-label { font-size: 10px; font-weight: 600; text-transform: uppercase; letter-spacing: 1.5px; color: #C5A258; display: block; }
-.client-greeting { font-size: 14px; font-weight: 300; letter-spacing: 2px; text-transform: uppercase; color: rgba(255,255,255,0.7); margin-bottom: 28px; }
-.cover-photo { width: 100%; max-height: 300px; object-fit: cover; border: 3px solid #C5A258; border-radius: 4px; margin-top: 10px; }
 
-/* Sections */
-.section { padding: 48px 40px; }
-.section-alt { background: #f8f9fa; }
-.section-title { font-size: 28px; font-weight: 700; color: #1B3A5C; margin-bottom: 6px; }
-.section-subtitle { font-size: 12px; font-weight: 600; text-transform: uppercase; letter-spacing: 2px; color: #C5A258; margin-bottom: 16px; }
-.gold-divider { width: 60px; height: 3px; background: linear-gradient(to right, #C5A258, #d4b96a); margin-bottom: 28px; }
+def loan_balance(principal, annual_rate, amort_years, months):
+    """Remaining balance of a fully amortizing loan after `months` payments."""
+    r = np.asarray(annual_rate, dtype=float) / 12
+    n = amort_years * 12
+    with np.errstate(divide='ignore', invalid='ignore'):
+        growth_n = (1 + r) ** n
+        bal = principal * (growth_n - (1 + r) ** months) / (growth_n - 1)
+    return np.where(r == 0, principal * (1 - months / n), bal)
 
-/* Photo Grid */
-.photo-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 12px; margin-bottom: 28px; }
-.photo-grid img { width: 100%; height: 220px; object-fit: cover; border-radius: 4px; border: 1px solid #ddd; }
 
-/* Narrative */
-.narrative { margin-bottom: 28px; }
-.narrative p { font-size: 14px; line-height: 1.7; margin-bottom: 14px; color: #444; }
+def _unit_schedule_batch(rates, amort_years, term_months):
+    """Per-$1 payment, interest, principal and balance arrays for each rate."""
+    rates = np.asarray(rates, dtype=float)
+    balance = loan_balance(1.0, rates[:, None], amort_years, np.arange(term_months + 1))
+    payment = loan_constants(rates, amort_years) / 12
+    interest = balance[:, :-1] * rates[:, None] / 12
+    principal = payment[:, None] - interest
+    return payment, interest, principal, balance[:, 1:]
 
-/* Info Table (2-col key-value) */
-.info-table { width: 100%; border-collapse: collapse; margin-bottom: 28px; }
-.info-table td { padding: 10px 14px; font-size: 13px; border-bottom: 1px solid #e0e0e0; }
-.info-table td:first-child { font-weight: 600; color: #1B3A5C; width: 40%; }
 
-/* Data Tables */
-table { width: 100%; border-collapse: collapse; margin-bottom: 24px; font-size: 13px; }
-th { background: #1B3A5C; color: #fff; padding: 10px 8px; text-align: left; font-size: 11px; font-weight: 600; text-transform: uppercase; letter-spacing: 0.5px; }
-td { padding: 9px 8px; border-bottom: 1px solid #e0e0e0; }
-tr:nth-child(even) { background: #f5f5f5; }
-tr.summary { background: #e8edf2; font-weight: 600; }
-tr.highlight { background: #FFF8E7; border-left: 3px solid #C5A258; border-right: 3px solid #C5A258; }
-tr.highlight td { font-weight: 600; }
-.table-note { font-size: 11px; color: #888; font-style: italic; margin-top: -16px; margin-bottom: 24px; }
-.table-scroll { margin-bottom: 24px; }
+def amortization(principals, rates, amort_years=None, term_years=None):
+    """Build monthly amortization schedules for many loans at once.
 
-/* Metrics Grid */
-.metrics-grid { display: grid; grid-template-columns: repeat(3, 1fr); gap: 16px; margin-bottom: 32px; }
-.metric-card { background: #1B3A5C; color: #fff; padding: 20px 16px; border-radius: 6px; text-align: center; }
-.metric-value { font-size: 28px; font-weight: 700; display: block; }
-.metric-label { font-size: 10px; font-weight: 600; text-transform: uppercase; letter-spacing: 1px; color: #C5A258; margin-top: 6px; display: block; }
-.metric-sub { font-size: 12px; color: rgba(255,255,255,0.6); margin-top: 4px; display: block; }
+    `principals` and `rates` broadcast to one row per loan. Returns
+    {"payment": (loans,), "interest" / "principal" / "balance": (loans,
+    months), "balloon": balance at maturity, "paydown": cumulative
+    principal}. Unit schedules are cached by (rate, amort, term), and any
+    missing rates are computed together in one batch. The terms default to
+    AMORT_YEARS and LOAN_TERM_YEARS.
+    """
+    amort_years = AMORT_YEARS if amort_years is None else amort_years
+    term_years = LOAN_TERM_YEARS if term_years is None else term_years
+    principals, rates = np.broadcast_arrays(np.atleast_1d(np.asarray(principals, dtype=float)),
+                                            np.atleast_1d(np.asarray(rates, dtype=float)))
+    term_months = int(round(term_years * 12))
+    keys = [(float(r), amort_years, term_months) for r in rates]
+    missing = sorted({k for k in keys if k not in _unit_schedules})
+    if missing:
+        batch = _unit_schedule_batch([k[0] for k in missing], amort_years, term_months)
+        for i, key in enumerate(missing):
+            _unit_schedules[key] = tuple(part[i] for part in batch)
+    unit = [np.array([_unit_schedules[k][part] for k in keys]) for part in range(4)]
+    scale = principals[:, None]
+    balance = unit[3] * scale
+    principal = unit[2] * scale
+    return {
+        "payment": unit[0] * principals,
+        "interest": unit[1] * scale,
+        "principal": principal,
+        "balance": balance,
+        "balloon": balance[:, -1],
+        "paydown": principal.sum(axis=1),
+    }
 
-/* Two Column */
-.two-col { display: grid; grid-template-columns: 1fr 1fr; gap: 28px; margin-bottom: 28px; }
-.two-col h3 { font-size: 16px; font-weight: 600; color: #1B3A5C; margin-bottom: 12px; }
 
-/* Sub headings */
-.sub-heading { font-size: 18px; font-weight: 600; color: #1B3A5C; margin: 28px 0 12px; }
+def yearly_summary(schedule, row=0):
+    """Roll one loan's monthly schedule up into yearly rows.
 
-/* Condition Note */
-.condition-note { background: #FFF8E7; border-left: 4px solid #C5A258; padding: 16px 20px; margin: 20px 0; border-radius: 0 4px 4px 0; font-size: 13px; line-height: 1.6; }
-.condition-note strong { color: #1B3A5C; }
+    Returns [(year, payments, interest, principal, ending balance)].
+    """
+    interest = schedule["interest"][row]
+    principal = schedule["principal"][row]
+    balance = schedule["balance"][row]
+    rows = []
+    for start in range(0, len(interest), 12):
+        end = min(start + 12, len(interest))
+        i_sum = float(interest[start:end].sum())
+        p_sum = float(principal[start:end].sum())
+        rows.append((start // 12 + 1, i_sum + p_sum, i_sum, p_sum, float(balance[end - 1])))
+    return rows
 
-/* Buyer Profile Callout */
-.buyer-profile { background: #f0f4f8; border-left: 4px solid #1B3A5C; padding: 20px 24px; margin: 24px 0; border-radius: 0 4px 4px 0; }
-.buyer-profile-label { font-size: 12px; font-weight: 700; text-transform: uppercase; letter-spacing: 1.5px; color: #1B3A5C; margin-bottom: 12px; }
-.buyer-profile ul { list-style: none; padding: 0; margin: 0; }
-.buyer-profile li { padding: 8px 0; border-bottom: 1px solid #dce3eb; font-size: 14px; line-height: 1.6; color: #333; }
-.buyer-profile li:last-child { border-bottom: none; }
-.buyer-profile li strong { color: #1B3A5C; }
-.buyer-profile .bp-closing { font-size: 13px; color: #555; margin-top: 12px; font-style: italic; }
 
-/* Leaflet Maps */
-.leaflet-map { height: 400px; border-radius: 4px; border: 1px solid #ddd; margin-bottom: 30px; z-index: 1; }
-.map-fallback { display: none; font-size: 12px; color: #666; font-style: italic; margin-bottom: 30px; }
+model.define("loan_schedule", lambda loan_amount, INTEREST_RATE, AMORT_YEARS, LOAN_TERM_YEARS:
+             amortization(loan_amount, INTEREST_RATE, AMORT_YEARS, LOAN_TERM_YEARS) if np is not None else None)
 
-/* Footer */
-.footer { background: #1B3A5C; color: #fff; padding: 48px 40px; text-align: center; }
-.footer-logo { width: 280px; margin-bottom: 28px; }
-.footer-team { display: flex; justify-content: center; gap: 20px; flex-wrap: wrap; margin-bottom: 28px; }
-.footer-person { text-align: center; flex: 1; min-width: 240px; }
-.footer-headshot { width: 60px; height: 60px; border-radius: 50%; border: 2px solid #C5A258; object-fit: cover; margin-bottom: 10px; }
-.footer-name { font-size: 15px; font-weight: 600; display: block; }
-.footer-title { font-size: 11px; color: #C5A258; text-transform: uppercase; letter-spacing: 1px; display: block; margin-bottom: 6px; }
-.footer-contact { font-size: 12px; color: rgba(255,255,255,0.7); line-height: 1.5; }
-.footer-contact a { color: rgba(255,255,255,0.7); text-decoration: none; }
-.footer-office { font-size: 12px; color: rgba(255,255,255,0.5); margin-bottom: 20px; }
-.footer-disclaimer { font-size: 10px; color: rgba(255,255,255,0.4); line-height: 1.5; max-width: 800px; margin: 0 auto; }
 
-/* Print */
-@media print {
-  body { -webkit-print-color-adjust: exact !important; print-color-adjust: exact !important; }
-  .page { max-width: 100%; }
-  .cover { min-height: auto !important; padding: 24px 36px; page-break-after: always; }
-  .section { padding: 24px 36px; page-break-before: always; }
-  table { page-break-inside: auto; font-size: 11px; }
-  tr { page-break-inside: avoid; }
+# ============================================================
+# HOLD-PERIOD DCF
+# ============================================================
+
+# The hold runs to the loan's maturity unless HOLD_YEARS is set; the exit
+# is priced off the following year's NOI. Income starts from in-place
+# rents, and each year TURNOVER_RATE of the remaining below-market units
+# reset to market.
+HOLD_YEARS = None  # None: LOAN_TERM_YEARS (see hold_period)
+TURNOVER_RATE = 0.15
+RENT_GROWTH = 0.03
+EXPENSE_GROWTH = 0.03
+EXIT_CAP = 0.055
+EXIT_CAP_RATES = (0.0500, 0.0525, 0.0550, 0.0575, 0.0600, 0.0625)
+SALE_COST_PCT = 0.02
+
+
+model.define("hold_period", lambda HOLD_YEARS, LOAN_TERM_YEARS: LOAN_TERM_YEARS if HOLD_YEARS is None else HOLD_YEARS)
+
+
+def irr(cashflows, tol=1e-10, max_iter=100):
+    """Vectorized IRR over the last axis of `cashflows`.
+
+    Each element runs a safeguarded Newton iteration: a Newton step is taken
+    when it stays inside the current sign-change bracket, otherwise the
+    bracket is bisected. NPV and its derivative are evaluated by Horner's
+    rule in v = 1 / (1 + r), so each iteration is a handful of array
+    operations per period. Rows without a root in (-99%, 1000%) give NaN.
+    """
+    cf = np.asarray(cashflows, dtype=float)
+    periods = [cf[..., k] for k in range(cf.shape[-1])]
+    shape = cf.shape[:-1]
+
+    def npv(r):
+        v = 1 / (1 + r)
+        value = periods[-1]
+        deriv = np.zeros(shape)
+        for c in reversed(periods[:-1]):
+            deriv = deriv * v + value
+            value = value * v + c
+        return value, -deriv * v * v
+
+    lo = np.full(shape, -0.99)
+    hi = np.full(shape, 10.0)
+    f_lo, _ = npv(lo)
+    f_hi, _ = npv(hi)
+    valid = np.sign(f_lo) != np.sign(f_hi)
+    # Start from the rate that compounds the outlay into the total inflows
+    # over their cash-weighted average timing; Newton usually needs 3-5 steps.
+    inflows = np.maximum(cf[..., 1:], 0)
+    total_in = inflows.sum(axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        avg_t = (inflows * np.arange(1, cf.shape[-1])).sum(axis=-1) / total_in
+        rate = (total_in / -periods[0]) ** (1 / avg_t) - 1
+    rate = np.where(np.isfinite(rate) & (rate > lo) & (rate < hi), rate, 0.10)
+    for _ in range(max_iter):
+        f, df = npv(rate)
+        same = np.sign(f) == np.sign(f_lo)
+        lo = np.where(same, rate, lo)
+        f_lo = np.where(same, f, f_lo)
+        hi = np.where(same, hi, rate)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            step = rate - f / df
+        outside = ~np.isfinite(step) | (step < lo) | (step > hi)
+        new_rate = np.where(f == 0, rate, np.where(outside, (lo + hi) / 2, step))
+        done = np.all((np.abs(new_rate - rate) < tol) | ~valid)
+        rate = new_rate
+        if done:
+            break
+    return np.where(valid, rate, np.nan)
+
+
+@model.reads("current_gsr_annual", "market_gsr_annual", "TURNOVER_RATE", "RENT_GROWTH", "EXPENSE_GROWTH",
+             "VACANCY_RATE", "OTHER_INCOME_ANNUAL", "MGMT_FEE_PCT", "fixed_expenses", "LTV",
+             "loan_constant", "INTEREST_RATE", "AMORT_YEARS", "SALE_COST_PCT", "hold_period")
+def dcf_cashflows(prices, exit_caps, hold_years=None):
+    """Project cash flows over the hold for every price x exit cap.
+
+    Year-1 NOI matches current_noi. Rent moves toward market as units turn
+    over (TURNOVER_RATE) and all income grows at RENT_GROWTH; fixed
+    expenses grow at EXPENSE_GROWTH. Debt is LTV of each price at
+    INTEREST_RATE / AMORT_YEARS, repaid from sale proceeds. Returns the
+    yearly NOI, debt service, loan payoff and net sale per scenario plus
+    the (prices, exit caps, years + 1) unlevered and levered cash flows.
+    Every cash flow is affine in price. The hold defaults to hold_period.
+    """
+    hold_years = hold_period if hold_years is None else hold_years
+    prices = np.asarray(prices, dtype=float)[:, None]
+    exit_caps = np.asarray(exit_caps, dtype=float)[None, :]
+    years = np.arange(1, hold_years + 2)
+    rent_idx = (1 + RENT_GROWTH) ** (years - 1)
+    at_market = 1 - (1 - TURNOVER_RATE) ** (years - 1)
+    gsr = current_gsr_annual + at_market * (market_gsr_annual - current_gsr_annual)
+    egi = (gsr * (1 - VACANCY_RATE) + OTHER_INCOME_ANNUAL) * rent_idx
+    noi = egi * (1 - MGMT_FEE_PCT) - fixed_expenses * (1 + EXPENSE_GROWTH) ** (years - 1)
+
+    loan = prices * LTV
+    equity = prices - loan
+    debt_service = loan * loan_constant
+    payoff = loan * loan_balance(1.0, INTEREST_RATE, AMORT_YEARS, hold_years * 12)
+    net_sale = noi[hold_years] / exit_caps * (1 - SALE_COST_PCT)
+
+    shape = np.broadcast_shapes(prices.shape, exit_caps.shape) + (hold_years + 1,)
+    unlevered = np.zeros(shape)
+    unlevered[..., 0] = -prices
+    unlevered[..., 1:] = noi[:hold_years]
+    unlevered[..., -1] += net_sale
+    levered = np.zeros(shape)
+    levered[..., 0] = -equity
+    levered[..., 1:] = (noi[:hold_years] - debt_service[..., None])
+    levered[..., -1] += net_sale - payoff
+
+    return {
+        "prices": prices[:, 0],
+        "exit_caps": exit_caps[0],
+        "noi": noi[:hold_years],
+        "equity": equity[:, 0],
+        "debt_service": debt_service[:, 0],
+        "payoff": payoff[:, 0],
+        "net_sale": net_sale,
+        "unlevered": unlevered,
+        "levered": levered,
+    }
+
+
+def project_dcf(prices, exit_caps, hold_years=None):
+    """dcf_cashflows() plus (prices, exit caps) grids of levered and unlevered
+    IRR and the levered equity multiple."""
+    result = dcf_cashflows(prices, exit_caps, hold_years)
+    levered = result["levered"]
+    result["unlevered_irr"] = irr(result["unlevered"])
+    result["levered_irr"] = irr(levered)
+    result["equity_multiple"] = levered[..., 1:].sum(axis=-1) / result["equity"][:, None]
+    return result
+
+
+model.define("dcf", lambda MATRIX_LOW, MATRIX_HIGH, MATRIX_STEP, EXIT_CAP_RATES, hold_period:
+             project_dcf(range(MATRIX_LOW, MATRIX_HIGH + 1, MATRIX_STEP), EXIT_CAP_RATES, hold_period)
+             if np is not None else None,
+             reads=dcf_cashflows.reads)
+
+
+# ============================================================
+# PRICING SOLVER
+# ============================================================
+
+# Every metric falls as price rises, so "at least this return" becomes
+# "at most this price". Inverses use the pro forma (market) NOI unless
+# noted. IRR targets invert exactly as well: the hold's cash flows are
+# affine in price, so NPV at the target rate is linear in price.
+SOLVER_METRICS = {
+    "cap": "pro forma cap rate",
+    "cap_current": "current cap rate",
+    "grm": "pro forma GRM (a maximum, not a minimum)",
+    "coc": "pro forma cash-on-cash",
+    "dcr": "pro forma debt coverage ratio",
+    "irr": "levered IRR over the hold",
+    "unlevered_irr": "unlevered IRR over the hold",
+}
+# Targets --solve accepts per metric: above zero and at most this. Past
+# these the implied price is not a meaningful bid.
+SOLVER_TARGET_MAX = {
+    "cap": 0.25,
+    "cap_current": 0.25,
+    "grm": 50,
+    "coc": 0.50,
+    "dcr": 5.0,
+    "irr": 1.0,
+    "unlevered_irr": 1.0,
+}
+
+
+@model.reads("market_noi", "current_noi", "market_gsr_annual", "LTV", "loan_constant")
+def solve_price(metric, targets):
+    """Return the exact price at which `metric` equals each target.
+
+    `targets` may be a scalar or any array; all of them are solved in one
+    batched call. See SOLVER_METRICS for the metric names.
+    """
+    t = np.asarray(targets, dtype=float)
+    if metric == "cap":
+        return market_noi / t
+    if metric == "cap_current":
+        return current_noi / t
+    if metric == "grm":
+        return t * market_gsr_annual
+    if metric == "dcr":
+        return market_noi / (t * LTV * loan_constant)
+    if metric == "coc":
+        return market_noi / (t * (1 - LTV) + LTV * loan_constant)
+    if metric in ("irr", "unlevered_irr"):
+        key = "levered" if metric == "irr" else "unlevered"
+        flows = dcf_cashflows([0.0, 1.0], [EXIT_CAP])[key][:, 0]
+        fixed, per_dollar = flows[0], flows[1] - flows[0]
+        disc = (1 + t[..., None]) ** -np.arange(len(fixed))
+        return -(disc @ fixed) / (disc @ per_dollar)
+    raise ValueError(f"unknown metric {metric!r}; expected one of {', '.join(SOLVER_METRICS)}")
+
+
+def max_price(**constraints):
+    """Highest price that meets every constraint at once.
+
+    Each keyword is a metric name and its minimum (a maximum for "grm"),
+    e.g. max_price(cap=0.055, dcr=1.20, coc=0.06). Returns (price, binding
+    metric, {metric: price at that constraint alone}).
+    """
+    if not constraints:
+        raise ValueError("max_price() needs at least one constraint")
+    limits = {m: float(solve_price(m, target)) for m, target in constraints.items()}
+    binding = min(limits, key=lambda m: limits[m])
+    return limits[binding], binding, limits
+
+
+# ============================================================
+# MONTE CARLO UNDERWRITING
+# ============================================================
+
+MC_TRIALS = 100000
+MC_SEED = 9015
+MC_DCR_THRESHOLD = 1.25
+MC_PERCENTILES = (5, 25, 50, 75, 95)
+
+# Market rent for each unit type moves together: one normal draw per type
+# per trial, as a fraction of the underwritten market rent.
+MC_RENT_SD_PCT = 0.06
+MC_VACANCY = (-0.03, 0.03)  # triangular, offsets from VACANCY_RATE (the mode and, unclipped, the mean)
+MC_EXPENSE_SD_PCT = 0.10
+MC_EXPENSE_SD_OVERRIDES = {"Real Estate Taxes": 0.02, "Operating Reserves": 0.0}
+MC_MGMT_FEE = (-0.01, 0.01)  # uniform, offsets from MGMT_FEE_PCT
+MC_RATE_SD = 0.0035
+
+
+def mc_range(center, offsets):
+    """(low, high) of a draw centered on an input rate, clipped to [0, 1]."""
+    return tuple(min(max(center + offset, 0.0), 1.0) for offset in offsets)
+
+
+@model.reads("rent_roll_summary", "VACANCY_RATE", "EXPENSES", "OTHER_INCOME_ANNUAL", "MGMT_FEE_PCT",
+             "INTEREST_RATE", "AMORT_YEARS", "loan_amount", "price", "down_payment")
+def run_monte_carlo(trials=None, seed=None):
+    """Simulate pro forma NOI, cap rate, DCR and cash-on-cash at the asking price.
+
+    Draws market rents per unit type, vacancy, each EXPENSES line, the
+    management fee and the interest rate, then evaluates every trial in one
+    batched pass. Vacancy and the management fee are drawn around
+    VACANCY_RATE and MGMT_FEE_PCT (see mc_range()). The same seed always
+    gives the same result. Returns the per-trial arrays plus {"percentiles": {metric: array}, "prob_dcr_below"}.
+    Trials and seed default to MC_TRIALS and MC_SEED.
+    """
+    trials = MC_TRIALS if trials is None else trials
+    seed = MC_SEED if seed is None else seed
+    rng = np.random.default_rng(seed)
+
+    type_rents = np.array([t["market_rent"] for t in rent_roll_summary["by_type"].values()], dtype=float)
+    rent_factors = 1 + MC_RENT_SD_PCT * rng.standard_normal((trials, len(type_rents)))
+    gsr = 12 * (rent_factors @ type_rents)
+
+    vacancy_low, vacancy_high = mc_range(VACANCY_RATE, MC_VACANCY)
+    vacancy_mode = min(max(VACANCY_RATE, vacancy_low), vacancy_high)
+    if vacancy_low < vacancy_high:
+        vacancy = rng.triangular(vacancy_low, vacancy_mode, vacancy_high, size=trials)
+    else:
+        vacancy = np.full(trials, vacancy_mode)
+    expense_base = np.array(list(EXPENSES.values()), dtype=float)
+    expense_sd = np.array([MC_EXPENSE_SD_OVERRIDES.get(k, MC_EXPENSE_SD_PCT) for k in EXPENSES])
+    expenses = np.maximum(expense_base * (1 + expense_sd * rng.standard_normal((trials, len(expense_base)))), 0)
+    mgmt_fee = rng.uniform(*mc_range(MGMT_FEE_PCT, MC_MGMT_FEE), size=trials)
+    rate = np.maximum(INTEREST_RATE + MC_RATE_SD * rng.standard_normal(trials), 0)
+
+    egi = gsr * (1 - vacancy) + OTHER_INCOME_ANNUAL
+    noi = egi * (1 - mgmt_fee) - expenses.sum(axis=1)
+    debt_service = loan_amount * loan_constants(rate, AMORT_YEARS)
+    result = {
+        "trials": trials,
+        "seed": seed,
+        "vacancy": vacancy,
+        "mgmt_fee": mgmt_fee,
+        "noi": noi,
+        "cap": noi / price,
+        "dcr": noi / debt_service,
+        "coc": (noi - debt_service) / down_payment,
+    }
+    result["percentiles"] = {m: np.percentile(result[m], MC_PERCENTILES) for m in ("noi", "cap", "dcr", "coc")}
+    result["prob_dcr_below"] = float(np.mean(result["dcr"] < MC_DCR_THRESHOLD))
+    return result
+
+
+model.define("monte_carlo", lambda MC_TRIALS, MC_SEED:
+             run_monte_carlo(MC_TRIALS, MC_SEED) if np is not None else None,
+             reads=run_monte_carlo.reads)
+
+
+# ============================================================
+# COMP SELECTION
+# ============================================================
+
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = EARTH_RADIUS_MILES * math.pi / 180
+COMP_RADIUS_MILES = 3.0
+# CompIndex grid cell size in degrees (about 3.5 miles north-south).
+COMP_CELL_DEG = 0.05
+# Numeric comp fields CompIndex can filter on, besides "date" (YYYYMM of
+# the comp's "sale_date" or "date").
+COMP_FIELDS = ("units", "sf", "year_built", "price", "rent", "bedrooms")
+_CELL_ROW = 1 << 32  # cell key = row * _CELL_ROW + column
+
+
+def distance_miles(a, b):
+    """Great-circle distance in miles between two (lat, lon) points."""
+    lat1, lon1, lat2, lon2 = map(math.radians, (*a, *b))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(h))
+
+
+def haversine_miles(lat, lon, lats, lons):
+    """distance_miles() from one point to arrays of points."""
+    lat, lon = math.radians(lat), math.radians(lon)
+    lats, lons = np.radians(lats), np.radians(lons)
+    h = np.sin((lats - lat) / 2) ** 2 + math.cos(lat) * np.cos(lats) * np.sin((lons - lon) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * np.arcsin(np.sqrt(np.minimum(h, 1.0)))
+
+
+def cell_key(lat, lon, cell_deg=COMP_CELL_DEG):
+    """Grid cell of a point, as stored in CompIndex and the comp store."""
+    return math.floor(lat / cell_deg) * _CELL_ROW + math.floor(lon / cell_deg)
+
+
+def cell_ranges(coords, within, cell_deg=COMP_CELL_DEG):
+    """Inclusive (first, last) cell keys covering a radius, one per cell row."""
+    lat, lon = coords
+    dlat = within / MILES_PER_DEGREE
+    dlon = dlat / max(math.cos(math.radians(lat)), 1e-6)
+    first_col = math.floor((lon - dlon) / cell_deg)
+    last_col = math.floor((lon + dlon) / cell_deg)
+    return [(row * _CELL_ROW + first_col, row * _CELL_ROW + last_col)
+            for row in range(math.floor((lat - dlat) / cell_deg), math.floor((lat + dlat) / cell_deg) + 1)]
+
+
+def comp_distance(comp):
+    """Miles from the subject to a comp; select_comps() stores it as "distance"."""
+    if "distance" in comp:
+        return comp["distance"]
+    return distance_miles(SUBJECT_COORDS, comp["coords"])
+
+
+class CompIndex:
+    """Grid index over a comp pool for radius and k-nearest queries.
+
+    Comps are dicts with "coords" (lat, lon) plus any COMP_FIELDS and a
+    "sale_date" or "date" of "MM/YYYY". Records are sorted by grid cell, so
+    each row of cells a query touches is one contiguous slice found by
+    binary search, and only those candidates get haversine distances.
+    """
+
+    def __init__(self, comps, cell_deg=COMP_CELL_DEG):
+        comps = list(comps)
+        coords = np.array([c["coords"] for c in comps], dtype=float).reshape(-1, 2)
+        keys = (np.floor(coords[:, 0] / cell_deg).astype(np.int64) * _CELL_ROW
+                + np.floor(coords[:, 1] / cell_deg).astype(np.int64))
+        order = np.argsort(keys, kind="stable")
+        self.cell_deg = cell_deg
+        self.keys = keys[order]
+        self.lat = coords[order, 0]
+        self.lon = coords[order, 1]
+        self.comps = [comps[i] for i in order]
+        self.fields = {}
+        for name in COMP_FIELDS:
+            values = (c.get(name) for c in self.comps)
+            self.fields[name] = np.array([v if isinstance(v, (int, float)) else None for v in values], dtype=float)
+        self.fields["date"] = np.array([month_key(c.get("sale_date", c.get("date"))) for c in self.comps], dtype=float)
+
+    def __len__(self):
+        return len(self.comps)
+
+    def query(self, coords, k=None, within=COMP_RADIUS_MILES, **ranges):
+        """Comps within `within` miles of `coords`, nearest first, as [(miles, comp)].
+
+        `k` caps the count. Each keyword is a field and an inclusive (low,
+        high) range with either end None, e.g. units=(20, None),
+        year_built=(1960, 1985), date=(202501, None). Comps missing a
+        filtered field are left out.
+        """
+        unknown = set(ranges) - set(self.fields)
+        if unknown:
+            raise ValueError(f"unknown comp field(s) {', '.join(sorted(unknown))}; expected {', '.join(self.fields)}")
+        first, last = np.array(cell_ranges(coords, within, self.cell_deg)).T
+        starts = np.searchsorted(self.keys, first, "left")
+        ends = np.searchsorted(self.keys, last, "right")
+        idx = np.concatenate([np.arange(s, e) for s, e in zip(starts, ends)])
+
+        dist = haversine_miles(*coords, self.lat[idx], self.lon[idx])
+        keep = dist <= within
+        for name, (low, high) in ranges.items():
+            values = self.fields[name][idx]
+            if low is not None:
+                keep &= values >= low
+            if high is not None:
+                keep &= values <= high
+        idx, dist = idx[keep], dist[keep]
+        if k is not None and len(idx) > k:
+            nearest = np.argpartition(dist, k - 1)[:k]
+            idx, dist = idx[nearest], dist[nearest]
+        order = np.argsort(dist, kind="stable")
+        return [(float(dist[i]), self.comps[idx[i]]) for i in order]
+
+
+def select_comps(index, k, within=COMP_RADIUS_MILES, coords=None, **ranges):
+    """The k nearest comps to the subject (or `coords`) for a comp table.
+
+    Returns copies numbered from 1, nearest first, each with its "distance"
+    in miles. Filters are as for CompIndex.query().
+    """
+    found = index.query(SUBJECT_COORDS if coords is None else coords, k, within, **ranges)
+    return [{**c, "num": i, "distance": miles} for i, (miles, c) in enumerate(found, 1)]
+
+
+# Fields the sale comp table needs besides an address and coordinates.
+SALE_COMP_REQUIRED = ("units", "sf", "price", "gross", "noi")
+
+
+def usable_sale_comps(comps, source):
+    """Yield the sale comps that have every SALE_COMP_REQUIRED field and
+    report the others, from `source`, on stderr."""
+    for c in comps:
+        missing = [name for name in SALE_COMP_REQUIRED if c.get(name) is None]
+        if missing:
+            print(f"{source}: skipped sale comp {c.get('address', '?')}: no {', '.join(missing)}", file=sys.stderr)
+        else:
+            yield c
+
+
+# ============================================================
+# COMP STORE
+# ============================================================
+
+# Override with BOV_COMP_DB.
+COMP_DB = os.environ.get("BOV_COMP_DB", os.path.join(os.path.dirname(os.path.abspath(__file__)), "comps.sqlite"))
+# Which comps the tables show when they come from the store (--comp-db).
+SALE_COMP_QUERY = {"k": 3, "within": 3.0, "units": (20, None)}
+RENT_COMP_QUERY = {"k": 8, "within": 6.0}
+
+_COMP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sale_comps (
+    address TEXT NOT NULL, city TEXT, units INTEGER, sf INTEGER, year_built INTEGER,
+    sale_date TEXT, sale_month INTEGER, price REAL, gross REAL, noi REAL, dom TEXT, notes TEXT,
+    lat REAL NOT NULL, lon REAL NOT NULL, cell INTEGER NOT NULL,
+    UNIQUE (address, sale_date)
+);
+CREATE INDEX IF NOT EXISTS sale_comps_cell_month ON sale_comps (cell, sale_month);
+CREATE INDEX IF NOT EXISTS sale_comps_cell_units ON sale_comps (cell, units);
+CREATE TABLE IF NOT EXISTS rent_comps (
+    address TEXT NOT NULL, type TEXT, bedrooms INTEGER, sf INTEGER, rent REAL,
+    date TEXT, lease_month INTEGER,
+    lat REAL NOT NULL, lon REAL NOT NULL, cell INTEGER NOT NULL,
+    UNIQUE (address, type, date)
+);
+CREATE INDEX IF NOT EXISTS rent_comps_bedrooms_cell_month ON rent_comps (bedrooms, cell, lease_month);
+"""
+
+# Run once per cell row a query touches, with the filters applied as the
+# cell index is walked; open range ends are passed as NULL. The rows
+# found go into a CompIndex, which ranks them by distance.
+_SALE_COMP_SQL = """
+SELECT address, city, units, sf, year_built, sale_date, price, gross, noi, dom, notes, lat, lon
+FROM sale_comps
+WHERE cell BETWEEN :first AND :last
+  AND (:units_min IS NULL OR units >= :units_min) AND (:units_max IS NULL OR units <= :units_max)
+  AND (:built_min IS NULL OR year_built >= :built_min) AND (:built_max IS NULL OR year_built <= :built_max)
+  AND (:since IS NULL OR sale_month >= :since)
+"""
+_RENT_COMP_SQL = """
+SELECT address, type, bedrooms, sf, rent, date, lat, lon
+FROM rent_comps
+WHERE bedrooms = :bedrooms AND cell BETWEEN :first AND :last
+  AND (:since IS NULL OR lease_month >= :since)
+"""
+
+_comp_stores = {}
+
+
+def read_comp_file(path):
+    """Yield comp dicts from a JSON list (shaped like SALE_COMPS) or a CSV/XLSX
+    export whose first row names the fields, with "lat" and "lon" columns."""
+    if path.lower().endswith(".json"):
+        with open(path, encoding='utf-8') as f:
+            yield from json.load(f)
+        return
+    rows = _sheet_rows(path)
+    header = [str(c).strip().lower() if c is not None else "" for c in next(rows)]
+    numeric = COMP_FIELDS + ("gross", "noi")
+    for cells in rows:
+        comp = {name: cell for name, cell in zip(header, cells) if name and cell not in (None, "")}
+        if comp:
+            for name in numeric:
+                if isinstance(comp.get(name), str):
+                    comp[name] = _cell_number(comp[name])
+            comp["coords"] = (float(comp.pop("lat")), float(comp.pop("lon")))
+            yield comp
+
+
+class CompStore:
+    """SQLite store of sale and rent comps shared across BOVs.
+
+    Rows are indexed by grid cell (cell_key()), rent comps by bedroom
+    count and cell. A query fetches the matching rows in the cells it
+    touches into a CompIndex and selects from that, returning
+    dicts shaped like SALE_COMPS and RENT_COMPS_*, nearest first, numbered
+    and with their distance.
+    """
+
+    def __init__(self, path=COMP_DB):
+        import sqlite3
+
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(_COMP_SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def import_sale_comps(self, comps, source=None):
+        """Insert or replace sale comps in one transaction; returns the count.
+
+        Comps without every SALE_COMP_REQUIRED field are skipped and
+        reported as coming from `source`.
+        """
+        rows = []
+        for c in usable_sale_comps(comps, source or self.path):
+            lat, lon = c["coords"]
+            rows.append((c["address"], c.get("city"), c.get("units"), c.get("sf"), c.get("year_built"),
+                         c.get("sale_date"), month_key(c.get("sale_date")), c.get("price"), c.get("gross"),
+                         c.get("noi"), c.get("dom"), c.get("notes"), lat, lon, cell_key(lat, lon)))
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO sale_comps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def import_rent_comps(self, comps):
+        """Insert or replace rent comps in one transaction; returns the count.
+
+        Bedrooms default to bedrooms_of() the comp's "type".
+        """
+        rows = []
+        for c in comps:
+            lat, lon = c["coords"]
+            bedrooms = c["bedrooms"] if c.get("bedrooms") is not None else bedrooms_of(c.get("type"))
+            rows.append((c["address"], c.get("type"), bedrooms, c.get("sf"), c.get("rent"),
+                         c.get("date"), month_key(c.get("date")), lat, lon, cell_key(lat, lon)))
+        with self.conn:
+            self.conn.executemany("INSERT OR REPLACE INTO rent_comps VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _rows(self, sql, coords, within, defaults, params):
+        """The comps matching `params` in the grid cells within `within`
+        miles of `coords`."""
+        comps = []
+        for first, last in cell_ranges(coords, within):
+            cursor = self.conn.execute(sql, {**params, "first": first, "last": last})
+            names = [d[0] for d in cursor.description]
+            for row in cursor:
+                comp = {**defaults, **{n: v for n, v in zip(names, row) if v is not None}}
+                comp["coords"] = (comp.pop("lat"), comp.pop("lon"))
+                comps.append(comp)
+        return comps
+
+    def sale_comps(self, k=None, within=COMP_RADIUS_MILES, coords=None, units=(None, None),
+                   year_built=(None, None), since=None):
+        """Sale comps within `within` miles, nearest first. `units` and
+        `year_built` are inclusive (low, high) ranges; `since` is a YYYYMM."""
+        coords = SUBJECT_COORDS if coords is None else coords
+        params = {"units_min": units[0], "units_max": units[1], "built_min": year_built[0],
+                  "built_max": year_built[1], "since": since}
+        rows = self._rows(_SALE_COMP_SQL, coords, within, {"city": "", "dom": "N/A", "notes": ""}, params)
+        index = CompIndex(usable_sale_comps(rows, self.path))
+        return select_comps(index, k, within, coords, units=units, year_built=year_built, date=(since, None))
+
+    def rent_comps(self, bedrooms, k=None, within=COMP_RADIUS_MILES, coords=None, since=None):
+        """Rent comps with `bedrooms` bedrooms within `within` miles, nearest first."""
+        coords = SUBJECT_COORDS if coords is None else coords
+        index = CompIndex(self._rows(_RENT_COMP_SQL, coords, within, {}, {"bedrooms": bedrooms, "since": since}))
+        return select_comps(index, k, within, coords, bedrooms=(bedrooms, bedrooms), date=(since, None))
+
+
+def open_comp_store(path=COMP_DB):
+    """The CompStore for `path`, opened once per process and reused."""
+    key = (path, os.getpid())
+    if key not in _comp_stores:
+        _comp_stores[key] = CompStore(path)
+    return _comp_stores[key]
+
+
+def comps_from_store(store, coords=None):
+    """SALE_COMPS and RENT_COMPS_3BR/4BR selected from `store` by
+    SALE_COMP_QUERY and RENT_COMP_QUERY, ready for model.set()."""
+    comps = {
+        "SALE_COMPS": store.sale_comps(coords=coords, **SALE_COMP_QUERY),
+        "RENT_COMPS_3BR": store.rent_comps(3, coords=coords, **RENT_COMP_QUERY),
+        "RENT_COMPS_4BR": store.rent_comps(4, coords=coords, **RENT_COMP_QUERY),
+    }
+    for name, found in comps.items():
+        if not found:
+            raise ValueError(f"{store.path} has no {name} matches near {coords or SUBJECT_COORDS}")
+    return comps
+
+
+def comps_from_pool(path, coords=None):
+    """SALE_COMPS selected by SALE_COMP_QUERY from a large comp file (see
+    read_comp_file()) through a CompIndex, ready for model.set()."""
+    index = CompIndex(usable_sale_comps(read_comp_file(path), path))
+    found = select_comps(index, coords=coords, **SALE_COMP_QUERY)
+    if not found:
+        raise ValueError(f"{path} has no SALE_COMPS matches near {coords or SUBJECT_COORDS}")
+    return {"SALE_COMPS": [{"city": "", "dom": "N/A", "notes": "", **c} for c in found]}
+
+
+# ============================================================
+# COMP STATISTICS
+# ============================================================
+
+COMP_TRIM = 0.10  # trimmed mean drops this share of comps from each end
+COMP_DISTANCE_SCALE = 2.0  # miles at which a comp's weight halves
+COMP_HALF_LIFE_MONTHS = 12  # age, from the newest comp, at which a comp's weight halves
+# Estimate that replaces the rent roll's market rents, one of
+# MARKET_RENT_METHODS; None keeps the underwritten RENT_ROLL values.
+MARKET_RENT_METHODS = ("median", "trimmed_mean", "psf", "weighted", "regression")
+MARKET_RENT_METHOD = None
+MARKET_RENT_ROUND = 25  # derived rents are rounded to this many dollars
+
+
+def comp_stats(comps, subject_sf=None):
+    """Rent estimates from one bedroom type's rent comps, vectorized.
+
+    Returns {"count", "mean", "mean_psf", "median", "trimmed_mean",
+    "median_psf", "psf" (median $/SF x subject_sf), "weighted" (by
+    distance and recency), "regression" (rent fitted to SF, at
+    subject_sf), "slope", "intercept", "r2", "subject_sf"}. `subject_sf`
+    defaults to the comps' median SF.
+    """
+    rent = np.array([c["rent"] for c in comps], dtype=float)
+    sf = np.array([c["sf"] for c in comps], dtype=float)
+    coords = np.array([c["coords"] for c in comps], dtype=float).reshape(-1, 2)
+    months = np.array([month_key(c.get("date")) for c in comps], dtype=float)
+    n = len(rent)
+    psf = rent / sf
+    subject_sf = float(np.median(sf)) if subject_sf is None else subject_sf
+
+    months = months // 100 * 12 + months % 100
+    age = np.nan_to_num(np.nanmax(months) - months) if np.isfinite(months).any() else np.zeros(n)
+    distance = haversine_miles(*SUBJECT_COORDS, coords[:, 0], coords[:, 1])
+    weights = 0.5 ** (age / COMP_HALF_LIFE_MONTHS) / (1 + distance / COMP_DISTANCE_SCALE)
+
+    cut = int(n * COMP_TRIM)
+    if n > 1 and np.ptp(sf) > 0:
+        slope, intercept = np.polyfit(sf, rent, 1)
+        resid = rent - (slope * sf + intercept)
+        spread = ((rent - rent.mean()) ** 2).sum()
+        r2 = 1 - (resid ** 2).sum() / spread if spread else 0.0
+    else:
+        slope, intercept, r2 = 0.0, rent.mean(), 0.0
+    return {
+        "count": n,
+        "mean": float(rent.mean()),
+        "mean_psf": float(psf.mean()),
+        "median": float(np.median(rent)),
+        "trimmed_mean": float(np.sort(rent)[cut:n - cut].mean()),
+        "median_psf": float(np.median(psf)),
+        "psf": float(np.median(psf) * subject_sf),
+        "weighted": float(np.average(rent, weights=weights)),
+        "regression": float(slope * subject_sf + intercept),
+        "slope": float(slope),
+        "intercept": float(intercept),
+        "r2": float(r2),
+        "subject_sf": subject_sf,
+    }
+
+
+def _rent_comp_stats(RENT_ROLL, RENT_COMPS_3BR, RENT_COMPS_4BR):
+    if np is None:
+        return None
+    mix = bedroom_mix(summarize_rent_roll(RENT_ROLL))
+    stats = {}
+    for bedrooms, comps in ((3, RENT_COMPS_3BR), (4, RENT_COMPS_4BR)):
+        if comps:
+            group = mix.get(bedrooms)
+            stats[bedrooms] = comp_stats(comps, group["sf"] / group["units"] if group else None)
+    return stats
+
+
+def _market_rents(rent_comp_stats, MARKET_RENT_METHOD):
+    if MARKET_RENT_METHOD is None or rent_comp_stats is None:
+        return {}
+    if MARKET_RENT_METHOD not in MARKET_RENT_METHODS:
+        raise ValueError(f"unknown MARKET_RENT_METHOD {MARKET_RENT_METHOD!r}; expected one of {', '.join(MARKET_RENT_METHODS)}")
+    return {bedrooms: round(s[MARKET_RENT_METHOD] / MARKET_RENT_ROUND) * MARKET_RENT_ROUND
+            for bedrooms, s in rent_comp_stats.items()}
+
+
+def _rent_roll(RENT_ROLL, market_rents):
+    if not market_rents:
+        return RENT_ROLL
+    if isinstance(RENT_ROLL, RentRoll):
+        return RENT_ROLL.remarket(market_rents)
+    return [{**u, "market_rent": market_rents.get(bedrooms_of(u["type"]), u["market_rent"])} for u in RENT_ROLL]
+
+
+model.define("rent_comp_stats", _rent_comp_stats, reads=("SUBJECT_COORDS",))
+model.define("market_rents", _market_rents)
+model.define("rent_roll", _rent_roll)
+
+
+# ============================================================
+# IMAGE ENCODING
+# ============================================================
+
+def load_images(specs, max_workers=IMAGE_WORKERS):
+    """Prepare images concurrently and return {name: responsive_image()}.
+
+    `specs` maps a name to (path, role). Every image is attempted; failures
+    (missing or unreadable files) are raised together in one OSError.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    # LazyLoader is not thread-safe: finish importing Pillow here, before
+    # several workers touch it at once.
+    if Image is not None:
+        Image.open, ImageOps.exif_transpose
+    results = {}
+    errors = []
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(specs)))) as pool:
+        futures = {name: pool.submit(responsive_image, path, role) for name, (path, role) in specs.items()}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except OSError as e:
+                errors.append(f"  {name}: {specs[name][0]} ({e.strerror or e})")
+    if errors:
+        raise OSError(f"{len(errors)} image(s) could not be loaded:\n" + "\n".join(errors))
+    return results
+
+
+# Branding is the same in every BOV; the photos come with the property.
+BRAND_SPECS = {
+    "logo": (LOGO_WHITE, "logo"),
+    "glen": (HEADSHOT_GLEN, "headshot"),
+    "filip": (HEADSHOT_FILIP, "headshot"),
+    "blake": (HEADSHOT_BLAKE, "headshot"),
+}
+
+model.define("images", lambda HERO_PHOTO, GRID_PHOTOS, BRAND_SPECS: load_images({
+    "hero": (HERO_PHOTO, "cover"),
+    **{f"grid_{i}": (p, "grid") for i, p in enumerate(GRID_PHOTOS)},
+    **BRAND_SPECS,
+}))
+model.define("hero_img", lambda images: images["hero"])
+model.define("grid_imgs", lambda images, GRID_PHOTOS: [images[f"grid_{i}"] for i in range(len(GRID_PHOTOS))])
+model.define("logo_img", lambda images: images["logo"])
+model.define("glen_img", lambda images: images["glen"])
+model.define("filip_img", lambda images: images["filip"])
+model.define("blake_img", lambda images: images["blake"])
+
+
+# ============================================================
+# HTML GENERATION
+# ============================================================
+
+def build_css():
+    return """
+@import url('https://fonts.googleapis.com/css2?family=Inter:wght@300;400;500;600;700&display=swap');
+
+* { margin: 0; padding: 0; box-sizing: border-box; }
+body { font-family: 'Inter', sans-serif; color: #333; background: #fff; line-height: 1.6; }
+.page { max-width: 1100px; margin: 0 auto; }
+
+/* Cover */
+.cover { background: #1B3A5C; color: #fff; padding: 48px 40px; text-align: center; min-height: 100vh; display: flex; flex-direction: column; justify-content: center; align-items: center; }
+.cover-logo { width: 320px; height: auto; margin-bottom: 30px; }
+.cover-label { font-size: 11px; font-weight: 600; text-transform: uppercase; letter-spacing: 3px; color: #C5A258; margin-bottom: 20px; }
+.cover-title { font-size: 42px; font-weight: 700; margin-bottom: 6px; }
+.cover-address { font-size: 22px; font-weight: 300; color: rgba(255,255,255,0.8); margin-bottom: 24px; }
+.cover-divider { width: 80px; height: 2px; background: #C5A258; margin: 0 auto 24px; }
+.cover-price-label { font-size: 12px; font-weight: 600; text-transform: uppercase; letter-spacing: 2px; color: #C5A258; margin-bottom: 8px; }
+.cover-price { font-size: 48px; font-weight: 700; margin-bottom: 28px; }
+.cover-stats { display: flex; gap: 36px; justify-content: center; margin-bottom: 28px; flex-wrap: wrap; }
+.cover-stat { text-align: center; }
+.cover-stat-value { font-size: 24px; font-weight: 700; display: block; }
+.cover-stat-label { font-size: 10px; font-weight: 600; text-transform: uppercase; letter-spacing: 1.5px; color: #C5A258; display: block; }
+.client-greeting { font-size: 14px; font-weight: 300; letter-spacing: 2px; text-transform: uppercase; color: rgba(255,255,255,0.7); margin-bottom: 28px; }
+.cover-photo { width: 100%; height: auto; max-height: 300px; object-fit: cover; border: 3px solid #C5A258; border-radius: 4px; margin-top: 10px; }
+
+/* Sections */
+.section { padding: 48px 40px; }
+.section-alt { background: #f8f9fa; }
+.section-title { font-size: 28px; font-weight: 700; color: #1B3A5C; margin-bottom: 6px; }
+.section-subtitle { font-size: 12px; font-weight: 600; text-transform: uppercase; letter-spacing: 2px; color: #C5A258; margin-bottom: 16px; }
+.gold-divider { width: 60px; height: 3px; background: linear-gradient(to right, #C5A258, #d4b96a); margin-bottom: 28px; }
+
+/* Photo Grid */
+.photo-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 12px; margin-bottom: 28px; }
+.photo-grid img { width: 100%; height: 220px; object-fit: cover; border-radius: 4px; border: 1px solid #ddd; }
+
+/* Narrative */
+.narrative { margin-bottom: 28px; }
+.narrative p { font-size: 14px; line-height: 1.7; margin-bottom: 14px; color: #444; }
+
+/* Info Table (2-col key-value) */
+.info-table { width: 100%; border-collapse: collapse; margin-bottom: 28px; }
+.info-table td { padding: 10px 14px; font-size: 13px; border-bottom: 1px solid #e0e0e0; }
+.info-table td:first-child { font-weight: 600; color: #1B3A5C; width: 40%; }
+
+/* Data Tables */
+table { width: 100%; border-collapse: collapse; margin-bottom: 24px; font-size: 13px; }
+th { background: #1B3A5C; color: #fff; padding: 10px 8px; text-align: left; font-size: 11px; font-weight: 600; text-transform: uppercase; letter-spacing: 0.5px; }
+td { padding: 9px 8px; border-bottom: 1px solid #e0e0e0; }
+tr:nth-child(even) { background: #f5f5f5; }
+tr.summary { background: #e8edf2; font-weight: 600; }
+tr.highlight { background: #FFF8E7; border-left: 3px solid #C5A258; border-right: 3px solid #C5A258; }
+tr.highlight td { font-weight: 600; }
+.table-note { font-size: 11px; color: #888; font-style: italic; margin-top: -16px; margin-bottom: 24px; }
+.table-scroll { margin-bottom: 24px; }
+
+/* Heat Map Tables */
+.heatmap td { text-align: center; }
+.heatmap td:first-child { text-align: left; font-weight: 600; }
+.heatmap td.base { outline: 2px solid #1B3A5C; outline-offset: -2px; font-weight: 700; }
+
+/* Metrics Grid */
+.metrics-grid { display: grid; grid-template-columns: repeat(3, 1fr); gap: 16px; margin-bottom: 32px; }
+.metric-card { background: #1B3A5C; color: #fff; padding: 20px 16px; border-radius: 6px; text-align: center; }
+.metric-value { font-size: 28px; font-weight: 700; display: block; }
+.metric-label { font-size: 10px; font-weight: 600; text-transform: uppercase; letter-spacing: 1px; color: #C5A258; margin-top: 6px; display: block; }
+.metric-sub { font-size: 12px; color: rgba(255,255,255,0.6); margin-top: 4px; display: block; }
+
+/* Two Column */
+.two-col { display: grid; grid-template-columns: 1fr 1fr; gap: 28px; margin-bottom: 28px; }
+.calc-panel { background: #f4f6f9; border: 1px solid #dce3eb; border-radius: 6px; padding: 4px 20px 16px; margin-bottom: 28px; }
+.calc-grid { display: grid; grid-template-columns: repeat(3, 1fr); gap: 12px 20px; }
+.calc-grid label { font-size: 12px; font-weight: 600; color: #1B3A5C; display: flex; flex-direction: column; gap: 4px; }
+.calc-grid input[type=number] { font: inherit; font-weight: 400; padding: 4px 6px; border: 1px solid #ccc; border-radius: 3px; }
+.calc-reset { margin-top: 12px; font: inherit; font-size: 12px; color: #1B3A5C; background: #fff; border: 1px solid #1B3A5C; border-radius: 3px; padding: 4px 12px; cursor: pointer; }
+.two-col h3 { font-size: 16px; font-weight: 600; color: #1B3A5C; margin-bottom: 12px; }
+
+/* Sub headings */
+.sub-heading { font-size: 18px; font-weight: 600; color: #1B3A5C; margin: 28px 0 12px; }
+
+/* Condition Note */
+.condition-note { background: #FFF8E7; border-left: 4px solid #C5A258; padding: 16px 20px; margin: 20px 0; border-radius: 0 4px 4px 0; font-size: 13px; line-height: 1.6; }
+.condition-note strong { color: #1B3A5C; }
+
+/* Buyer Profile Callout */
+.buyer-profile { background: #f0f4f8; border-left: 4px solid #1B3A5C; padding: 20px 24px; margin: 24px 0; border-radius: 0 4px 4px 0; }
+.buyer-profile-label { font-size: 12px; font-weight: 700; text-transform: uppercase; letter-spacing: 1.5px; color: #1B3A5C; margin-bottom: 12px; }
+.buyer-profile ul { list-style: none; padding: 0; margin: 0; }
+.buyer-profile li { padding: 8px 0; border-bottom: 1px solid #dce3eb; font-size: 14px; line-height: 1.6; color: #333; }
+.buyer-profile li:last-child { border-bottom: none; }
+.buyer-profile li strong { color: #1B3A5C; }
+.buyer-profile .bp-closing { font-size: 13px; color: #555; margin-top: 12px; font-style: italic; }
+
+/* Leaflet Maps */
+.map-frame { position: relative; height: 400px; margin-bottom: 30px; }
+.leaflet-map { height: 100%; border-radius: 4px; border: 1px solid #ddd; z-index: 1; }
+.map-static { position: absolute; inset: 0; width: 100%; height: 100%; z-index: 2; box-sizing: border-box; background: #EEF1F4; border-radius: 4px; border: 1px solid #ddd; }
+.map-live .map-static { display: none; }
+.map-static .map-pin circle { fill: #1B3A5C; stroke: #fff; stroke-width: 2; }
+.map-static .map-pin text { fill: #fff; font-size: 12px; font-weight: 700; text-anchor: middle; }
+.map-static .map-pin-subject circle { fill: #C5A258; }
+.map-static .map-pin-subject text { font-size: 16px; }
+.map-static .map-cluster circle { fill: rgba(27,58,92,0.9); stroke: rgba(27,58,92,0.25); stroke-width: 10; paint-order: stroke; }
+.map-ring { fill: none; stroke: #1B3A5C; stroke-opacity: 0.35; stroke-dasharray: 4 4; }
+.map-ring-label { fill: #1B3A5C; font-size: 11px; text-anchor: middle; opacity: 0.7; }
+.map-scale path { fill: none; stroke: #333; stroke-width: 2; }
+.map-scale text { fill: #333; font-size: 11px; text-anchor: middle; }
+.map-pin { background: #1B3A5C; color: #fff; border-radius: 50%; display: flex; align-items: center; justify-content: center; font-size: 12px; font-weight: 700; border: 2px solid #fff; box-shadow: 0 2px 4px rgba(0,0,0,0.3); }
+.map-pin-subject { background: #C5A258; font-size: 16px; box-shadow: 0 2px 6px rgba(0,0,0,0.4); }
+.map-cluster { background: rgba(27,58,92,0.9); font-size: 13px; box-shadow: 0 0 0 5px rgba(27,58,92,0.25); }
+
+/* Footer */
+.footer { background: #1B3A5C; color: #fff; padding: 48px 40px; text-align: center; }
+.footer-logo { width: 280px; height: auto; margin-bottom: 28px; }
+.footer-team { display: flex; justify-content: center; gap: 20px; flex-wrap: wrap; margin-bottom: 28px; }
+.footer-person { text-align: center; flex: 1; min-width: 240px; }
+.footer-headshot { width: 60px; height: 60px; border-radius: 50%; border: 2px solid #C5A258; object-fit: cover; margin-bottom: 10px; }
+.footer-name { font-size: 15px; font-weight: 600; display: block; }
+.footer-title { font-size: 11px; color: #C5A258; text-transform: uppercase; letter-spacing: 1px; display: block; margin-bottom: 6px; }
+.footer-contact { font-size: 12px; color: rgba(255,255,255,0.7); line-height: 1.5; }
+.footer-contact a { color: rgba(255,255,255,0.7); text-decoration: none; }
+.footer-office { font-size: 12px; color: rgba(255,255,255,0.5); margin-bottom: 20px; }
+.footer-disclaimer { font-size: 10px; color: rgba(255,255,255,0.4); line-height: 1.5; max-width: 800px; margin: 0 auto; }
+
+/* Print */
+@media print {
+  body { -webkit-print-color-adjust: exact !important; print-color-adjust: exact !important; }
+  .page { max-width: 100%; }
+  .cover { min-height: auto !important; padding: 24px 36px; page-break-after: always; }
+  .section { padding: 24px 36px; page-break-before: always; }
+  table { page-break-inside: auto; font-size: 11px; }
+  tr { page-break-inside: avoid; }
   thead { display: table-header-group; }
   .leaflet-map { display: none !important; }
-  .map-fallback { display: block !important; }
+  .map-frame { height: auto; page-break-inside: avoid; }
+  .map-static { display: block !important; position: static; height: auto; }
+  .calc-panel { display: none !important; }
   .metrics-grid { page-break-inside: avoid; }
   .condition-note { page-break-inside: avoid; }
   .buyer-profile { page-break-inside: avoid; }
@@ -520,7 +2234,8 @@ tr.highlight td { font-weight: 600; }
   .metrics-grid { grid-template-columns: repeat(2, 1fr); gap: 12px; }
   .metric-card { padding: 14px 10px; }
   .metric-value { font-size: 22px; }
-  .leaflet-map { height: 300px; }
+  .map-frame { height: 300px; }
+  .calc-grid { grid-template-columns: 1fr 1fr; }
   .footer { padding: 30px 16px; }
   .footer-logo { width: 200px; }
   .footer-team { flex-direction: column; gap: 20px; }
@@ -535,10 +2250,100 @@ tr.highlight td { font-weight: 600; }
 """
 
 
+def month_key(date):
+    """"MM/YYYY" -> YYYYMM, or None when the date is missing or unparseable."""
+    month, _, year = str(date).partition("/")
+    try:
+        return int(year) * 100 + int(month)
+    except ValueError:
+        return None
+
+
+_NUMBER_WORDS = ("no", "one", "two", "three", "four", "five", "six", "seven", "eight", "nine", "ten")
+
+
+def number_word(n):
+    """Spell out small counts for narrative text: 3 -> "three"."""
+    return _NUMBER_WORDS[n] if n < len(_NUMBER_WORDS) else str(n)
+
+
+@model.reads("price", "price_per_unit", "total_current_monthly", "current_gsr_annual", "market_gsr_annual",
+             "rent_upside_pct", "market_cap", "rent_roll_summary")
+def narrative_figures():
+    """The names NARRATIVE templates may use: PROPERTY's fields, money and
+    areas formatted, plus the headline figures, the unit mix from the rent
+    roll and the rent range of each bedroom type's comps."""
+    figures = dict(PROPERTY)
+    for key in ("building_sf", "lot_sf"):
+        if key in PROPERTY:
+            figures[key] = fmt_num(PROPERTY[key])
+    for key in ("suggested_price", "assessed_value", "annual_tax", "existing_loan"):
+        if key in PROPERTY:
+            figures[key] = fmt_price(PROPERTY[key])
+    figures.update(
+        unit_sf=fmt_num(math.floor(PROPERTY["building_sf"] / PROPERTY["units"] + 0.5)),
+        price=fmt_price(price),
+        price_per_unit=fmt_price(price_per_unit),
+        avg_current_rent=fmt_price(total_current_monthly / PROPERTY["units"]),
+        current_gsr=fmt_price(current_gsr_annual),
+        market_gsr=fmt_price(market_gsr_annual),
+        rent_upside=fmt_pct(rent_upside_pct),
+        market_cap=fmt_pct(market_cap),
+        occupancy=fmt_pct(1 - VACANCY_RATE),
+    )
+
+    # Unit mix by bedrooms and baths; a half bath counts as a bathroom.
+    mix = {}
+    for unit_type, t in rent_roll_summary["by_type"].items():
+        group = mix.setdefault((bedrooms_of(unit_type) or 0, baths_of(unit_type)), [0, 0])
+        group[0] += t["units"]
+        group[1] += t["sf"]
+    figures.update(
+        unit_mix=_and(f"{fmt_num(units)} {_bedroom_label(bedrooms)}{f'/{baths:g}-bath' if baths else ''} units "
+                      f"at {fmt_num(sf / units)} SF" for (bedrooms, baths), (units, sf) in sorted(mix.items())),
+        bedrooms=fmt_num(sum(bedrooms * units for (bedrooms, _), (units, _) in mix.items())),
+        bathrooms=fmt_num(sum(math.ceil(baths or 0) * units for (_, baths), (units, _) in mix.items())),
+        comp_rents=_and(f"{_bedroom_label(bedrooms)} units achieve {fmt_price(min(c['rent'] for c in comps))}"
+                        f"-{fmt_price(max(c['rent'] for c in comps))}/month"
+                        for bedrooms, comps in ((3, RENT_COMPS_3BR), (4, RENT_COMPS_4BR)) if comps),
+    )
+    return figures
+
+
+def _bedroom_label(bedrooms):
+    return f"{number_word(bedrooms)}-bedroom" if bedrooms else "studio"
+
+
+def _and(items):
+    """Join phrases for narrative text: "a", "a and b", "a, b and c"."""
+    items = list(items)
+    return ", ".join(items[:-1]) + " and " + items[-1] if len(items) > 1 else "".join(items)
+
+
+# narrative_figures() the calculator recomputes (its bovUnderwrite() keys).
+LIVE_FIGURES = ("price", "price_per_unit", "market_cap")
+
+
+def narrative(section, live=False):
+    """NARRATIVE[section] as a list of HTML strings, filled in from
+    narrative_figures().
+
+    With `live`, the LIVE_FIGURES are wrapped in data-calc spans, so the
+    calculator keeps the text in step with its inputs.
+    """
+    entries = NARRATIVE.get(section, ())
+    if not entries:
+        return []
+    figures = narrative_figures()
+    if live:
+        figures.update({key: f'<span data-calc="{key}">{figures[key]}</span>' for key in LIVE_FIGURES})
+    return [text.format_map(figures) for text in entries]
+
+
 def build_cover():
     return f"""
 <div class="cover">
-  <img src="{logo_b64}" alt="LAAA Team" class="cover-logo">
+  <img {img_attrs(logo_img)} alt="LAAA Team" class="cover-logo">
   <div class="cover-label">Broker Opinion of Value</div>
   <h1 class="cover-title">{PROPERTY['address']}</h1>
   <p class="cover-address">{PROPERTY['city_state_zip']}</p>
@@ -552,61 +2357,67 @@ def build_cover():
     <div class="cover-stat"><span class="cover-stat-value">{PROPERTY['lot_acres']}</span><span class="cover-stat-label">Acres</span></div>
   </div>
   <p class="client-greeting" id="client-greeting">Prepared Exclusively for {PROPERTY['owner']}</p>
-  <img src="{hero_b64}" alt="{PROPERTY['address']}" class="cover-photo">
+  <img {img_attrs(hero_img)} alt="{PROPERTY['address']}" class="cover-photo">
 </div>
 """
 
 
 def build_property_overview():
-    grid_imgs = "".join(f'<img src="{b}" alt="Property Photo">' for b in grid_b64)
-    
+    grid_html = "".join(f'<img {img_attrs(img)} alt="Property Photo" loading="lazy">' for img in grid_imgs)
+    paragraphs = "\n    ".join(f"<p>{p}</p>" for p in narrative("overview"))
+    if paragraphs:
+        paragraphs = f"""<div class="narrative">
+    {paragraphs}
+  </div>"""
+    buyer_profile = "\n      ".join(f"<li>{item}</li>" for item in narrative("buyer_profile"))
+    if buyer_profile:
+        buyer_profile = f"""<div class="buyer-profile">
+    <div class="buyer-profile-label">Target Buyer Profile</div>
+    <ul>
+      {buyer_profile}
+    </ul>
+    <p class="bp-closing">Broad appeal across buyer segments supports competitive pricing and a short expected marketing period.</p>
+  </div>"""
+
+    info = (
+        ("Address", PROPERTY["full_address"]),
+        ("APN", PROPERTY.get("apn")),
+        ("Year Built", PROPERTY["year_built"]),
+        ("Total Units", PROPERTY["units"]),
+        ("Building Size", f"&plusmn;{fmt_num(PROPERTY['building_sf'])} SF"),
+        ("Lot Size", f"&plusmn;{fmt_num(PROPERTY['lot_sf'])} SF / {PROPERTY['lot_acres']} Acres" if "lot_sf" in PROPERTY else None),
+        ("Construction", PROPERTY.get("construction")),
+        ("Stories", PROPERTY.get("stories")),
+        ("Zoning", PROPERTY.get("zoning")),
+        ("TOC Tier", PROPERTY.get("toc_tier")),
+        ("Rent Control", PROPERTY.get("rent_control")),
+        ("Parking", PROPERTY.get("parking")),
+        ("Community Plan", PROPERTY.get("community_plan")),
+    )
+    info_rows = "\n    ".join(f"<tr><td>{label}</td><td>{value}</td></tr>" for label, value in info if value is not None)
+
     return f"""
 <div class="section">
   <h2 class="section-title">Property Overview</h2>
   <div class="section-subtitle">{PROPERTY['full_address']}</div>
   <div class="gold-divider"></div>
   
-  <div class="photo-grid">{grid_imgs}</div>
+  <div class="photo-grid">{grid_html}</div>
   
-  <div class="narrative">
-    <p>The LAAA Team is proud to present {PROPERTY['address']}, a {PROPERTY['units']}-unit townhouse-style multifamily community on an oversized {PROPERTY['lot_acres']}-acre parcel in the western San Fernando Valley's Canoga Park neighborhood. Constructed in {PROPERTY['year_built']}, the property comprises approximately {fmt_num(PROPERTY['building_sf'])} square feet across {PROPERTY['units']} two-story units averaging approximately 1,217 square feet each. The unit mix includes 10 three-bedroom/1.5-bath units at 1,100 SF and 10 four-bedroom/2-bath units at 1,350 SF, totaling 70 bedrooms and 40 bathrooms. This family-sized product type commands premium rents in a market heavily saturated with studio and one-bedroom inventory and historically experiences lower tenant turnover.</p>
-    
-    <p>The property is subject to the City of Los Angeles Rent Stabilization Ordinance (RSO). With nearly 40 years of continuous ownership under the current seller, in-place rents averaging {fmt_price(total_current_monthly / PROPERTY['units'])}/month are significantly below market levels, where comparable unrenovated three-bedroom units achieve $2,850-$3,100/month and four-bedroom units achieve $3,700-$3,850/month. Costa-Hawkins vacancy decontrol allows rents to reset to market upon unit turnover, creating a phased value-add opportunity that preserves cash flow during execution. Interior renovations at turnover, estimated at $20,000-$30,000 per unit, can drive an additional 25-35% rent premium. Current annual income totals {fmt_price(current_gsr_annual)} with a pro forma gross of {fmt_price(market_gsr_annual)}, representing {fmt_pct(rent_upside_pct)} upside.</p>
-    
-    <p><strong>Location.</strong> The subject property is situated in the western San Fernando Valley's Canoga Park neighborhood, a predominantly residential community experiencing significant investment momentum driven by its proximity to the Warner Center employment hub. The immediate area benefits from designation as a Transit Priority Area with access to the Metro G Line Bus Rapid Transit system, currently undergoing a $668M improvement project scheduled for completion in 2027 that will enhance connectivity to the Metro Red Line at North Hollywood. Canoga Park's western 91304 corridor provides convenient freeway access to the US-101 and SR-118. Ongoing area development, including 149 middle-income apartments under construction on Topanga Canyon Boulevard and a recently approved 211-unit mixed-use project on Vanowen Street, signals continued neighborhood evolution. With over 70% renter-occupied housing stock and a median home value of $847,600, the Canoga Park submarket demonstrates durable rental demand and sustained property appreciation.</p>
-  </div>
+  {paragraphs}
   
-  <div class="buyer-profile">
-    <div class="buyer-profile-label">Target Buyer Profile</div>
-    <ul>
-      <li><strong>Value-Add Investors</strong> &mdash; Deep below-market rents ({fmt_pct(rent_upside_pct)} upside) with Costa-Hawkins vacancy decontrol provide a clear path to NOI growth through phased rent resets at turnover. Interior renovations at $20K-$30K per unit drive an additional 25-35% rent premium.</li>
-      <li><strong>Development-Oriented Buyers</strong> &mdash; The oversized 1.11-acre parcel is dramatically underbuilt at 18 units/acre. R3-1 zoning supports ~60 units by right, while TOC Tier 3 allows ~90 units with an affordable set-aside&mdash;a 4.5x increase over current density. Stacked incentives (Opportunity Zone, TPA, Housing Element Site) enhance feasibility.</li>
-      <li><strong>1031 Exchange Investors</strong> &mdash; Immediate cash flow from 20 occupied units with {fmt_pct(1 - VACANCY_RATE)} occupancy provides stable day-one income while executing a long-term value-add strategy. The family-sized product type experiences lower turnover than studio/1BR inventory.</li>
-      <li><strong>Small Portfolio Investors</strong> &mdash; The {fmt_price(price)} price point ({fmt_price(price_per_unit)}/unit) offers an accessible entry into the West Valley multifamily market at a basis well below comparable locations, with multiple paths to value creation.</li>
-    </ul>
-    <p class="bp-closing">Broad appeal across buyer segments supports competitive pricing and a short expected marketing period.</p>
-  </div>
+  {buyer_profile}
   
   <table class="info-table">
-    <tr><td>Address</td><td>{PROPERTY['full_address']}</td></tr>
-    <tr><td>APN</td><td>{PROPERTY['apn']}</td></tr>
-    <tr><td>Year Built</td><td>{PROPERTY['year_built']}</td></tr>
-    <tr><td>Total Units</td><td>{PROPERTY['units']}</td></tr>
-    <tr><td>Building Size</td><td>&plusmn;{fmt_num(PROPERTY['building_sf'])} SF</td></tr>
-    <tr><td>Lot Size</td><td>&plusmn;{fmt_num(PROPERTY['lot_sf'])} SF / {PROPERTY['lot_acres']} Acres</td></tr>
-    <tr><td>Construction</td><td>{PROPERTY['construction']}</td></tr>
-    <tr><td>Stories</td><td>{PROPERTY['stories']}</td></tr>
-    <tr><td>Zoning</td><td>{PROPERTY['zoning']}</td></tr>
-    <tr><td>TOC Tier</td><td>{PROPERTY['toc_tier']}</td></tr>
-    <tr><td>Rent Control</td><td>{PROPERTY['rent_control']}</td></tr>
-    <tr><td>Parking</td><td>{PROPERTY['parking']}</td></tr>
-    <tr><td>Community Plan</td><td>{PROPERTY['community_plan']}</td></tr>
+    {info_rows}
   </table>
 </div>
 """
 
 
 def build_building_systems():
+    if not BUILDING_SYSTEMS:
+        return ""
     rows = ""
     for system, condition, year in BUILDING_SYSTEMS:
         rows += f"<tr><td>{system}</td><td>{condition}</td><td>{year}</td></tr>\n"
@@ -627,32 +2438,47 @@ def build_building_systems():
 
 
 def build_regulatory():
+    notes = "\n  ".join(f'<div class="condition-note">\n    {note}\n  </div>' for note in narrative("regulatory"))
+    if not REGULATORY and not notes:
+        return ""
     rows = ""
     for item, status in REGULATORY:
         rows += f"<tr><td>{item}</td><td>{status}</td></tr>\n"
+    table = ""
+    if rows:
+        table = f"""<div class="table-scroll">
+  <table>
+    <thead><tr><th>Item</th><th>Status</th></tr></thead>
+    <tbody>{rows}</tbody>
+  </table>
+  </div>"""
     return f"""
 <div class="section">
   <h2 class="section-title">Regulatory & Compliance Summary</h2>
   <div class="section-subtitle">{PROPERTY['full_address']}</div>
   <div class="gold-divider"></div>
-  <div class="table-scroll">
-  <table>
-    <thead><tr><th>Item</th><th>Status</th></tr></thead>
-    <tbody>{rows}</tbody>
-  </table>
-  </div>
+  {table}
   <p class="table-note">Sources: ZIMAS, LADBS, FEMA, City of Los Angeles Planning Department. Data as of February 2026.</p>
-  <div class="condition-note">
-    <strong>RSO & Vacancy Decontrol.</strong> The property is subject to the City of Los Angeles Rent Stabilization Ordinance. Under Costa-Hawkins, landlords may reset rents to market upon voluntary vacancy. With nearly 40 years of continuous ownership, in-place rents are substantially below market, creating significant upside upon turnover. Buyers should also verify the soft-story retrofit status with LADBS, as the property's pre-1978 wood-frame construction and likely tuck-under parking configuration may trigger mandatory retrofit requirements.
-  </div>
-  <div class="condition-note">
-    <strong>Flood Zone.</strong> The property carries a FEMA Zone A (100-year flood, contained in channel) designation, which may affect insurance costs. Buyers should obtain a flood insurance quote during due diligence.
-  </div>
+  {notes}
 </div>
 """
 
 
 def build_transaction_history():
+    rows = ""
+    for date, event, amount, notes in TRANSACTION_HISTORY:
+        if amount is None:
+            rows += f"<tr><td>{date}</td><td>{event}</td><td>N/A</td><td>N/A</td><td>{notes}</td></tr>\n      "
+        else:
+            rows += f"<tr><td>{date}</td><td>{event}</td><td>{fmt_price(amount)}</td><td>{fmt_price(amount / PROPERTY['units'])}</td><td>{notes}</td></tr>\n      "
+    if "assessed_value" in PROPERTY:
+        tax = f"; annual tax: {fmt_price(PROPERTY['annual_tax'])}" if "annual_tax" in PROPERTY else ""
+        rows += f"<tr><td>2025</td><td>Assessed Value</td><td>{fmt_price(PROPERTY['assessed_value'])}</td><td>{fmt_price(PROPERTY['assessed_value'] / PROPERTY['units'])}</td><td>Total assessed value{tax}</td></tr>\n      "
+    paragraphs = "\n    ".join(f"<p>{p}</p>" for p in narrative("history"))
+    if paragraphs:
+        paragraphs = f"""<div class="narrative">
+    {paragraphs}
+  </div>"""
     return f"""
 <div class="section section-alt">
   <h2 class="section-title">Transaction History</h2>
@@ -662,172 +2488,749 @@ def build_transaction_history():
   <table>
     <thead><tr><th>Date</th><th>Event</th><th>Amount</th><th>$/Unit</th><th>Notes</th></tr></thead>
     <tbody>
-      <tr><td>Feb 1986</td><td>Acquisition</td><td>N/A</td><td>N/A</td><td>Current owner (H & Y Investments LP) acquired property</td></tr>
-      <tr><td>Dec 2021</td><td>Refinance</td><td>$1,800,000</td><td>$90,000</td><td>Symetra Life Insurance Co.</td></tr>
-      <tr><td>2025</td><td>Assessed Value</td><td>{fmt_price(PROPERTY['assessed_value'])}</td><td>{fmt_price(PROPERTY['assessed_value'] / PROPERTY['units'])}</td><td>Total assessed value; annual tax: {fmt_price(PROPERTY['annual_tax'])}</td></tr>
-      <tr class="highlight"><td>2026</td><td>Suggested List Price</td><td>{fmt_price(price)}</td><td>{fmt_price(price_per_unit)}</td><td>LAAA Team Broker Opinion of Value</td></tr>
+      {rows}<tr class="highlight"><td>2026</td><td>Suggested List Price</td><td>{fmt_price(price)}</td><td>{fmt_price(price_per_unit)}</td><td>LAAA Team Broker Opinion of Value</td></tr>
     </tbody>
   </table>
   </div>
-  <div class="narrative">
-    <p>The property has been held by the current ownership entity since February 1986&mdash;approximately 40 years of continuous ownership. The low assessed value of {fmt_price(PROPERTY['assessed_value'])} reflects the Proposition 13 base and confirms long-term hold. The suggested list price of {fmt_price(price)} ({fmt_price(price_per_unit)}/unit) represents a significant premium to the tax basis, justified by the property's deep below-market rents, oversized lot with exceptional density upside, and multiple layers of development incentives.</p>
-  </div>
+  {paragraphs}
 </div>
 """
 
 
+# Every interactive map is drawn by bovMap() from a compact data object:
+#   {"zoom", "pad", "subject": point, "layers": [{"cls", "size", "points": [point, ...], "zooms"}]}
+# where a point is [lat, lng, label, popup title, popup detail]. The map is
+# centred on the subject and fitted to all points, padded by `pad`. A layer
+# with "zooms" (see cluster_zooms()) is redrawn on every zoom from its
+# precomputed clusters; past its last clustered zoom every point shows.
+# The static_map() SVG over the map stays until the first tiles load.
+_MAP_JS = """
+function bovMap(id, d) {
+  if (!window.L) {  // Leaflet is deferred; without it the static map stays
+    if (document.readyState === 'loading') document.addEventListener('DOMContentLoaded', function () { bovMap(id, d); });
+    return;
+  }
+  var el = document.getElementById(id);
+  var map = L.map(el).setView([d.subject[0], d.subject[1]], d.zoom);
+  L.tileLayer('https://{s}.tile.openstreetmap.org/{z}/{x}/{y}.png', { attribution: '&copy; OpenStreetMap contributors' })
+    .once('load', function () { el.parentNode.classList.add('map-live'); }).addTo(map);
+  var bounds = [[d.subject[0], d.subject[1]]];
+  function pin(p, cls, size, group) {
+    return L.marker([p[0], p[1]], {icon: L.divIcon({className: cls, html: p[2], iconSize: [size, size], iconAnchor: [size / 2, size / 2]})})
+      .addTo(group).bindPopup('<strong>' + p[3] + '</strong><br>' + p[4]);
+  }
+  pin(d.subject, 'map-pin map-pin-subject', 32, map);
+  d.layers.forEach(function (layer) {
+    var cls = layer.cls ? 'map-pin ' + layer.cls : 'map-pin';
+    var size = layer.size || 26;
+    layer.points.forEach(function (p) { bounds.push([p[0], p[1]]); });
+    if (!layer.zooms) {
+      layer.points.forEach(function (p) { pin(p, cls, size, map); });
+      return;
+    }
+    var group = L.layerGroup().addTo(map);
+    var levels = Object.keys(layer.zooms).map(Number);
+    var first = Math.min.apply(null, levels), last = Math.max.apply(null, levels);
+    function draw() {
+      var z = map.getZoom();
+      group.clearLayers();
+      if (z > last) {
+        layer.points.forEach(function (p) { pin(p, cls, size, group); });
+        return;
+      }
+      layer.zooms[Math.max(z, first)].forEach(function (e) {
+        if (typeof e === 'number') { pin(layer.points[e], cls, size, group); return; }
+        var s = e[2] < 10 ? 32 : e[2] < 100 ? 38 : 46;
+        pin([e[0], e[1], e[2], e[2] + ' comps', e[3]], cls + ' map-cluster', s, group);
+      });
+    }
+    map.on('zoomend', draw);
+    draw();
+  });
+  map.fitBounds(L.latLngBounds(bounds).pad(d.pad));
+  return map;
+}
+"""
+
+CLUSTER_MIN_POINTS = 50  # layers with fewer points show every marker at every zoom
+CLUSTER_ZOOMS = range(8, 16)  # clustered zoom levels; farther out reuses the first
+CLUSTER_CELL_PX = 60  # grid cell size in screen pixels
+
+
+def _mercator(lat, lng):
+    """Web Mercator position of a point in 256-pixel world units (zoom 0)."""
+    s = math.sin(math.radians(max(-85.0, min(85.0, lat))))
+    return (lng + 180) / 360 * 256, (0.5 - math.log((1 + s) / (1 - s)) / (4 * math.pi)) * 256
+
+
+def cluster_zooms(points, summarize, zooms=CLUSTER_ZOOMS, cell_px=CLUSTER_CELL_PX):
+    """Grid-cluster map_point()s for each zoom level ahead of time.
+
+    Points are projected to Web Mercator pixels and binned into
+    `cell_px` squares, so each zoom's cells split evenly into the next
+    one's. Returns {zoom: [entry, ...]}. An entry is the index of a point
+    alone in its cell, or [lat, lng, count, detail] for a cell of several
+    points at their mean position. `detail` is summarize(indices), the
+    cluster's popup HTML.
+    """
+    projected = [_mercator(lat, lng) for lat, lng, *_ in points]
+    levels = {}
+    for zoom in zooms:
+        cell = cell_px / 2 ** zoom
+        cells = {}
+        for i, (x, y) in enumerate(projected):
+            cells.setdefault((int(x // cell), int(y // cell)), []).append(i)
+        entries = []
+        for members in cells.values():
+            if len(members) == 1:
+                entries.append(members[0])
+                continue
+            lat = sum(points[i][0] for i in members) / len(members)
+            lng = sum(points[i][1] for i in members) / len(members)
+            entries.append([round(lat, 6), round(lng, 6), len(members), summarize(members)])
+        levels[zoom] = entries
+    return levels
+
+
+def map_layer(points, summarize, **style):
+    """A bovMap() layer of `points`, clustered with cluster_zooms() once it
+    has CLUSTER_MIN_POINTS of them."""
+    layer = {**style, "points": points}
+    if len(points) >= CLUSTER_MIN_POINTS:
+        layer["zooms"] = cluster_zooms(points, summarize)
+    return layer
+
+
+def map_point(coords, label, title, detail):
+    """A bovMap() point: popup title and detail are HTML."""
+    return [coords[0], coords[1], str(label), title, detail]
+
+
+def map_script(map_id, name, subject_detail, layers, zoom, pad):
+    """Return the script tag that draws map `map_id` with bovMap().
+
+    `layers` is a list of map_layer()s.
+    """
+    data = {
+        "zoom": zoom,
+        "pad": pad,
+        "subject": map_point(SUBJECT_COORDS, "&#9733;", f"Subject: {PROPERTY['address']}", subject_detail),
+        "layers": layers,
+    }
+    args = json.dumps([map_id, data], separators=(",", ":")).replace("</", "<\\/")
+    return script_tag(f"bovMap.apply(null, {args});", name)
+
+
+STATIC_MAP_SIZE = (1000, 400)  # SVG viewBox width, height
+STATIC_MAP_MARGIN = 30  # px kept clear of pins at the edges
+STATIC_MAP_MAX_ZOOM = 16  # scale cap when every point is at the subject
+MAP_SCALE_STEPS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100)  # miles
+
+
+def _svg_title(title, detail):
+    return f"<title>{re.sub(r'<[^>]+>', ' ', f'{title}: {detail}')}</title>"
+
+
+def static_map(layers, pad):
+    """Draw the subject and map_layer()s as an inline SVG that needs no network.
+
+    Uses bovMap()'s projection and fit: Web Mercator, fitted to every point
+    padded by `pad`. Distance rings around the subject and a scale bar are
+    in miles. A clustered layer shows the cluster_zooms() level nearest
+    the drawn scale.
+    """
+    width, height = STATIC_MAP_SIZE
+    subject = _mercator(*SUBJECT_COORDS)
+    projected = [[_mercator(p[0], p[1]) for p in layer["points"]] for layer in layers]
+    xs = [subject[0]] + [x for points in projected for x, _ in points]
+    ys = [subject[1]] + [y for points in projected for _, y in points]
+    span_x, span_y = (max(xs) - min(xs)) * (1 + 2 * pad), (max(ys) - min(ys)) * (1 + 2 * pad)
+    scale = min((width - 2 * STATIC_MAP_MARGIN) / span_x if span_x else math.inf,
+                (height - 2 * STATIC_MAP_MARGIN) / span_y if span_y else math.inf,
+                2 ** STATIC_MAP_MAX_ZOOM)
+    mid_x, mid_y = (max(xs) + min(xs)) / 2, (max(ys) + min(ys)) / 2
+
+    def position(point):
+        return (width / 2 + (point[0] - mid_x) * scale, height / 2 + (point[1] - mid_y) * scale)
+
+    def pin(xy, label, radius, cls, title):
+        x, y = xy
+        return (f'<g class="{cls}">{title}<circle cx="{x:.1f}" cy="{y:.1f}" r="{radius}"/>'
+                f'<text x="{x:.1f}" y="{y:.1f}" dy="0.35em">{label}</text></g>')
+
+    # Mercator stretches distance by 1/cos(lat); rings and the bar use the subject's.
+    px_per_mile = scale * 256 / (2 * math.pi * EARTH_RADIUS_MILES * math.cos(math.radians(SUBJECT_COORDS[0])))
+    sx, sy = position(subject)
+    reach = max(math.hypot(x - sx, y - sy) for x, y in map(position, zip(xs, ys))) / px_per_mile
+    step = next((m for m in MAP_SCALE_STEPS if reach / m <= 4), MAP_SCALE_STEPS[-1])
+    parts = []
+    for i in range(1, math.ceil(reach / step) + 1):
+        miles = step * i
+        radius = miles * px_per_mile
+        parts.append(f'<circle class="map-ring" cx="{sx:.1f}" cy="{sy:.1f}" r="{radius:.1f}"/>')
+        # Label the ring on the first side of it that is in view.
+        for x, y in ((sx, sy - radius - 4), (sx, sy + radius + 12), (sx + radius + 20, sy), (sx - radius - 20, sy)):
+            if 20 <= x <= width - 20 and 12 <= y <= height - 4:
+                parts.append(f'<text class="map-ring-label" x="{x:.1f}" y="{y:.1f}">{miles:g} mi</text>')
+                break
+
+    zoom = math.log2(scale)
+    for layer, points in zip(layers, projected):
+        cls = f'map-pin {layer["cls"]}' if layer.get("cls") else "map-pin"
+        radius = layer.get("size", 26) / 2
+        levels = layer.get("zooms")
+        if not levels or zoom >= max(levels) + 1:
+            entries = range(len(points))
+        else:
+            entries = levels[max(min(levels), math.floor(zoom))]
+        for e in entries:
+            if isinstance(e, int):
+                p = layer["points"][e]
+                parts.append(pin(position(points[e]), p[2], radius, cls, _svg_title(p[3], p[4])))
+            else:
+                size = 32 if e[2] < 10 else 38 if e[2] < 100 else 46
+                parts.append(pin(position(_mercator(e[0], e[1])), e[2], size / 2, f"{cls} map-cluster",
+                                 _svg_title(f"{e[2]} comps", e[3])))
+    parts.append(pin((sx, sy), "&#9733;", 16, "map-pin map-pin-subject",
+                     f"<title>Subject: {PROPERTY['address']}</title>"))
+
+    bar = next((m for m in reversed(MAP_SCALE_STEPS) if m * px_per_mile <= width / 5), MAP_SCALE_STEPS[0])
+    bar_px = bar * px_per_mile
+    x0, y0 = 20, height - 20
+    parts.append(f'<g class="map-scale"><path d="M{x0},{y0 - 6}v6h{bar_px:.1f}v-6"/>'
+                 f'<text x="{x0 + bar_px / 2:.1f}" y="{y0 - 10}">{bar:g} mi</text></g>')
+    return (f'<svg class="map-static" viewBox="0 0 {width} {height}" preserveAspectRatio="xMidYMid meet" '
+            f'role="img" aria-label="Comparable locations around the subject">{"".join(parts)}</svg>')
+
+
+def map_frame(map_id, layers, pad):
+    """The map area: static_map() until bovMap() has tiles to show, and in print."""
+    return f"""<div class="map-frame">
+    {static_map(layers, pad)}
+    <div id="{map_id}" class="leaflet-map"></div>
+  </div>"""
+
+
 def build_sale_comps():
     rows = ""
-    prices = []
     per_units = []
     caps = []
     grms = []
     for c in SALE_COMPS:
         pu = c["price"] / c["units"]
-        psf = c["price"] / c["sf"]
         cap = c["noi"] / c["price"]
         grm = c["price"] / c["gross"]
-        prices.append(c["price"])
         per_units.append(pu)
         caps.append(cap)
         grms.append(grm)
-        rows += f'<tr><td>{c["num"]}</td><td>{c["address"]}, {c["city"]}</td><td>{c["units"]}</td><td>{c["sale_date"]}</td><td>{fmt_price(c["price"])}</td><td>{fmt_price(pu)}</td><td>{fmt_pct(cap)}</td><td>{grm:.2f}x</td><td>{c["dom"]}</td><td>{c["notes"]}</td></tr>\n'
+        rows += f'<tr><td>{c["num"]}</td><td>{c["address"]}{", " + c["city"] if c.get("city") else ""}</td><td>{comp_distance(c):.2f} mi</td><td>{fmt_num(c["units"])}</td><td>{c["sale_date"]}</td><td>{fmt_price(c["price"])}</td><td>{fmt_price(pu)}</td><td>{fmt_pct(cap)}</td><td>{grm:.2f}x</td><td>{c["dom"]}</td><td>{c["notes"]}</td></tr>\n'
     
-    avg_price = sum(prices)/len(prices)
-    avg_pu = sum(per_units)/len(per_units)
-    avg_cap = sum(caps)/len(caps)
-    avg_grm = sum(grms)/len(grms)
-    rows += f'<tr class="summary"><td></td><td>Average</td><td></td><td></td><td>{fmt_price(avg_price)}</td><td>{fmt_price(avg_pu)}</td><td>{fmt_pct(avg_cap)}</td><td>{avg_grm:.2f}x</td><td></td><td></td></tr>'
+    count = len(SALE_COMPS)
+    if count:
+        avg_price = sum(c["price"] for c in SALE_COMPS) / count
+        avg_pu = sum(per_units) / count
+        avg_cap = sum(caps) / count
+        avg_grm = sum(grms) / count
+        rows += f'<tr class="summary"><td></td><td>Average</td><td></td><td></td><td></td><td>{fmt_price(avg_price)}</td><td>{fmt_price(avg_pu)}</td><td>{fmt_pct(avg_cap)}</td><td>{avg_grm:.2f}x</td><td></td><td></td></tr>'
+
+    # Narrative and table note from the comps shown
+    noun = "sale" if count == 1 else "sales"
+    if not count:
+        paragraphs = [f"No closed comparable sales were selected for {PROPERTY['address']}."]
+        note = "No comparable sales selected."
+    else:
+        trade = "trades" if count == 1 else "trade"
+        if price_per_unit < min(per_units):
+            position = f"{trade} above"
+        elif price_per_unit > max(per_units):
+            position = f"{trade} below"
+        else:
+            position = "bracket" if count > 1 else "matches"
+        cap_range = (f"capitalization rates ranging from {fmt_pct(min(caps))} to {fmt_pct(max(caps))}" if count > 1
+                     else f"a {fmt_pct(caps[0])} capitalization rate")
+        paragraphs = [f"The {number_word(count)} comparable {noun} {position} the subject's pricing at {fmt_price(price)} ({fmt_price(price_per_unit)}/unit). "
+                      f"The average closed sale transacted at {fmt_price(avg_pu)}/unit, with {cap_range}."]
+        by_pu = sorted(range(count), key=lambda i: per_units[i], reverse=True)
+        if count > 1:
+            top = SALE_COMPS[by_pu[0]]
+            rest = [per_units[i] for i in by_pu[1:]]
+            rest_sf = sum(SALE_COMPS[i]["sf"] / SALE_COMPS[i]["units"] for i in by_pu[1:]) / len(rest)
+            if len(rest) == 1:
+                others = f"the {SALE_COMPS[by_pu[1]]['address']} sale sets a baseline of approximately {fmt_price(rest[0])}/unit"
+            else:
+                others = (f"the other {number_word(len(rest))} sales establish a baseline of approximately "
+                          f"{fmt_price(min(rest))}-{fmt_price(max(rest))}/unit")
+            paragraphs.append(
+                f"The {top['address']} sale at {fmt_price(top['price'])} ({fmt_price(per_units[by_pu[0]])}/unit) for a {fmt_num(top['units'])}-unit "
+                f"property represents the upper end of the set, while {others} at an average {fmt_num(rest_sf)} SF per unit.")
+        cities = sorted({c["city"] for c in SALE_COMPS if c.get("city")})
+        dates = sorted(SALE_COMPS, key=lambda c: month_key(c["sale_date"]) or 0)
+        closed = dates[0]["sale_date"] if dates[0]["sale_date"] == dates[-1]["sale_date"] else f'{dates[0]["sale_date"]}&ndash;{dates[-1]["sale_date"]}'
+        where = f" in {', '.join(cities)}" if cities else ""
+        note = (f"Comparable sales{where}, {fmt_num(min(c['units'] for c in SALE_COMPS))}+ units, closed {closed}. "
+                "Data from public records and CoStar.")
+    paragraphs = "\n    ".join(f"<p>{p}</p>" for p in paragraphs + narrative("sales"))
     
-    # Map markers JS
-    markers_js = ""
-    for c in SALE_COMPS:
-        pu = c["price"] / c["units"]
-        markers_js += f"""
-        L.marker([{c['coords'][0]}, {c['coords'][1]}], {{icon: L.divIcon({{className: '', html: '<div style="background:#1B3A5C;color:#fff;width:26px;height:26px;border-radius:50%;display:flex;align-items:center;justify-content:center;font-size:12px;font-weight:700;border:2px solid #fff;box-shadow:0 2px 4px rgba(0,0,0,0.3);">{c["num"]}</div>', iconSize: [26, 26], iconAnchor: [13, 13]}}) }}).addTo(saleMap).bindPopup('<strong>{c["address"]}</strong><br>{c["units"]} units | {fmt_price(c["price"])} | {fmt_price(pu)}/unit');
-        """
+    # Map markers
+    points = [map_point(c["coords"], c["num"], c["address"],
+                        f'{c["units"]} units | {fmt_price(c["price"])} | {fmt_price(c["price"] / c["units"])}/unit')
+              for c in SALE_COMPS]
+    def sale_summary(members):
+        comps = [SALE_COMPS[i] for i in members]
+        pu = sum(c["price"] / c["units"] for c in comps) / len(comps)
+        cap = sum(c["noi"] / c["price"] for c in comps) / len(comps)
+        return f"Avg {fmt_price(pu)}/unit | {fmt_pct(cap)} cap"
+
+    layers = [map_layer(points, sale_summary)]
+    sale_map = map_script("saleMap", "sale-map", f'{PROPERTY["units"]} units | {fmt_price(price)}', layers, zoom=13, pad=0.15)
     
     return f"""
 <div class="section">
   <h2 class="section-title">Comparable Sales (Closed)</h2>
   <div class="section-subtitle">{PROPERTY['full_address']}</div>
   <div class="gold-divider"></div>
-  <div id="saleMap" class="leaflet-map"></div>
-  <p class="map-fallback">Interactive map available at the live URL.</p>
+  {map_frame("saleMap", layers, pad=0.15)}
+  <div class="table-scroll">
+  <table>
+    <thead><tr><th>#</th><th>Address</th><th>Distance</th><th>Units</th><th>Sale Date</th><th>Price</th><th>$/Unit</th><th>Cap</th><th>GRM</th><th>DOM</th><th>Notes</th></tr></thead>
+    <tbody>{rows}</tbody>
+  </table>
+  </div>
+  <p class="table-note">{note}</p>
+  <div class="narrative">
+    {paragraphs}
+  </div>
+  {sale_map}
+</div>
+"""
+
+
+def build_rent_comps():
+    def mix_avg(bedrooms, field):
+        group = unit_mix.get(bedrooms)
+        return group[field] / group["units"] if group else 0
+
+    def pct_over(value, base):
+        return (value - base) / base * 100 if base else 0
+
+    # One table per bedroom count with comps, and a paragraph when the
+    # subject has units of that size
+    tables = ""
+    paragraphs = []
+    for bedrooms, comps in ((3, RENT_COMPS_3BR), (4, RENT_COMPS_4BR)):
+        if not comps:
+            continue
+        rows = ""
+        for c in comps:
+            psf = c["rent"] / c["sf"]
+            rows += f'<tr><td>{c["num"]}</td><td>{c["address"]}</td><td>{comp_distance(c):.2f} mi</td><td>{c["type"]}</td><td>{fmt_num(c["sf"])}</td><td>{fmt_price(c["rent"])}</td><td>${psf:.2f}</td></tr>\n'
+        avg = sum(c["rent"] for c in comps) / len(comps)
+        avg_sf = sum(c["rent"] / c["sf"] for c in comps) / len(comps)
+        rows += f'<tr class="summary"><td></td><td>Average</td><td></td><td></td><td></td><td>{fmt_price(avg)}</td><td>${avg_sf:.2f}</td></tr>'
+        tables += f"""
+  <h3 class="sub-heading">{bedrooms}-Bedroom Comparables</h3>
+  <div class="table-scroll">
+  <table>
+    <thead><tr><th>#</th><th>Address</th><th>Distance</th><th>Type</th><th>SF</th><th>Rent</th><th>$/SF</th></tr></thead>
+    <tbody>{rows}</tbody>
+  </table>
+  </div>
+"""
+        if bedrooms not in unit_mix:
+            continue
+        subject_rent = mix_avg(bedrooms, "market_rent")
+        current_rent = mix_avg(bedrooms, "current_rent")
+        if subject_rent < avg:
+            support = "is conservatively underwritten relative to the comp average, providing a buffer for the underwriting"
+        elif subject_rent <= avg * 1.05:
+            support = "is in line with the comp average"
+        else:
+            support = "is above the comp average"
+        paragraphs.append(
+            f"{number_word(bedrooms).capitalize()}-bedroom units in the submarket achieve an average of {fmt_price(avg)}/month (${avg_sf:.2f}/SF) "
+            f"across {number_word(len(comps))} {'comp' if len(comps) == 1 else 'comps'}. The subject's market rent assumption of {fmt_price(subject_rent)}/month "
+            f"for its {fmt_num(mix_avg(bedrooms, 'sf'))} SF {bedrooms}BR units {support}. Current in-place {bedrooms}BR rents averaging "
+            f"{fmt_price(current_rent)}/month represent a {pct_over(subject_rent, current_rent):.0f}% discount to the pro forma assumption.")
+    paragraphs = "\n    ".join(f"<p>{p}</p>" for p in paragraphs + narrative("rents"))
+    
+    # Map markers, numbered across both tables
+    all_rent_comps = RENT_COMPS_3BR + RENT_COMPS_4BR
+    points = [map_point(c["coords"], i, c["address"], f'{c["type"]} | {fmt_num(c["sf"])} SF | {fmt_price(c["rent"])}/mo')
+              for i, c in enumerate(all_rent_comps, 1)]
+
+    def rent_summary(members):
+        comps = [all_rent_comps[i] for i in members]
+        rent = sum(c["rent"] for c in comps) / len(comps)
+        psf = sum(c["rent"] / c["sf"] for c in comps) / len(comps)
+        return f"Avg {fmt_price(rent)}/mo | ${psf:.2f}/SF"
+
+    layers = [map_layer(points, rent_summary)]
+    rent_map = map_script("rentMap", "rent-map", f'{PROPERTY["units"]} units', layers, zoom=12, pad=0.1)
+    dates = sorted((c["date"] for c in all_rent_comps), key=lambda d: month_key(d) or 0)
+    note = (f"Rent comparables from MLS leased data, {dates[0]}&ndash;{dates[-1]}." if dates
+            else "No rent comparables selected.")
+    
+    # Market rent estimates per bedroom type
+    estimates = ""
+    if rent_comp_stats:
+        est_rows = ""
+        for bedrooms, s in rent_comp_stats.items():
+            est_rows += f'<tr><td>{bedrooms} Bedroom</td><td>{s["count"]}</td><td>{fmt_price(s["median"])}</td><td>{fmt_price(s["trimmed_mean"])}</td><td>{fmt_price(s["psf"])}</td><td>{fmt_price(s["weighted"])}</td><td>{fmt_price(s["regression"])}</td><td>{fmt_price(mix_avg(bedrooms, "market_rent"))}</td></tr>\n'
+        basis = ("the rent roll's market rents" if not market_rents else
+                 f"the {MARKET_RENT_METHOD.replace('_', ' ')} estimate, rounded to ${MARKET_RENT_ROUND}")
+        estimates = f"""
+  <h3 class="sub-heading">Market Rent Estimates</h3>
   <div class="table-scroll">
   <table>
-    <thead><tr><th>#</th><th>Address</th><th>Units</th><th>Sale Date</th><th>Price</th><th>$/Unit</th><th>Cap</th><th>GRM</th><th>DOM</th><th>Notes</th></tr></thead>
-    <tbody>{rows}</tbody>
+    <thead><tr><th>Unit Type</th><th>Comps</th><th>Median</th><th>Trimmed Mean</th><th>$/SF-Adjusted</th><th>Weighted</th><th>Regression</th><th>Underwritten</th></tr></thead>
+    <tbody>{est_rows}</tbody>
   </table>
   </div>
-  <p class="table-note">Comparable sales within Canoga Park submarket, 20+ units, closed Q4 2025. Data from public records and CoStar.</p>
+  <p class="table-note">$/SF-adjusted and regression estimates are at the subject's average unit size for each type. Trimmed mean drops {COMP_TRIM*100:.0f}% of comps from each end; weighted halves a comp's weight at {COMP_DISTANCE_SCALE:g} miles and every {COMP_HALF_LIFE_MONTHS} months before the newest lease. Underwritten rents use {basis}.</p>"""
+    
+    return f"""
+<div class="section section-alt">
+  <h2 class="section-title">Rent Comparables</h2>
+  <div class="section-subtitle">{PROPERTY['full_address']}</div>
+  <div class="gold-divider"></div>
+  {map_frame("rentMap", layers, pad=0.1)}
+  {tables}
+  <p class="table-note">{note}</p>
+  {estimates}
   <div class="narrative">
-    <p>The three comparable sales bracket the subject's pricing at {fmt_price(price)} ({fmt_price(price_per_unit)}/unit). The average closed sale transacted at {fmt_price(avg_pu)}/unit, with capitalization rates ranging from {fmt_pct(min(caps))} to {fmt_pct(max(caps))}. The subject's suggested pricing at {fmt_pct(market_cap)} pro forma cap rate reflects its deep below-market rents and exceptional density upside that is not available in the comparable set.</p>
-    <p>The 20951 Roscoe sale at {fmt_price(SALE_COMPS[0]['price'])} ({fmt_price(SALE_COMPS[0]['price']/SALE_COMPS[0]['units'])}/unit) for a 34-unit complex represents the upper end of the submarket, while the De Soto and Roscoe sales in October 2025 establish a baseline of approximately {fmt_price(SALE_COMPS[1]['price']/SALE_COMPS[1]['units'])}-{fmt_price(SALE_COMPS[2]['price']/SALE_COMPS[2]['units'])}/unit for 28-unit properties. The subject's larger unit sizes (avg. 1,217 SF vs. typical 600-800 SF) and family-oriented product type support premium pricing on a per-unit basis.</p>
+    {paragraphs}
   </div>
-  <script>
-    var saleMap = L.map('saleMap').setView([{SUBJECT_COORDS[0]}, {SUBJECT_COORDS[1]}], 13);
-    L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{ attribution: '&copy; OpenStreetMap contributors' }}).addTo(saleMap);
-    L.marker([{SUBJECT_COORDS[0]}, {SUBJECT_COORDS[1]}], {{icon: L.divIcon({{className: '', html: '<div style="background:#C5A258;color:#fff;width:32px;height:32px;border-radius:50%;display:flex;align-items:center;justify-content:center;font-size:16px;font-weight:700;border:2px solid #fff;box-shadow:0 2px 6px rgba(0,0,0,0.4);">&#9733;</div>', iconSize: [32, 32], iconAnchor: [16, 16]}}) }}).addTo(saleMap).bindPopup('<strong>Subject: {PROPERTY["address"]}</strong><br>{PROPERTY["units"]} units | {fmt_price(price)}');
-    {markers_js}
-    var saleBounds = L.latLngBounds([[{SUBJECT_COORDS[0]},{SUBJECT_COORDS[1]}],{','.join(f'[{c["coords"][0]},{c["coords"][1]}]' for c in SALE_COMPS)}]);
-    saleMap.fitBounds(saleBounds.pad(0.15));
-  </script>
+  {rent_map}
 </div>
 """
 
 
-def build_rent_comps():
-    # 3BR table
-    rows_3br = ""
-    rents_3br = []
-    for c in RENT_COMPS_3BR:
-        psf = c["rent"] / c["sf"]
-        rents_3br.append(c["rent"])
-        rows_3br += f'<tr><td>{c["num"]}</td><td>{c["address"]}</td><td>{c["type"]}</td><td>{fmt_num(c["sf"])}</td><td>{fmt_price(c["rent"])}</td><td>${psf:.2f}</td></tr>\n'
-    avg_3br = sum(rents_3br) / len(rents_3br)
-    avg_3br_sf = sum(c["rent"]/c["sf"] for c in RENT_COMPS_3BR) / len(RENT_COMPS_3BR)
-    rows_3br += f'<tr class="summary"><td></td><td>Average</td><td></td><td></td><td>{fmt_price(avg_3br)}</td><td>${avg_3br_sf:.2f}</td></tr>'
-    
-    # 4BR table
-    rows_4br = ""
-    rents_4br = []
-    for c in RENT_COMPS_4BR:
-        psf = c["rent"] / c["sf"]
-        rents_4br.append(c["rent"])
-        rows_4br += f'<tr><td>{c["num"]}</td><td>{c["address"]}</td><td>{c["type"]}</td><td>{fmt_num(c["sf"])}</td><td>{fmt_price(c["rent"])}</td><td>${psf:.2f}</td></tr>\n'
-    avg_4br = sum(rents_4br) / len(rents_4br)
-    avg_4br_sf = sum(c["rent"]/c["sf"] for c in RENT_COMPS_4BR) / len(RENT_COMPS_4BR)
-    rows_4br += f'<tr class="summary"><td></td><td>Average</td><td></td><td></td><td>{fmt_price(avg_4br)}</td><td>${avg_4br_sf:.2f}</td></tr>'
-    
-    # Map markers
-    all_rent_comps = RENT_COMPS_3BR + RENT_COMPS_4BR
-    markers_js = ""
-    for i, c in enumerate(all_rent_comps, 1):
-        markers_js += f"""
-        L.marker([{c['coords'][0]}, {c['coords'][1]}], {{icon: L.divIcon({{className: '', html: '<div style="background:#1B3A5C;color:#fff;width:26px;height:26px;border-radius:50%;display:flex;align-items:center;justify-content:center;font-size:12px;font-weight:700;border:2px solid #fff;box-shadow:0 2px 4px rgba(0,0,0,0.3);">{i}</div>', iconSize: [26, 26], iconAnchor: [13, 13]}}) }}).addTo(rentMap).bindPopup('<strong>{c["address"]}</strong><br>{c["type"]} | {fmt_num(c["sf"])} SF | {fmt_price(c["rent"])}/mo');
-        """
-    
-    bounds_list = f"[{SUBJECT_COORDS[0]},{SUBJECT_COORDS[1]}]," + ",".join(f'[{c["coords"][0]},{c["coords"][1]}]' for c in all_rent_comps)
-    
-    subject_3br_rent = 2950
-    subject_4br_rent = 3200
-    
+def build_heatmap_table(row_vals, col_vals, grid, base, fmt_cell, fmt_row, fmt_col, corner):
+    """Render a 2-D grid as a shaded table.
+
+    Cells are shaded gold in proportion to their value; the cell nearest
+    base = (row value, column value) is outlined.
+    """
+    finite = grid[np.isfinite(grid)]
+    lo, hi = (float(finite.min()), float(finite.max())) if finite.size else (0.0, 0.0)
+    span = (hi - lo) or 1.0
+    base_r = int(np.abs(row_vals - base[0]).argmin())
+    base_c = int(np.abs(col_vals - base[1]).argmin())
+    head = "".join(f"<th>{fmt_col(c)}</th>" for c in col_vals)
+    body = ""
+    for i, rv in enumerate(row_vals):
+        cells = ""
+        for j in range(len(col_vals)):
+            val = float(grid[i, j])
+            alpha = 0.08 + 0.6 * (val - lo) / span
+            cls = ' class="base"' if (i, j) == (base_r, base_c) else ""
+            cells += f'<td{cls} style="background:rgba(197,162,88,{alpha:.2f})">{fmt_cell(val)}</td>'
+        body += f"<tr><td>{fmt_row(rv)}</td>{cells}</tr>\n"
+    return f"""<table class="heatmap">
+    <thead><tr><th>{corner}</th>{head}</tr></thead>
+    <tbody>{body}</tbody>
+  </table>"""
+
+
+def build_sensitivity_heatmap(metric, rows, cols, fmt_cell, fmt_row, fmt_col, corner):
+    row_vals, col_vals, grid = sensitivity_slice(sensitivity, metric, rows, cols)
+    base = sensitivity_base()
+    base = (base[rows], base[cols])
+    return build_heatmap_table(row_vals, col_vals, grid, base, fmt_cell, fmt_row, fmt_col, corner)
+
+
+def build_sensitivity_tables():
+    if sensitivity is None:
+        return ""
+    coc_table = build_sensitivity_heatmap("coc", "price", "rate", fmt_pct, fmt_price, fmt_pct, "Price / Rate")
+    dcr_table = build_sensitivity_heatmap("dcr", "price", "ltv", lambda v: f"{v:.2f}x", fmt_price, fmt_pct, "Price / LTV")
     return f"""
-<div class="section section-alt">
-  <h2 class="section-title">Rent Comparables</h2>
-  <div class="section-subtitle">{PROPERTY['full_address']}</div>
-  <div class="gold-divider"></div>
-  <div id="rentMap" class="leaflet-map"></div>
-  <p class="map-fallback">Interactive map available at the live URL.</p>
-  
-  <h3 class="sub-heading">3-Bedroom Comparables</h3>
+  <h3 class="sub-heading">Sensitivity: Cash-on-Cash by Price and Interest Rate</h3>
   <div class="table-scroll">
-  <table>
-    <thead><tr><th>#</th><th>Address</th><th>Type</th><th>SF</th><th>Rent</th><th>$/SF</th></tr></thead>
-    <tbody>{rows_3br}</tbody>
-  </table>
+  {coc_table}
   </div>
-  
-  <h3 class="sub-heading">4-Bedroom Comparables</h3>
+  <h3 class="sub-heading">Sensitivity: Debt Coverage by Price and LTV</h3>
+  <div class="table-scroll">
+  {dcr_table}
+  </div>
+  <p class="table-note">Pro forma income at {fmt_pct(VACANCY_RATE)} vacancy, {AMORT_YEARS}-year amortization. Outlined cell marks the base assumptions ({fmt_pct(INTEREST_RATE)} rate, {fmt_pct(LTV)} LTV).</p>
+"""
+
+
+def build_dcf_tables():
+    if dcf is None:
+        return ""
+    i = int(np.abs(dcf["prices"] - price).argmin())
+    j = int(np.abs(dcf["exit_caps"] - EXIT_CAP).argmin())
+    ds = dcf["debt_service"][i]
+    cf_rows = ""
+    for year, noi in enumerate(dcf["noi"], 1):
+        sale = dcf["net_sale"][0, j] - dcf["payoff"][i] if year == hold_period else 0
+        cf_rows += f"<tr><td>Year {year}</td><td>{fmt_price(noi)}</td><td>({fmt_price(ds)})</td><td>{fmt_price(noi - ds)}</td><td>{fmt_price(sale) if sale else '&mdash;'}</td><td>{fmt_price(noi - ds + sale)}</td></tr>\n"
+    irr_table = build_heatmap_table(dcf["prices"], dcf["exit_caps"], dcf["levered_irr"], (price, EXIT_CAP),
+                                    fmt_pct, fmt_price, fmt_pct, "Price / Exit Cap")
+    return f"""
+  <h3 class="sub-heading">{hold_period}-Year Hold: Levered Cash Flows</h3>
   <div class="table-scroll">
   <table>
-    <thead><tr><th>#</th><th>Address</th><th>Type</th><th>SF</th><th>Rent</th><th>$/SF</th></tr></thead>
-    <tbody>{rows_4br}</tbody>
+    <thead><tr><th>Year</th><th>NOI</th><th>Debt Service</th><th>Cash Flow</th><th>Net Sale Proceeds</th><th>Total</th></tr></thead>
+    <tbody>{cf_rows}</tbody>
   </table>
   </div>
-  <p class="table-note">Rent comparables from MLS leased data within the western San Fernando Valley, Q1 2025 - Q1 2026.</p>
-  <div class="narrative">
-    <p>The rent comp survey confirms strong market support for the subject's pro forma rent assumptions. Three-bedroom units in the submarket achieve an average of {fmt_price(avg_3br)}/month (${avg_3br_sf:.2f}/SF), supporting the subject's market rent assumption of {fmt_price(subject_3br_rent)}/month for its 1,100 SF 3BR/1.5BA units. The subject's current average 3BR rent of $1,925/month represents a {((subject_3br_rent - 1925) / 1925 * 100):.0f}% discount to market.</p>
-    <p>Four-bedroom units command a significant premium, averaging {fmt_price(avg_4br)}/month (${ avg_4br_sf:.2f}/SF). The subject's market rent assumption of {fmt_price(subject_4br_rent)}/month for its 1,350 SF 4BR/2BA units is conservatively underwritten relative to the comp average, providing a buffer for the underwriting. Current in-place 4BR rents averaging $2,353/month represent a {((subject_4br_rent - 2353) / 2353 * 100):.0f}% discount to the pro forma assumption. The phased nature of RSO turnover ensures cash flow stability during the value-add execution.</p>
+  <table class="info-table">
+    <tr><td>Levered IRR</td><td>{fmt_pct(dcf["levered_irr"][i, j])}</td></tr>
+    <tr><td>Unlevered IRR</td><td>{fmt_pct(dcf["unlevered_irr"][i, j])}</td></tr>
+    <tr><td>Equity Multiple</td><td>{dcf["equity_multiple"][i, j]:.2f}x</td></tr>
+  </table>
+  <h3 class="sub-heading">Levered IRR by Price and Exit Cap Rate</h3>
+  <div class="table-scroll">
+  {irr_table}
   </div>
-  <script>
-    var rentMap = L.map('rentMap').setView([{SUBJECT_COORDS[0]}, {SUBJECT_COORDS[1]}], 12);
-    L.tileLayer('https://{{s}}.tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png', {{ attribution: '&copy; OpenStreetMap contributors' }}).addTo(rentMap);
-    L.marker([{SUBJECT_COORDS[0]}, {SUBJECT_COORDS[1]}], {{icon: L.divIcon({{className: '', html: '<div style="background:#C5A258;color:#fff;width:32px;height:32px;border-radius:50%;display:flex;align-items:center;justify-content:center;font-size:16px;font-weight:700;border:2px solid #fff;box-shadow:0 2px 6px rgba(0,0,0,0.4);">&#9733;</div>', iconSize: [32, 32], iconAnchor: [16, 16]}}) }}).addTo(rentMap).bindPopup('<strong>Subject: {PROPERTY["address"]}</strong><br>{PROPERTY["units"]} units');
-    {markers_js}
-    var rentBounds = L.latLngBounds([{bounds_list}]);
-    rentMap.fitBounds(rentBounds.pad(0.1));
-  </script>
-</div>
+  <p class="table-note">Year-1 NOI at in-place rents; {fmt_pct(TURNOVER_RATE)} of below-market units reset to market each year. Income grows {fmt_pct(RENT_GROWTH)} and expenses {fmt_pct(EXPENSE_GROWTH)} annually. Exit at the end of year {hold_period} on year-{hold_period + 1} NOI, less {fmt_pct(SALE_COST_PCT)} sale costs and the loan payoff{" at maturity" if hold_period == LOAN_TERM_YEARS else ""}. Outlined cell marks {fmt_price(price)} at a {fmt_pct(EXIT_CAP)} exit cap.</p>
+"""
+
+
+def build_amortization_tables():
+    if loan_schedule is None:
+        return ""
+    rows = ""
+    for year, payments, interest, principal, balance in yearly_summary(loan_schedule):
+        rows += f"<tr><td>Year {year}</td><td>{fmt_price(payments)}</td><td>{fmt_price(interest)}</td><td>{fmt_price(principal)}</td><td>{fmt_price(balance)}</td></tr>\n"
+    html = f"""
+  <h3 class="sub-heading">Loan Amortization</h3>
+  <div class="table-scroll">
+  <table>
+    <thead><tr><th>Loan Year</th><th>Payments</th><th>Interest</th><th>Principal</th><th>Ending Balance</th></tr></thead>
+    <tbody>{rows}</tbody>
+  </table>
+  </div>"""
+    if LENDER_QUOTES:
+        quote_rows = ""
+        for q in LENDER_QUOTES:
+            amount = price * q.get("ltv", LTV)
+            sched = amortization(amount, q["rate"], q.get("amort_years", AMORT_YEARS), q.get("term_years", LOAN_TERM_YEARS))
+            quote_rows += f'<tr><td>{q["lender"]}</td><td>{fmt_price(amount)}</td><td>{fmt_pct(q["rate"])}</td><td>{q.get("amort_years", AMORT_YEARS)} / {q.get("term_years", LOAN_TERM_YEARS)} Yrs</td><td>{fmt_price(sched["payment"][0] * 12)}</td><td>{fmt_price(sched["paydown"][0])}</td><td>{fmt_price(sched["balloon"][0])}</td></tr>\n'
+        html += f"""
+  <h3 class="sub-heading">Lender Quote Comparison</h3>
+  <div class="table-scroll">
+  <table>
+    <thead><tr><th>Lender</th><th>Loan</th><th>Rate</th><th>Amort / Term</th><th>Annual Debt Service</th><th>Paydown</th><th>Balloon</th></tr></thead>
+    <tbody>{quote_rows}</tbody>
+  </table>
+  </div>"""
+    return html
+
+
+# The underwriting calculator reruns the operating statement, returns,
+# financing and pricing matrix in the browser from calculator_inputs().
+# Every step repeats the Python formula; the two can differ in the last
+# bit, which rounding to the displayed precision absorbs. fixed() rounds
+# exact ties to even as Python's format() does.
+_CALC_JS = r"""
+function bovUnderwrite(d, p) {
+  function fixed(x, f) {
+    var exact = Math.abs(x).toFixed(100), cut = exact.indexOf('.') + f + 1;
+    if (exact.charAt(cut) === '5' && /^0*$/.test(exact.slice(cut + 1))) {
+      var kept = exact.slice(0, cut).replace(/\.$/, '');
+      if (Number(kept.charAt(kept.length - 1)) % 2 === 0) return (x < 0 ? '-' : '') + kept;
+    }
+    return x.toFixed(f);
+  }
+  function group(s) {
+    var sign = s.charAt(0) === '-' ? '-' : '', parts = s.slice(sign.length).split('.');
+    parts[0] = parts[0].replace(/\B(?=(\d{3})+(?!\d))/g, ',');
+    return sign + parts.join('.');
+  }
+  function price(v) { return '$' + group(fixed(v, 0)); }
+  function pct(v) { return fixed(v * 100, 2) + '%'; }
+  function times(v) { return fixed(v, 2) + 'x'; }
+
+  var out = {}, fixedExpenses = 0, noi = {}, gsr = {};
+  for (var name in d.expenses) fixedExpenses += d.expenses[name];
+  var r = p.rate / 12, n = p.amort * 12;
+  var constant = (r === 0 ? 1 / n : r * Math.pow(1 + r, n) / (Math.pow(1 + r, n) - 1)) * 12;
+  var loan = p.price * p.ltv, down = p.price * (1 - p.ltv), debt = loan * constant;
+  ['current', 'market'].forEach(function (s) {
+    gsr[s] = d[s + '_monthly'] * 12;
+    var vacancy = gsr[s] * p.vacancy, eri = gsr[s] - vacancy, egi = eri + d.other_income;
+    var mgmt = egi * p.mgmt, total = fixedExpenses + mgmt;
+    noi[s] = egi - total;
+    out[s + '_vacancy'] = price(vacancy);
+    out[s + '_eri'] = price(eri);
+    out[s + '_egi'] = price(egi);
+    out[s + '_mgmt_fee'] = price(mgmt);
+    out[s + '_total_expenses'] = price(total);
+    out[s + '_expense_pct'] = fixed(egi ? total / egi * 100 : 0, 1) + '%';
+    out[s + '_noi'] = price(noi[s]);
+    out[s + '_cap'] = pct(noi[s] / p.price);
+    out[s + '_grm'] = times(p.price / gsr[s]);
+    out[s + '_coc'] = pct((noi[s] - debt) / down);
+    out[s + '_dcr'] = times(noi[s] / debt);
+  });
+  out.vacancy_rate = pct(p.vacancy);
+  out.mgmt_fee_pct = pct(p.mgmt);
+  out.price = price(p.price);
+  out.price_per_unit = price(p.price / d.units);
+  out.price_per_sf = '$' + fixed(p.price / d.building_sf, 2);
+  out.down_pct = pct(1 - p.ltv);
+  out.ltv = pct(p.ltv);
+  out.down_payment = price(down);
+  out.loan_amount = price(loan);
+  out.interest_rate = pct(p.rate);
+  out.amort_years = String(p.amort);
+  out.annual_debt_service = price(debt);
+  if (d.term !== null) {  // amortization(): balloon balance and principal paid by maturity
+    var months = Math.round(d.term * 12), growth = Math.pow(1 + r, n);
+    var payment = constant / 12, paydown = 0;
+    var balance = function (m) { return r === 0 ? 1 - m / n : (growth - Math.pow(1 + r, m)) / (growth - 1); };
+    for (var m = 0; m < months; m++) paydown += (payment - balance(m) * r) * loan;
+    out.paydown = price(paydown);
+    out.balloon = price(balance(months) * loan);
+  }
+  var rows = '';
+  for (var q = d.matrix[0]; q <= d.matrix[1]; q += d.matrix[2]) {
+    var ds = q * p.ltv * constant;
+    rows += '<tr' + (q === p.price ? ' class="highlight"' : '') + '><td>' + price(q) + '</td><td>' + pct(noi.market / q) +
+      '</td><td>' + price(q / d.units) + '</td><td>$' + fixed(q / d.building_sf, 2) + '</td><td>' + times(q / gsr.market) +
+      '</td><td>' + pct((noi.market - ds) / (q * (1 - p.ltv))) + '</td><td>' + times(noi.market / ds) + '</td></tr>\n';
+  }
+  out.matrix = rows;
+  return out;
+}
+
+function bovCalculator(d) {
+  var panel = document.getElementById('calc-panel');
+  var inputs = panel.querySelectorAll('[data-input]');
+  function read(el) {
+    var v = el.value.trim();
+    if (el.getAttribute('data-unit') === '%') return Number(v + 'e-2');
+    return el.getAttribute('data-input') === 'amort' ? parseInt(v, 10) : Number(v);
+  }
+  function update() {
+    var p = {};
+    for (var i = 0; i < inputs.length; i++) {
+      var name = inputs[i].getAttribute('data-input'), v = read(inputs[i]);
+      if (!isFinite(v) || v < 0 || ((name === 'price' || name === 'amort') && v === 0)) return;
+      p[name] = v;
+    }
+    var out = bovUnderwrite(d, p);
+    document.querySelectorAll('[data-calc]').forEach(function (el) {
+      var key = el.getAttribute('data-calc');
+      if (key in out) el.textContent = out[key];
+    });
+    document.getElementById('pricing-matrix').innerHTML = out.matrix;
+  }
+  panel.addEventListener('input', function (e) {
+    var name = e.target.getAttribute('data-input');
+    if (!name) return;
+    panel.querySelectorAll('[data-input="' + name + '"]').forEach(function (el) { if (el !== e.target) el.value = e.target.value; });
+    update();
+  });
+  panel.querySelector('.calc-reset').addEventListener('click', function () {
+    inputs.forEach(function (el) { el.value = el.defaultValue; });
+    update();
+  });
+  panel.hidden = false;
+}
 """
 
+# (name, label, slider min, max, step, unit). Percent fields are entered
+# in percent.
+CALC_FIELDS = (
+    ("price", "Purchase Price", None, None, 10000, ""),
+    ("rate", "Interest Rate (%)", 3, 9, 0.125, "%"),
+    ("ltv", "Loan-to-Value (%)", 40, 80, 1, "%"),
+    ("amort", "Amortization (Years)", 15, 40, 5, ""),
+    ("vacancy", "Vacancy (%)", 0, 15, 0.5, "%"),
+    ("mgmt", "Management Fee (%)", 0, 10, 0.25, "%"),
+)
+
+
+def _calc_inputs(price, INTEREST_RATE, LTV, AMORT_YEARS, VACANCY_RATE, MGMT_FEE_PCT, LOAN_TERM_YEARS,
+                 total_current_monthly, total_market_monthly, OTHER_INCOME_ANNUAL, EXPENSES, PROPERTY,
+                 MATRIX_LOW, MATRIX_HIGH, MATRIX_STEP, loan_schedule):
+    return {
+        "inputs": {"price": price, "rate": INTEREST_RATE, "ltv": LTV, "amort": AMORT_YEARS,
+                   "vacancy": VACANCY_RATE, "mgmt": MGMT_FEE_PCT},
+        "term": LOAN_TERM_YEARS if loan_schedule is not None else None,
+        "current_monthly": total_current_monthly,
+        "market_monthly": total_market_monthly,
+        "other_income": OTHER_INCOME_ANNUAL,
+        "expenses": EXPENSES,
+        "units": PROPERTY["units"],
+        "building_sf": PROPERTY["building_sf"],
+        "matrix": [MATRIX_LOW, MATRIX_HIGH, MATRIX_STEP],
+    }
+
+
+model.define("calculator_inputs", _calc_inputs)
+
+
+def _input_number(value):
+    """`value` as an <input> attribute: every digit, never an exponent."""
+    return f"{value:.0f}" if float(value).is_integer() else repr(float(value))
+
+
+def build_calculator():
+    """The calculator panel: hidden until its script runs, and never printed."""
+    fields = ""
+    for name, label, low, high, step, unit in CALC_FIELDS:
+        value = calculator_inputs["inputs"][name]
+        shown = _input_number(round(value * 100, 10) if unit else value)
+        if name == "price":
+            low, high = MATRIX_LOW, MATRIX_HIGH
+        attrs = f'data-input="{name}" data-unit="{unit}" value="{shown}"'
+        fields += (f'<label>{label}<input type="range" {attrs} min="{_input_number(low)}" max="{_input_number(high)}" '
+                   f'step="{_input_number(step)}">'
+                   f'<input type="number" {attrs} step="{1 if name == "amort" else "any"}"></label>\n')
+    data = json.dumps(calculator_inputs, separators=(",", ":")).replace("</", "<\\/")
+    return f"""
+  <div id="calc-panel" class="calc-panel" hidden>
+    <h3 class="sub-heading">Underwriting Calculator</h3>
+    <div class="calc-grid">
+    {fields}</div>
+    <button type="button" class="calc-reset">Reset to Underwriting</button>
+  </div>
+  {script_tag(_CALC_JS, "calculator")}
+  {script_tag(f"bovCalculator({data});", "calculator-data")}"""
+
 
 def build_financial_analysis():
-    # Rent roll table rows
+    # Rent roll table rows: unit by unit, or by unit type for long rent rolls
     rr_rows = ""
-    for u in RENT_ROLL:
-        cr_sf = u["current_rent"] / u["sf"]
-        mr_sf = u["market_rent"] / u["sf"]
-        rr_rows += f'<tr><td>{u["unit"]}</td><td>{u["type"]}</td><td>{fmt_num(u["sf"])}</td><td>{fmt_price(u["current_rent"])}</td><td>${cr_sf:.2f}</td><td>{fmt_price(u["market_rent"])}</td><td>${mr_sf:.2f}</td></tr>\n'
+    rr_first = ""
+    if len(rent_roll) <= RENT_ROLL_DETAIL_MAX and getattr(rent_roll, "detailed", True):
+        rr_head = '<th>Unit</th><th>Type</th><th>SF</th><th>Current Rent</th><th>Rent/SF</th><th>Market Rent</th><th>Mkt Rent/SF</th>'
+        for u in rent_roll:
+            cr_sf = u["current_rent"] / u["sf"] if u["sf"] else 0
+            mr_sf = u["market_rent"] / u["sf"] if u["sf"] else 0
+            rr_rows += f'<tr><td>{u["unit"]}</td><td>{u["type"]}</td><td>{fmt_num(u["sf"])}</td><td>{fmt_price(u["current_rent"])}</td><td>${cr_sf:.2f}</td><td>{fmt_price(u["market_rent"])}</td><td>${mr_sf:.2f}</td></tr>\n'
+    else:
+        rr_head = '<th>Units</th><th>Type</th><th>Avg SF</th><th>Avg Current Rent</th><th>Rent/SF</th><th>Avg Market Rent</th><th>Mkt Rent/SF</th>'
+        for unit_type, t in rent_roll_summary["by_type"].items():
+            cr_sf = t["current_rent"] / t["sf"] if t["sf"] else 0
+            mr_sf = t["market_rent"] / t["sf"] if t["sf"] else 0
+            rr_rows += f'<tr><td>{fmt_num(t["units"])}</td><td>{unit_type}</td><td>{fmt_num(t["sf"] / t["units"])}</td><td>{fmt_price(t["current_rent"] / t["units"])}</td><td>${cr_sf:.2f}</td><td>{fmt_price(t["market_rent"] / t["units"])}</td><td>${mr_sf:.2f}</td></tr>\n'
+        rr_first = fmt_num(len(rent_roll))
     avg_cr = total_current_monthly / PROPERTY["units"]
     avg_mr = total_market_monthly / PROPERTY["units"]
-    rr_rows += f'<tr class="summary"><td></td><td>Totals / Avg</td><td>{fmt_num(total_sf)}</td><td>{fmt_price(total_current_monthly)}</td><td>${avg_current_rent_per_sf:.2f}</td><td>{fmt_price(total_market_monthly)}</td><td>${avg_market_rent_per_sf:.2f}</td></tr>'
+    rr_rows += f'<tr class="summary"><td>{rr_first}</td><td>Totals / Avg</td><td>{fmt_num(total_sf)}</td><td>{fmt_price(total_current_monthly)}</td><td>${avg_current_rent_per_sf:.2f}</td><td>{fmt_price(total_market_monthly)}</td><td>${avg_market_rent_per_sf:.2f}</td></tr>'
     
     # Operating statement
     current_expense_pct = current_total_expenses / current_egi * 100 if current_egi else 0
     market_expense_pct = market_total_expenses / market_egi * 100 if market_egi else 0
     
+    balloon_rows = ""
+    if loan_schedule is not None:
+        balloon_rows = f"""
+          <tr><td>Loan Term</td><td>{LOAN_TERM_YEARS} Years</td></tr>
+          <tr><td>Principal Paydown ({LOAN_TERM_YEARS} Yrs)</td><td data-calc="paydown">{fmt_price(loan_schedule["paydown"][0])}</td></tr>
+          <tr><td>Balloon Balance at Maturity</td><td data-calc="balloon">{fmt_price(loan_schedule["balloon"][0])}</td></tr>"""
+    
+    expense_rows = "\n          ".join(f"<tr><td>{name}</td><td>{fmt_price(amount)}</td><td>{fmt_price(amount)}</td></tr>"
+                                       for name, amount in EXPENSES.items())
+    closing = "".join(f"\n    <p>{p}</p>" for p in narrative("financials", live=True))
+
     # Pricing matrix rows
     matrix_rows = ""
     for row in pricing_matrix:
@@ -842,14 +3245,14 @@ def build_financial_analysis():
   
   <div class="metrics-grid">
     <div class="metric-card">
-      <span class="metric-value">{fmt_pct(current_cap)}</span>
+      <span class="metric-value" data-calc="current_cap">{fmt_pct(current_cap)}</span>
       <span class="metric-label">Current Cap Rate</span>
-      <span class="metric-sub">{fmt_pct(market_cap)} Market</span>
+      <span class="metric-sub"><span data-calc="market_cap">{fmt_pct(market_cap)}</span> Market</span>
     </div>
     <div class="metric-card">
-      <span class="metric-value">{fmt_price(price_per_unit)}</span>
+      <span class="metric-value" data-calc="price_per_unit">{fmt_price(price_per_unit)}</span>
       <span class="metric-label">Price Per Unit</span>
-      <span class="metric-sub">${price_per_sf:.2f}/SF</span>
+      <span class="metric-sub"><span data-calc="price_per_sf">${price_per_sf:.2f}</span>/SF</span>
     </div>
     <div class="metric-card">
       <span class="metric-value">{fmt_pct(rent_upside_pct)}</span>
@@ -861,11 +3264,11 @@ def build_financial_analysis():
   <h3 class="sub-heading">Unit Mix & Rent Roll</h3>
   <div class="table-scroll">
   <table>
-    <thead><tr><th>Unit</th><th>Type</th><th>SF</th><th>Current Rent</th><th>Rent/SF</th><th>Market Rent</th><th>Mkt Rent/SF</th></tr></thead>
+    <thead><tr>{rr_head}</tr></thead>
     <tbody>{rr_rows}</tbody>
   </table>
   </div>
-  
+  {build_calculator()}
   <div class="two-col">
     <div>
       <h3>Operating Statement</h3>
@@ -873,28 +3276,20 @@ def build_financial_analysis():
         <thead><tr><th>Income</th><th>Current</th><th>Pro Forma</th></tr></thead>
         <tbody>
           <tr><td>Gross Scheduled Rent</td><td>{fmt_price(current_gsr_annual)}</td><td>{fmt_price(market_gsr_annual)}</td></tr>
-          <tr><td>Less: Vacancy ({fmt_pct(VACANCY_RATE)})</td><td>({fmt_price(current_vacancy)})</td><td>({fmt_price(market_vacancy)})</td></tr>
-          <tr><td>Effective Rental Income</td><td>{fmt_price(current_eri)}</td><td>{fmt_price(market_eri)}</td></tr>
+          <tr><td>Less: Vacancy (<span data-calc="vacancy_rate">{fmt_pct(VACANCY_RATE)}</span>)</td><td>(<span data-calc="current_vacancy">{fmt_price(current_vacancy)}</span>)</td><td>(<span data-calc="market_vacancy">{fmt_price(market_vacancy)}</span>)</td></tr>
+          <tr><td>Effective Rental Income</td><td data-calc="current_eri">{fmt_price(current_eri)}</td><td data-calc="market_eri">{fmt_price(market_eri)}</td></tr>
           <tr><td>Other Income</td><td>{fmt_price(OTHER_INCOME_ANNUAL)}</td><td>{fmt_price(OTHER_INCOME_ANNUAL)}</td></tr>
-          <tr class="summary"><td><strong>Effective Gross Income</strong></td><td><strong>{fmt_price(current_egi)}</strong></td><td><strong>{fmt_price(market_egi)}</strong></td></tr>
+          <tr class="summary"><td><strong>Effective Gross Income</strong></td><td><strong data-calc="current_egi">{fmt_price(current_egi)}</strong></td><td><strong data-calc="market_egi">{fmt_price(market_egi)}</strong></td></tr>
         </tbody>
       </table>
       <table>
         <thead><tr><th>Expenses</th><th>Current</th><th>Pro Forma</th></tr></thead>
         <tbody>
-          <tr><td>Real Estate Taxes</td><td>{fmt_price(EXPENSES['Real Estate Taxes'])}</td><td>{fmt_price(EXPENSES['Real Estate Taxes'])}</td></tr>
-          <tr><td>Insurance</td><td>{fmt_price(EXPENSES['Insurance'])}</td><td>{fmt_price(EXPENSES['Insurance'])}</td></tr>
-          <tr><td>Utilities</td><td>{fmt_price(EXPENSES['Utilities'])}</td><td>{fmt_price(EXPENSES['Utilities'])}</td></tr>
-          <tr><td>Trash Removal</td><td>{fmt_price(EXPENSES['Trash Removal'])}</td><td>{fmt_price(EXPENSES['Trash Removal'])}</td></tr>
-          <tr><td>Repairs & Maintenance</td><td>{fmt_price(EXPENSES['Repairs & Maintenance'])}</td><td>{fmt_price(EXPENSES['Repairs & Maintenance'])}</td></tr>
-          <tr><td>Contract Services</td><td>{fmt_price(EXPENSES['Contract Services'])}</td><td>{fmt_price(EXPENSES['Contract Services'])}</td></tr>
-          <tr><td>General & Administrative</td><td>{fmt_price(EXPENSES['General & Administrative'])}</td><td>{fmt_price(EXPENSES['General & Administrative'])}</td></tr>
-          <tr><td>On-Site Manager Credit</td><td>{fmt_price(EXPENSES['On-Site Manager Rent Credit'])}</td><td>{fmt_price(EXPENSES['On-Site Manager Rent Credit'])}</td></tr>
-          <tr><td>Operating Reserves</td><td>{fmt_price(EXPENSES['Operating Reserves'])}</td><td>{fmt_price(EXPENSES['Operating Reserves'])}</td></tr>
-          <tr><td>Management Fee ({fmt_pct(MGMT_FEE_PCT)})</td><td>{fmt_price(current_mgmt_fee)}</td><td>{fmt_price(market_mgmt_fee)}</td></tr>
-          <tr class="summary"><td><strong>Total Expenses</strong></td><td><strong>{fmt_price(current_total_expenses)}</strong></td><td><strong>{fmt_price(market_total_expenses)}</strong></td></tr>
-          <tr><td>Expenses % of EGI</td><td>{current_expense_pct:.1f}%</td><td>{market_expense_pct:.1f}%</td></tr>
-          <tr class="summary"><td><strong>Net Operating Income</strong></td><td><strong>{fmt_price(current_noi)}</strong></td><td><strong>{fmt_price(market_noi)}</strong></td></tr>
+          {expense_rows}
+          <tr><td>Management Fee (<span data-calc="mgmt_fee_pct">{fmt_pct(MGMT_FEE_PCT)}</span>)</td><td data-calc="current_mgmt_fee">{fmt_price(current_mgmt_fee)}</td><td data-calc="market_mgmt_fee">{fmt_price(market_mgmt_fee)}</td></tr>
+          <tr class="summary"><td><strong>Total Expenses</strong></td><td><strong data-calc="current_total_expenses">{fmt_price(current_total_expenses)}</strong></td><td><strong data-calc="market_total_expenses">{fmt_price(market_total_expenses)}</strong></td></tr>
+          <tr><td>Expenses % of EGI</td><td data-calc="current_expense_pct">{current_expense_pct:.1f}%</td><td data-calc="market_expense_pct">{market_expense_pct:.1f}%</td></tr>
+          <tr class="summary"><td><strong>Net Operating Income</strong></td><td><strong data-calc="current_noi">{fmt_price(current_noi)}</strong></td><td><strong data-calc="market_noi">{fmt_price(market_noi)}</strong></td></tr>
         </tbody>
       </table>
     </div>
@@ -903,39 +3298,91 @@ def build_financial_analysis():
       <table>
         <thead><tr><th>Metric</th><th>Current</th><th>Market</th></tr></thead>
         <tbody>
-          <tr><td>Cap Rate</td><td>{fmt_pct(current_cap)}</td><td>{fmt_pct(market_cap)}</td></tr>
-          <tr><td>GRM</td><td>{current_grm:.2f}x</td><td>{market_grm:.2f}x</td></tr>
-          <tr><td>Cash-on-Cash</td><td>{fmt_pct(current_coc)}</td><td>{fmt_pct(market_coc)}</td></tr>
-          <tr><td>Debt Coverage Ratio</td><td>{current_dcr:.2f}x</td><td>{market_dcr:.2f}x</td></tr>
+          <tr><td>Cap Rate</td><td data-calc="current_cap">{fmt_pct(current_cap)}</td><td data-calc="market_cap">{fmt_pct(market_cap)}</td></tr>
+          <tr><td>GRM</td><td data-calc="current_grm">{current_grm:.2f}x</td><td data-calc="market_grm">{market_grm:.2f}x</td></tr>
+          <tr><td>Cash-on-Cash</td><td data-calc="current_coc">{fmt_pct(current_coc)}</td><td data-calc="market_coc">{fmt_pct(market_coc)}</td></tr>
+          <tr><td>Debt Coverage Ratio</td><td data-calc="current_dcr">{current_dcr:.2f}x</td><td data-calc="market_dcr">{market_dcr:.2f}x</td></tr>
         </tbody>
       </table>
       <h3>Financing Terms</h3>
       <table>
         <tbody>
-          <tr><td>Purchase Price</td><td>{fmt_price(price)}</td></tr>
-          <tr><td>Down Payment ({fmt_pct(1-LTV)})</td><td>{fmt_price(down_payment)}</td></tr>
-          <tr><td>Loan Amount ({fmt_pct(LTV)})</td><td>{fmt_price(loan_amount)}</td></tr>
-          <tr><td>Interest Rate</td><td>{fmt_pct(INTEREST_RATE)}</td></tr>
-          <tr><td>Amortization</td><td>{AMORT_YEARS} Years</td></tr>
-          <tr><td>Annual Debt Service</td><td>{fmt_price(annual_debt_service)}</td></tr>
+          <tr><td>Purchase Price</td><td data-calc="price">{fmt_price(price)}</td></tr>
+          <tr><td>Down Payment (<span data-calc="down_pct">{fmt_pct(1-LTV)}</span>)</td><td data-calc="down_payment">{fmt_price(down_payment)}</td></tr>
+          <tr><td>Loan Amount (<span data-calc="ltv">{fmt_pct(LTV)}</span>)</td><td data-calc="loan_amount">{fmt_price(loan_amount)}</td></tr>
+          <tr><td>Interest Rate</td><td data-calc="interest_rate">{fmt_pct(INTEREST_RATE)}</td></tr>
+          <tr><td>Amortization</td><td><span data-calc="amort_years">{AMORT_YEARS}</span> Years</td></tr>
+          <tr><td>Annual Debt Service</td><td data-calc="annual_debt_service">{fmt_price(annual_debt_service)}</td></tr>{balloon_rows}
         </tbody>
       </table>
     </div>
   </div>
   
+  {build_amortization_tables()}
   <h3 class="sub-heading">Pricing Matrix</h3>
   <div class="table-scroll">
   <table>
     <thead><tr><th>Price</th><th>Cap Rate (Mkt)</th><th>$/Unit</th><th>$/SF</th><th>GRM</th><th>Cash-on-Cash</th><th>DCR</th></tr></thead>
-    <tbody>{matrix_rows}</tbody>
+    <tbody id="pricing-matrix">{matrix_rows}</tbody>
   </table>
   </div>
-  <p class="table-note">Highlighted row indicates suggested list price. Returns based on {fmt_pct(LTV)} LTV, {fmt_pct(INTEREST_RATE)} interest rate, {AMORT_YEARS}-year amortization. Cap rate and GRM based on pro forma income.</p>
-  
+  <p class="table-note">Highlighted row indicates suggested list price. Returns based on <span data-calc="ltv">{fmt_pct(LTV)}</span> LTV, <span data-calc="interest_rate">{fmt_pct(INTEREST_RATE)}</span> interest rate, <span data-calc="amort_years">{AMORT_YEARS}</span>-year amortization. Cap rate and GRM based on pro forma income.</p>
+  {build_sensitivity_tables()}
+  {build_dcf_tables()}
   <div class="narrative">
-    <p>At the suggested list price of {fmt_price(price)}, the property delivers a {fmt_pct(market_cap)} pro forma cap rate and {market_grm:.2f}x GRM on market rents of {fmt_price(market_gsr_annual)} annually. The {fmt_pct(rent_upside_pct)} rent upside from current to market levels represents the primary value driver, with additional upside available through interior renovations and RUBS implementation. With {fmt_pct(LTV)} leverage at {fmt_pct(INTEREST_RATE)}, the investment generates a {fmt_pct(market_coc)} cash-on-cash return at pro forma with a comfortable {market_dcr:.2f}x debt coverage ratio.</p>
-    <p>The pricing reflects the property's unique combination of immediate cash flow, phased value-add potential, and exceptional long-term density upside through TOC Tier 3 and Opportunity Zone incentives. At {fmt_price(price_per_unit)}/unit, the basis is well below comparable West Valley multifamily locations and the replacement cost for family-sized townhome product.</p>
+    <p>At the suggested list price of {fmt_price(price)}, the property delivers a {fmt_pct(market_cap)} pro forma cap rate and {market_grm:.2f}x GRM on market rents of {fmt_price(market_gsr_annual)} annually. The {fmt_pct(rent_upside_pct)} rent upside from current to market levels represents the primary value driver, with additional upside available through interior renovations and RUBS implementation. With {fmt_pct(LTV)} leverage at {fmt_pct(INTEREST_RATE)}, the investment generates a {fmt_pct(market_coc)} cash-on-cash return at pro forma with a comfortable {market_dcr:.2f}x debt coverage ratio.</p>{closing}
+  </div>
+</div>
+"""
+
+
+def build_risk_analysis():
+    if monte_carlo is None:
+        return ""
+    pct = monte_carlo["percentiles"]
+    head = "".join(f"<th>P{p}</th>" for p in MC_PERCENTILES)
+    metric_rows = (
+        ("Net Operating Income", "noi", fmt_price, fmt_price(market_noi)),
+        ("Cap Rate", "cap", fmt_pct, fmt_pct(market_cap)),
+        ("Debt Coverage Ratio", "dcr", lambda v: f"{v:.2f}x", f"{market_dcr:.2f}x"),
+        ("Cash-on-Cash", "coc", fmt_pct, fmt_pct(market_coc)),
+    )
+    rows = ""
+    for label, key, fmt, point in metric_rows:
+        cells = "".join(f"<td>{fmt(v)}</td>" for v in pct[key])
+        rows += f"<tr><td>{label}</td>{cells}<td>{point}</td></tr>\n"
+    prob = monte_carlo["prob_dcr_below"]
+    vacancy = mc_range(VACANCY_RATE, MC_VACANCY)
+    mgmt_fee = mc_range(MGMT_FEE_PCT, MC_MGMT_FEE)
+    return f"""
+<div class="section">
+  <h2 class="section-title">Underwriting Risk</h2>
+  <div class="section-subtitle">{PROPERTY['full_address']}</div>
+  <div class="gold-divider"></div>
+  <div class="metrics-grid">
+    <div class="metric-card">
+      <span class="metric-value">{fmt_price(pct["noi"][MC_PERCENTILES.index(50)])}</span>
+      <span class="metric-label">Median Pro Forma NOI</span>
+      <span class="metric-sub">{fmt_price(pct["noi"][0])} &ndash; {fmt_price(pct["noi"][-1])} (P{MC_PERCENTILES[0]}&ndash;P{MC_PERCENTILES[-1]})</span>
+    </div>
+    <div class="metric-card">
+      <span class="metric-value">{pct["dcr"][MC_PERCENTILES.index(50)]:.2f}x</span>
+      <span class="metric-label">Median DCR</span>
+      <span class="metric-sub">{pct["dcr"][0]:.2f}x at P{MC_PERCENTILES[0]}</span>
+    </div>
+    <div class="metric-card">
+      <span class="metric-value">{prob * 100:.1f}%</span>
+      <span class="metric-label">Probability DCR &lt; {MC_DCR_THRESHOLD:.2f}x</span>
+      <span class="metric-sub">{fmt_num(monte_carlo["trials"])} simulated scenarios</span>
+    </div>
+  </div>
+  <div class="table-scroll">
+  <table>
+    <thead><tr><th>Metric</th>{head}<th>Point Estimate</th></tr></thead>
+    <tbody>{rows}</tbody>
+  </table>
   </div>
+  <p class="table-note">Monte Carlo simulation at {fmt_price(price)} with {fmt_pct(LTV)} LTV and {AMORT_YEARS}-year amortization (seed {monte_carlo["seed"]}). Market rents per unit type &plusmn;{MC_RENT_SD_PCT*100:.0f}% (1 s.d.), vacancy {fmt_pct(vacancy[0])}&ndash;{fmt_pct(vacancy[1])}, operating expenses &plusmn;{MC_EXPENSE_SD_PCT*100:.0f}% per line, management fee {fmt_pct(mgmt_fee[0])}&ndash;{fmt_pct(mgmt_fee[1])}, interest rate {fmt_pct(INTEREST_RATE)} &plusmn;{MC_RATE_SD*100:.2f}%.</p>
 </div>
 """
 
@@ -943,10 +3390,10 @@ def build_financial_analysis():
 def build_footer():
     return f"""
 <div class="footer">
-  <img src="{logo_b64}" alt="LAAA Team" class="footer-logo">
+  <img {img_attrs(logo_img)} alt="LAAA Team" class="footer-logo" loading="lazy">
   <div class="footer-team">
     <div class="footer-person">
-      <img src="{glen_b64}" alt="Glen Scher" class="footer-headshot">
+      <img {img_attrs(glen_img)} alt="Glen Scher" class="footer-headshot" loading="lazy">
       <span class="footer-name">Glen Scher</span>
       <span class="footer-title">Senior Managing Director Investments</span>
       <div class="footer-contact">
@@ -956,7 +3403,7 @@ def build_footer():
       </div>
     </div>
     <div class="footer-person">
-      <img src="{filip_b64}" alt="Filip Niculete" class="footer-headshot">
+      <img {img_attrs(filip_img)} alt="Filip Niculete" class="footer-headshot" loading="lazy">
       <span class="footer-name">Filip Niculete</span>
       <span class="footer-title">Senior Managing Director Investments</span>
       <div class="footer-contact">
@@ -966,7 +3413,7 @@ def build_footer():
       </div>
     </div>
     <div class="footer-person">
-      <img src="{blake_b64}" alt="Blake Lewitt" class="footer-headshot">
+      <img {img_attrs(blake_img)} alt="Blake Lewitt" class="footer-headshot" loading="lazy">
       <span class="footer-name">Blake Lewitt</span>
       <span class="footer-title">Associate Investments</span>
       <div class="footer-contact">
@@ -981,18 +3428,7 @@ def build_footer():
 """
 
 
-def build_html():
-    css = build_css()
-    cover = build_cover()
-    overview = build_property_overview()
-    systems = build_building_systems()
-    regulatory = build_regulatory()
-    history = build_transaction_history()
-    sales = build_sale_comps()
-    rents = build_rent_comps()
-    financials = build_financial_analysis()
-    footer = build_footer()
-    
+def build_head():
     return f"""<!DOCTYPE html>
 <html lang="en">
 <head>
@@ -1000,45 +3436,1079 @@ def build_html():
   <meta name="viewport" content="width=device-width, initial-scale=1.0">
   <title>BOV - {PROPERTY['address']}, {PROPERTY['city_state_zip']}</title>
   <link rel="stylesheet" href="https://unpkg.com/leaflet@1.9.4/dist/leaflet.css" />
-  <script src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
-  <style>{css}</style>
+  <script defer src="https://unpkg.com/leaflet@1.9.4/dist/leaflet.js"></script>
+  {script_tag(_MAP_JS, "maps")}
+  {style_tag(build_css(), "bov")}
 </head>
 <body>
 <div class="page">
-{cover}
-{overview}
-{systems}
-{regulatory}
-{history}
-{sales}
-{rents}
-{financials}
-{footer}
-</div>
+"""
+
+
+def build_tail():
+    return """</div>
 <script>
 var params = new URLSearchParams(window.location.search);
 var client = params.get('client');
-if (client) {{
+if (client) {
   var el = document.getElementById('client-greeting');
   if (el) el.textContent = 'Prepared Exclusively for ' + client;
-}}
+}
 </script>
 </body>
 </html>"""
 
 
+# Document sections in order, by the names --sections takes. The head
+# carries the stylesheet.
+SECTIONS = {
+    "head": build_head,
+    "cover": build_cover,
+    "overview": build_property_overview,
+    "systems": build_building_systems,
+    "regulatory": build_regulatory,
+    "history": build_transaction_history,
+    "sales": build_sale_comps,
+    "rents": build_rent_comps,
+    "financials": build_financial_analysis,
+    "risk": build_risk_analysis,
+    "footer": build_footer,
+}
+
+
+# ============================================================
+# FRAGMENT CACHE
+# ============================================================
+
+# Rendered sections are cached under CACHE_DIR:
+#   fragments/<key>.json   {"html", "assets"} for one rendered section
+#   documents/<hash>.json  section name -> fragment key, for the last build of an output file
+# A fragment's key hashes this script's code and the value of every input
+# its section reads, so changing one figure only re-renders the sections
+# that show it. Data assignments are inputs, not code (see code_digest()).
+CACHE_FRAGMENTS = True
+# Inputs that name image files: their files' contents are part of the key,
+# so a photo replaced at the same path invalidates the sections showing it.
+FILE_INPUTS = ("HERO_PHOTO", "GRID_PHOTOS", "BRAND_SPECS")
+_section_inputs = {}
+_rendered = []  # names of the sections the last render_sections() call rendered
+
+
+def section_inputs(name):
+    """Return (nodes, inputs): the graph nodes and the other module globals
+    that section `name` reads.
+
+    Like Graph dependencies these come from the code itself: the names its
+    builder uses, and those its functions' default arguments read,
+    following every module function, class and graph node they lead to.
+    Private module state (leading underscore) is not an
+    input.
+    """
+    if name in _section_inputs:
+        return _section_inputs[name]
+    namespace = globals()
+    nodes, inputs, seen = set(), set(), set()
+
+    def visit(name):
+        if name in seen or (name not in namespace and name not in model.nodes):
+            return
+        seen.add(name)
+        if name in model.nodes:
+            fn, params, deps = model.nodes[name]
+            nodes.add(name)
+            follow(fn)
+            for dep in deps:
+                visit(dep)
+            return
+        value = namespace[name]
+        if isinstance(value, type):
+            follow_class(value)
+        elif callable(value):
+            follow(value)
+        elif not name.startswith("_") and not isinstance(value, (types.ModuleType, Graph)):
+            inputs.add(name)
+            follow_class(type(value))
+
+    def follow_class(cls):
+        if cls.__module__ != __name__ or cls is Graph or cls in seen:
+            return
+        seen.add(cls)
+        for attr in vars(cls).values():
+            fn = getattr(attr, "__func__", getattr(attr, "fget", attr))
+            if isinstance(fn, types.FunctionType):
+                follow(fn)
+
+    def follow(fn):
+        names = list(getattr(fn, "reads", ()))
+        while hasattr(fn, "__wrapped__"):
+            fn = fn.__wrapped__
+        names.extend(_default_names().get(getattr(fn, "__qualname__", None), ()))
+        codes = [fn.__code__] if hasattr(fn, "__code__") else []
+        while codes:
+            c = codes.pop()
+            codes.extend(k for k in c.co_consts if isinstance(k, types.CodeType))
+            names.extend(c.co_names)
+        for name in names:
+            visit(name)
+
+    follow(SECTIONS[name])
+    _section_inputs[name] = (sorted(nodes), sorted(inputs))
+    return _section_inputs[name]
+
+
+@functools.lru_cache(maxsize=None)
+def _source_tree():
+    import ast
+
+    with open(__file__, 'rb') as f:
+        return ast.parse(f.read())
+
+
+def _import_time_names(node):
+    """Names a statement reads while the module runs, leaving out those the
+    functions and lambdas it defines read when they are called."""
+    import ast
+
+    if isinstance(node, ast.Name):
+        return {node.id}
+    if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda)):
+        args = node.args
+        parts = [*args.defaults, *(d for d in args.kw_defaults if d is not None), *getattr(node, "decorator_list", ())]
+    else:
+        parts = ast.iter_child_nodes(node)
+    return set().union(*map(_import_time_names, parts))
+
+
+@functools.lru_cache(maxsize=None)
+def _default_names():
+    """{function __qualname__: the names its default arguments read}.
+
+    Defaults are evaluated when the def runs, so the function's code never
+    names them (load_images(..., max_workers=IMAGE_WORKERS)).
+    """
+    import ast
+
+    names = {}
+
+    def walk(body, prefix):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                args = node.args
+                defaults = [*args.defaults, *(d for d in args.kw_defaults if d is not None)]
+                names[prefix + node.name] = set().union(*map(_import_time_names, defaults))
+                walk(node.body, f"{prefix}{node.name}.<locals>.")
+            elif isinstance(node, ast.ClassDef):
+                walk(node.body, f"{prefix}{node.name}.")
+
+    walk(_source_tree().body, "")
+    return names
+
+
+@functools.lru_cache(maxsize=None)
+def code_digest():
+    """Digest of the code this process runs: the script's syntax tree,
+    leaving out top-level assignments to public names (EXPENSES = {...}).
+    Those are data, fingerprinted as section inputs, and watch() applies
+    edits to them without restarting (see reload_data())."""
+    import ast
+
+    tree = _source_tree()
+    code = [node for node in tree.body
+            if not (isinstance(node, ast.Assign)
+                    and all(isinstance(t, ast.Name) and not t.id.startswith("_") for t in node.targets))]
+    return hashlib.sha256(ast.dump(ast.Module(code, type_ignores=[])).encode('utf-8')).hexdigest()
+
+
+def _fingerprint(h, value, files=False):
+    """Feed a canonical encoding of an input value into hashlib object `h`.
+
+    With `files`, a string naming an existing file also contributes the
+    file's digest (see FILE_INPUTS).
+    """
+    if isinstance(value, str):
+        h.update(b"s%d:" % len(value) + value.encode('utf-8', 'surrogatepass'))
+        if files and os.path.isfile(value):
+            h.update(_file_digest(value).encode('ascii'))
+    elif isinstance(value, dict):
+        h.update(b"d%d:" % len(value))
+        for k, v in value.items():
+            _fingerprint(h, k, files)
+            _fingerprint(h, v, files)
+    elif isinstance(value, (list, tuple)):
+        h.update(b"l%d:" % len(value))
+        for v in value:
+            _fingerprint(h, v, files)
+    elif isinstance(value, (set, frozenset)):
+        _fingerprint(h, sorted(map(repr, value)), files)
+    elif hasattr(value, "tobytes"):  # array.array and NumPy arrays
+        layout = (getattr(value, "typecode", None), str(getattr(value, "dtype", "")), getattr(value, "shape", None))
+        h.update(repr(layout).encode('ascii') + value.tobytes())
+    elif hasattr(value, "__dict__") and not callable(value):
+        h.update(type(value).__name__.encode('ascii'))
+        _fingerprint(h, vars(value), files)
+    else:
+        h.update(repr(value).encode('utf-8'))
+
+
+def fragment_key(name):
+    """The cache key of section `name` rendered from this code and the
+    current inputs."""
+    namespace = globals()
+    nodes, inputs = section_inputs(name)
+    h = hashlib.sha256(f"{code_digest()}:{name}".encode('ascii'))
+    for input_name in inputs:
+        _fingerprint(h, input_name)
+        _fingerprint(h, namespace[input_name], files=input_name in FILE_INPUTS)
+    return h.hexdigest()
+
+
+def _dump_asset(asset):
+    if isinstance(asset, ImageRef):
+        return ["image", asset.key, asset.mime_type, asset.name, asset.folder]
+    if isinstance(asset, TextAsset):
+        return ["text", asset.name, asset.ext, asset.text]
+    return ["img", _dump_asset(asset.src), [[_dump_asset(ref), w] for ref, w in asset.candidates], asset.sizes]
+
+
+def _load_asset(data):
+    """Rebuild a dumped asset, or None if an image it uses left the image cache."""
+    kind = data[0]
+    if kind == "image":
+        return ImageRef(*data[1:]) if _has_blob(data[1]) else None
+    if kind == "text":
+        return TextAsset(*data[1:])
+    src = _load_asset(data[1])
+    candidates = [(_load_asset(ref), w) for ref, w in data[2]]
+    if src is None or any(ref is None for ref, w in candidates):
+        return None
+    return ImgSource(src, candidates, data[3])
+
+
+def _store_fragment(key, text):
+    """Cache a rendered section, with its asset tokens renumbered from 0."""
+    local = {}
+    assets = []
+
+    def renumber(m):
+        i = int(m.group(1))
+        if i not in local:
+            local[i] = len(assets)
+            assets.append(_dump_asset(_assets[i]))
+        return f"\x00asset{local[i]}\x00"
+
+    html = _ASSET_TOKEN_RE.sub(renumber, text)
+    _save_json_cache(os.path.join("fragments", key + ".json"), {"html": html, "assets": assets})
+
+
+def _load_fragment(key):
+    """Return a cached section's template, or None on a miss."""
+    data = _load_json_cache(os.path.join("fragments", key + ".json"))
+    if not data:
+        return None
+    assets = [_load_asset(a) for a in data["assets"]]
+    if any(asset is None for asset in assets):
+        return None
+    tokens = [asset_token(asset) for asset in assets]
+    return _ASSET_TOKEN_RE.sub(lambda m: tokens[int(m.group(1))], data["html"])
+
+
+def render_sections(only=None, document=None):
+    """Render every section to a template, reusing cached fragments.
+
+    A section whose inputs match a cached fragment is not rendered, and the
+    graph nodes it reads are not computed. With `only`, just those sections
+    are rendered and the others are spliced in from the last build of the
+    output file `document` as they stand; a section that build lacks is
+    looked up by its inputs as usual. Returns the templates in SECTIONS order.
+    """
+    unknown = sorted(set(only or ()) - set(SECTIONS))
+    if unknown:
+        raise ValueError(f"unknown sections {', '.join(unknown)}; expected some of {', '.join(SECTIONS)}")
+    record = None
+    if document:
+        record = os.path.join("documents", hashlib.sha256(os.path.abspath(document).encode('utf-8')).hexdigest()[:16] + ".json")
+    last = _load_json_cache(record) if record and only is not None and CACHE_FRAGMENTS else {}
+    keys = {}
+    templates = []
+    _rendered.clear()
+    for name, build_section in SECTIONS.items():
+        text = None
+        if name in last and name not in only:
+            key = last[name]
+            text = _load_fragment(key)
+        if text is None:
+            key = fragment_key(name)
+            if CACHE_FRAGMENTS and (only is None or name not in only):
+                text = _load_fragment(key)
+        if text is None:
+            for node in section_inputs(name)[0]:
+                model[node]
+            text = build_section()
+            _rendered.append(name)
+            if CACHE_FRAGMENTS:
+                _store_fragment(key, text)
+        keys[name] = key
+        templates.append(text)
+    if record and CACHE_FRAGMENTS:
+        _save_json_cache(record, keys)
+    return templates
+
+
+# Copies src/srcset from the first <img> of a repeated image onto the later
+# ones, which are emitted without their own copy of the data URI.
+_SHARED_IMAGES_JS = """
+document.querySelectorAll('img[data-asset-src]').forEach(function (img) {
+  var first = document.querySelector('img[data-asset="' + img.getAttribute('data-asset-src') + '"]');
+  if (first.srcset) img.srcset = first.srcset;
+  img.src = first.getAttribute('src');
+});
+"""
+
+
+def _resolve_asset(asset, publish, shared):
+    """Yield the chunks an asset token expands to.
+
+    With publish=None everything is inlined and images are yielded as
+    ImageRefs for the writer to stream; otherwise publish(asset) returns
+    the URL of the asset's published file. `shared` maps the key of each
+    image used more than once to whether it has been emitted yet.
+    """
+    if isinstance(asset, ImageRef):
+        yield publish(asset) if publish else asset
+    elif isinstance(asset, TextAsset):
+        yield asset.tag(publish(asset) if publish else None)
+    else:
+        with_srcset = len(asset.candidates) > 1 and (publish or EMBED_SRCSET)
+        key = asset.src.key
+        if shared.get(key):
+            yield f'data-asset-src="{key[:12]}"'
+        else:
+            yield 'src="'
+            yield from _resolve_asset(asset.src, publish, shared)
+            yield '"'
+            if key in shared:
+                shared[key] = True
+                yield f' data-asset="{key[:12]}"'
+            if with_srcset:
+                yield ' srcset="'
+                for i, (ref, w) in enumerate(asset.candidates):
+                    if i:
+                        yield ", "
+                    yield from _resolve_asset(ref, publish, shared)
+                    yield f" {w}w"
+                yield '"'
+        if with_srcset:
+            yield f' sizes="{asset.sizes}"'
+
+
+def _split_asset_tokens(text, publish, shared):
+    """Yield str chunks and ImageRefs for a rendered template."""
+    pos = 0
+    for m in _ASSET_TOKEN_RE.finditer(text):
+        yield text[pos:m.start()]
+        yield from _resolve_asset(_assets[int(m.group(1))], publish, shared)
+        pos = m.end()
+    yield text[pos:]
+
+
+def _repeated_images(templates):
+    """Return the keys of images that more than one <img> in `templates` uses."""
+    seen = set()
+    repeated = set()
+    for text in templates:
+        for m in _ASSET_TOKEN_RE.finditer(text):
+            asset = _assets[int(m.group(1))]
+            if isinstance(asset, ImgSource):
+                if asset.src.key in seen:
+                    repeated.add(asset.src.key)
+                seen.add(asset.src.key)
+    return repeated
+
+
+# ============================================================
+# OUTPUT OPTIMIZATION
+# ============================================================
+
+_CSS_COMMENT_RE = re.compile(r"/\*.*?\*/", re.S)
+_CSS_PUNCT_RE = re.compile(r" ?([{};,>]) ?")
+_LINE_BREAK_RE = re.compile(r"[ \t]*\n\s*")
+
+
+def minify_css(css):
+    """Drop comments and the whitespace CSS does not need.
+
+    Spaces inside values (`1px solid`, `calc(a + b)`) and before a
+    pseudo-class colon are kept; the stylesheet has no quoted strings that
+    whitespace collapsing could alter.
+    """
+    css = _CSS_COMMENT_RE.sub("", css)
+    css = re.sub(r"\s+", " ", css)
+    css = _CSS_PUNCT_RE.sub(r"\1", css).replace(": ", ":").replace(";}", "}")
+    return css.strip()
+
+
+def minify_js(js):
+    """Strip indentation, blank lines and whole-line // comments.
+
+    Line breaks are kept, so automatic semicolon insertion sees the same
+    code.
+    """
+    lines = (line.strip() for line in js.splitlines())
+    return "\n".join(line for line in lines if line and not line.startswith("//"))
+
+
+def minify_html(html):
+    """Collapse each line break and the indentation around it to one newline.
+
+    Whitespace inside a line is left alone, so inline text spacing is
+    unchanged; the templates have no <pre> or <textarea> blocks.
+    """
+    return _LINE_BREAK_RE.sub("\n", html)
+
+
+def _minify_template(text, saved, inline=True):
+    """Minify a section template and the stylesheets and scripts it uses.
+
+    Adds the bytes removed from the document (as UTF-8) to saved[0];
+    stylesheets and scripts count only when they are `inline`.
+    """
+    def size(s):
+        return len(s.encode('utf-8'))
+
+    def minify_asset(m):
+        asset = _assets[int(m.group(1))]
+        if isinstance(asset, TextAsset):
+            text = minify_css(asset.text) if asset.ext == "css" else minify_js(asset.text)
+            if inline:
+                saved[0] += size(asset.text) - size(text)
+            asset = TextAsset(asset.name, asset.ext, text)
+        return asset_token(asset)
+
+    minified = _ASSET_TOKEN_RE.sub(minify_asset, minify_html(text))
+    saved[0] += size(_ASSET_TOKEN_RE.sub("", text)) - size(_ASSET_TOKEN_RE.sub("", minified))
+    return minified
+
+
+def precompress(path):
+    """Write path.gz, and path.br when brotli is installed, beside `path`.
+
+    Returns {suffix: compressed size in bytes}.
+    """
+    import gzip
+    import shutil
+
+    sizes = {}
+    tmp_path = _tmp_path(path + ".gz")
+    with open(path, 'rb') as src, open(tmp_path, 'wb') as raw:
+        with gzip.GzipFile(filename="", mode='wb', fileobj=raw, compresslevel=GZIP_LEVEL, mtime=0) as out:
+            shutil.copyfileobj(src, out, COPY_BLOCK)
+    os.replace(tmp_path, path + ".gz")
+    sizes[".gz"] = os.path.getsize(path + ".gz")
+    if brotli is not None:
+        compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        tmp_path = _tmp_path(path + ".br")
+        with open(path, 'rb') as src, open(tmp_path, 'wb') as out:
+            for block in iter(lambda: src.read(COPY_BLOCK), b""):
+                out.write(compressor.process(block))
+            out.write(compressor.finish())
+        os.replace(tmp_path, path + ".br")
+        sizes[".br"] = os.path.getsize(path + ".br")
+    return sizes
+
+
+def iter_html(publish=None, sections=None, document=None, minify=False, saved=None):
+    """Yield the document section by section as str chunks and ImageRefs.
+
+    Section templates are rendered up front (they only hold tokens, not
+    image data) so that, when inlining with SHARE_IMAGES, an image used in
+    several places is embedded once and the other <img> tags reuse it.
+    `sections` and `document` are passed to render_sections(). With
+    `minify`, markup, CSS and JS are minified, and the bytes removed are
+    added to saved[0] when a list is given.
+    """
+    templates = render_sections(sections, document)
+    if minify:
+        saved = [0] if saved is None else saved
+        templates = [_minify_template(text, saved, publish is None) for text in templates]
+    shared = dict.fromkeys(_repeated_images(templates), False) if SHARE_IMAGES and not publish else {}
+    yield from _split_asset_tokens(templates[0], publish, shared)
+    for text in templates[1:]:
+        yield from _split_asset_tokens(text, publish, shared)
+        yield "\n"
+
+    def squeeze(text, minifier):
+        if not minify:
+            return text
+        small = minifier(text)
+        saved[0] += len(text.encode('utf-8')) - len(small.encode('utf-8'))
+        return small
+
+    if shared:
+        yield f"<script>{squeeze(_SHARED_IMAGES_JS, minify_js)}</script>\n"
+    yield squeeze(build_tail(), minify_html)
+
+
+def build_html():
+    """Render the whole document, with every asset inlined, into one string."""
+    return "".join(str(chunk) for chunk in iter_html())
+
+
+def _asset_publisher(out_dir, manifest):
+    """Return a publish(asset) callable that writes content-hashed asset files.
+
+    Files land in <out_dir>/assets/ named <name>.<hash>.<ext>. Existing
+    files are left alone: a hashed name always holds the same content.
+    Each URL is recorded in `manifest` as {url: (source folder or None,
+    file name)}; see _manifest_assets().
+    """
+    asset_dir = os.path.join(out_dir, "assets")
+    os.makedirs(asset_dir, exist_ok=True)
+
+    def publish(asset):
+        if isinstance(asset, ImageRef):
+            stem, ext = os.path.splitext(asset.name)
+        else:
+            stem, ext = asset.name, "." + asset.ext
+        slug = re.sub(r"[^A-Za-z0-9_]+", "-", stem).strip("-")
+        filename = f"{slug}.{asset.key[:12]}{ext}"
+        url = f"assets/{filename}"
+        file_path = os.path.join(asset_dir, filename)
+        if not os.path.exists(file_path):
+            tmp_path = _tmp_path(file_path)
+            if isinstance(asset, ImageRef):
+                with open(tmp_path, 'wb') as f:
+                    asset.write_binary(f)
+            else:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(asset.text)
+            os.replace(tmp_path, file_path)
+        manifest[url] = (getattr(asset, "folder", None), stem + ext)
+        return url
+
+    return publish
+
+
+def _manifest_assets(manifest):
+    """manifest.json's {name: url}. Images are named by their path relative
+    to the folder all the images came from, so two images with the same
+    file name in different folders keep separate entries."""
+    folders = {folder for folder, name in manifest.values() if folder}
+    try:
+        root = os.path.commonpath(folders) if folders else None
+    except ValueError:  # folders on different drives
+        root = None
+    assets = {}
+    for url, (folder, name) in manifest.items():
+        if folder:
+            name = os.path.join(folder, name)
+            name = (os.path.relpath(name, root) if root else name).replace(os.sep, "/")
+        assets[name] = url
+    return dict(sorted(assets.items()))
+
+
+def write_html(path, assets="inline", sections=None, minify=False, compress=False):
+    """Stream the document to `path` without holding it in memory.
+
+    Only one section's markup is alive at a time. With assets="inline" image
+    data is copied from the cache into the file handle in fixed-size blocks.
+    With assets="external" images, CSS and map scripts are written as
+    content-hashed files beside `path`, listed in manifest.json. With
+    `sections`, only those are re-rendered (see render_sections()). The
+    file is replaced only once the whole document has been written.
+
+    `minify` minifies the markup, CSS and JS; `compress` writes .gz and .br
+    copies of the document (and of published CSS and JS) with
+    precompress(). Returns the document's size in bytes at each step:
+    {"raw", "minified", ".gz", ".br"}, for the steps that ran.
+    """
+    publish = None
+    manifest = {}
+    saved = [0]
+    out_dir = os.path.dirname(os.path.abspath(path))
+    if assets == "external":
+        publish = _asset_publisher(out_dir, manifest)
+    tmp_path = _tmp_path(path)
+    try:
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for chunk in iter_html(publish, sections, path, minify, saved):
+                if isinstance(chunk, ImageRef):
+                    chunk.write_to(f)
+                else:
+                    f.write(chunk)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    if publish:
+        with open(os.path.join(out_dir, "manifest.json"), 'w', encoding='utf-8') as f:
+            json.dump({"document": os.path.basename(path), "assets": _manifest_assets(manifest)}, f, indent=2)
+    size = os.path.getsize(path)
+    sizes = {"raw": size + saved[0], "minified": size} if minify else {"raw": size}
+    if compress:
+        sizes.update(precompress(path))
+        for url in manifest:
+            asset_path = os.path.join(out_dir, *url.split("/"))
+            if url.endswith((".css", ".js")) and not os.path.exists(asset_path + ".gz"):
+                precompress(asset_path)
+    return sizes
+
+
+# ============================================================
+# PORTFOLIO BATCH
+# ============================================================
+
+# Names a property data file may set. The financing and underwriting
+# assumptions it leaves out fall back to the values in this script.
+PROPERTY_DATA = (
+    "PROPERTY", "SUBJECT_COORDS", "RENT_ROLL", "VACANCY_RATE", "OTHER_INCOME_ANNUAL", "EXPENSES",
+    "MGMT_FEE_PCT", "LTV", "INTEREST_RATE", "AMORT_YEARS", "LOAN_TERM_YEARS", "HOLD_YEARS", "SALE_COMPS",
+    "RENT_COMPS_3BR", "RENT_COMPS_4BR", "BUILDING_SYSTEMS", "REGULATORY", "TRANSACTION_HISTORY", "NARRATIVE",
+    "HERO_PHOTO", "GRID_PHOTOS", "MARKET_RENT_METHOD",
+)
+# Descriptions of this property; a data file that leaves one out gets none
+# rather than 9015 Owensmouth's.
+PROPERTY_TEXT = ("BUILDING_SYSTEMS", "REGULATORY", "TRANSACTION_HISTORY", "NARRATIVE")
+# Facts about this property that no other property shares: a data file must
+# set each one (comps may come from --comp-db instead).
+PROPERTY_REQUIRED = ("PROPERTY", "SUBJECT_COORDS", "RENT_ROLL", "EXPENSES", "SALE_COMPS",
+                     "RENT_COMPS_3BR", "RENT_COMPS_4BR", "HERO_PHOTO", "GRID_PHOTOS")
+_property_defaults = {name: type(globals()[name])() if name in PROPERTY_TEXT else globals()[name]
+                      for name in PROPERTY_DATA if name not in PROPERTY_REQUIRED}
+
+
+def load_property(path):
+    """Read a property data file: a JSON object keyed by PROPERTY_DATA names.
+
+    RENT_ROLL may be a list of units or the path of a CSV/XLSX export,
+    read with read_rent_roll(). Paths are relative to the file.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    unknown = sorted(set(data) - set(PROPERTY_DATA))
+    if unknown:
+        raise ValueError(f"{path}: unknown keys {', '.join(unknown)}")
+    base = os.path.dirname(os.path.abspath(path))
+    if isinstance(data.get("RENT_ROLL"), str):
+        data["RENT_ROLL"] = read_rent_roll(os.path.join(base, data["RENT_ROLL"]))
+    if "HERO_PHOTO" in data:
+        data["HERO_PHOTO"] = os.path.join(base, data["HERO_PHOTO"])
+    if "GRID_PHOTOS" in data:
+        data["GRID_PHOTOS"] = [os.path.join(base, p) for p in data["GRID_PHOTOS"]]
+    return data
+
+
+def _build_property(path, out_path, assets, settings, comp_db=None, sections=None, minify=False, compress=False):
+    """Worker: build one property's BOV and return the seconds it took."""
+    start = time.perf_counter()
+    data = load_property(path)
+    if comp_db and "SUBJECT_COORDS" in data:
+        data = {**comps_from_store(open_comp_store(comp_db), data["SUBJECT_COORDS"]), **data}
+    missing = [name for name in PROPERTY_REQUIRED if name not in data]
+    if missing:
+        raise ValueError(f"{path}: missing {', '.join(missing)}")
+    model.set(**{**_property_defaults, **data, **settings})
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    write_html(out_path, assets=assets, sections=sections, minify=minify, compress=compress)
+    return time.perf_counter() - start
+
+
+def build_portfolio(data_dir, out_dir, workers=None, assets="inline", comp_db=None, sections=None,
+                    minify=False, compress=False, **settings):
+    """Build a BOV for every *.json property file in `data_dir`.
+
+    Each property is written to out_dir/<file name>/index.html on a pool of
+    worker processes. Branding images are encoded once up front; workers
+    read them from the shared image cache. With `comp_db`, comps a data
+    file does not list are selected from that CompStore, one connection
+    per worker. With `sections`, only those sections are re-rendered in
+    each existing BOV; `minify` and `compress` are passed to write_html().
+    `settings` are extra inputs applied to every property
+    (e.g. MC_TRIALS). Returns [(name, seconds or
+    None, error or None)] in file-name order; one property failing does not
+    stop the others.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    names = sorted(n for n in os.listdir(data_dir) if n.lower().endswith(".json"))
+    load_images(BRAND_SPECS)
+    results = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = []
+        for name in names:
+            stem = os.path.splitext(name)[0]
+            out_path = os.path.join(out_dir, stem, "index.html")
+            futures.append((stem, pool.submit(_build_property, os.path.join(data_dir, name), out_path, assets, settings, comp_db, sections, minify, compress)))
+        for stem, future in futures:
+            try:
+                results.append((stem, future.result(), None))
+            except Exception as e:
+                results.append((stem, None, f"{type(e).__name__}: {e}"))
+    return results
+
+
+# ============================================================
+# WATCH MODE
+# ============================================================
+
+LIVE_RELOAD_PATH = "/__livereload"
+WATCH_INTERVAL = 0.25  # seconds between polls of the watched files
+WATCH_DEBOUNCE = 0.3  # quiet seconds after the last change before rebuilding
+WATCH_IMAGE_TYPES = (".jpg", ".jpeg", ".png", ".webp", ".gif", ".tif", ".tiff")  # files a watched directory tracks
+
+# Served pages reload when the server announces a build they have not seen.
+# After a restart the stream reconnects and gets the new build at once.
+_LIVE_RELOAD_JS = """
+(function () {
+  var build = null;
+  new EventSource('%s').onmessage = function (e) {
+    if (build !== null && e.data !== build) location.reload();
+    build = e.data;
+  };
+})();
+""" % LIVE_RELOAD_PATH
+
+
+class LiveReloadServer:
+    """Serves the directory of an output file on localhost.
+
+    The document is served with a live-reload script added, and
+    reload() tells every open page to fetch it again over a server-sent
+    event stream. The file on disk is not modified.
+    """
+
+    def __init__(self, path, port=8000):
+        from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+        self.path = os.path.abspath(path)
+        self.build_id = str(time.time_ns())
+        self.changed = threading.Condition()
+        server = self
+        document = "/" + os.path.basename(self.path)
+
+        class Handler(SimpleHTTPRequestHandler):
+            def __init__(self, *args, **kwargs):
+                super().__init__(*args, directory=os.path.dirname(server.path), **kwargs)
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_GET(self):
+                route = self.path.split("?", 1)[0]
+                if route == LIVE_RELOAD_PATH:
+                    server._stream(self)
+                elif route in ("/", document):
+                    server._send_document(self)
+                else:
+                    super().do_GET()
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), Handler)
+        self.httpd.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}/"
+        threading.Thread(target=self.httpd.serve_forever, daemon=True).start()
+
+    def _send_document(self, handler):
+        with open(self.path, 'rb') as f:
+            body = f.read()
+        at = body.rfind(b"</body>")
+        at = len(body) if at < 0 else at
+        body = body[:at] + f"<script>{_LIVE_RELOAD_JS}</script>\n".encode('utf-8') + body[at:]
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/html; charset=utf-8")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def _stream(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", "text/event-stream")
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        sent = None
+        try:
+            while True:
+                with self.changed:
+                    if self.build_id == sent:
+                        self.changed.wait(15)
+                    build_id = self.build_id
+                if build_id == sent:
+                    handler.wfile.write(b": ping\n\n")  # keeps idle connections open
+                else:
+                    handler.wfile.write(f"data: {build_id}\n\n".encode('ascii'))
+                    sent = build_id
+                handler.wfile.flush()
+        except OSError:
+            pass  # the page went away
+
+    def reload(self):
+        with self.changed:
+            self.build_id = str(time.time_ns())
+            self.changed.notify_all()
+
+    def close(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+def _stamp(path):
+    """(mtime, size) of a file, or None when it is missing.
+
+    For a directory, (newest mtime, every image file under it with its
+    stamp), so a photo added, removed or renamed there is a change too.
+    """
+    if os.path.isdir(path):
+        entries = []
+        for root, dirs, files in os.walk(path):
+            dirs.sort()
+            for name in sorted(files):
+                if name.lower().endswith(WATCH_IMAGE_TYPES):
+                    file = os.path.join(root, name)
+                    entries.append((file, _stamp(file)))
+        return max((s[0] for _, s in entries if s), default=0), tuple(entries)
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def reload_data(script, old_source, new_source):
+    """Re-read data edited in this script without restarting.
+
+    When the only top-level statements that changed between `old_source`
+    and `new_source` assign public names (EXPENSES = {...}), runs them
+    and every later assignment that derives from them, and returns
+    {name: new value} for Graph.set(). Returns None when the edit needs a
+    restart: changed code, or a changed name that a definition or other
+    module-level statement already captured.
+    """
+    import ast
+
+    old, new = ast.parse(old_source).body, ast.parse(new_source).body
+    if len(old) != len(new):
+        return None
+    scratch = dict(globals())
+    changed = set()
+    for before, after in zip(old, new):
+        edited = ast.dump(before) != ast.dump(after)
+        if not (edited or _import_time_names(after) & changed):
+            continue
+        targets = after.targets if isinstance(after, ast.Assign) else ()
+        if not targets or not all(isinstance(t, ast.Name) and not t.id.startswith("_") for t in targets):
+            return None
+        exec(compile(ast.Module([after], type_ignores=[]), script, "exec"), scratch)
+        changed.update(t.id for t in targets)
+    return {name: scratch[name] for name in changed}
+
+
+def watch(output, assets, sources, port=8000, minify=False, compress=False):
+    """Rebuild `output` whenever a watched file changes, until interrupted.
+
+    `sources` maps a file or directory path to a callable that reads the
+    change into the model; a directory is scanned for image files (see
+    _stamp()). Changes are debounced, and a rebuild only re-renders
+    the sections whose inputs moved (see render_sections()). An edit to
+    the data in this script is applied in place (see reload_data()); any
+    other edit to it restarts the process with the same arguments.
+    `minify` and `compress` are passed to write_html().
+    """
+    server = LiveReloadServer(output, port)
+    script = os.path.abspath(__file__)
+    with open(script, encoding='utf-8') as f:
+        source = f.read()
+    stamps = {path: _stamp(path) for path in [script, *sources]}
+    print(f"Serving {server.url} - watching {len(stamps)} files and folders (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(WATCH_INTERVAL)
+            if all(_stamp(path) == stamp for path, stamp in stamps.items()):
+                continue
+            current = {path: _stamp(path) for path in stamps}
+            while True:
+                time.sleep(WATCH_DEBOUNCE)
+                settled = {path: _stamp(path) for path in stamps}
+                if settled == current:
+                    break
+                current = settled
+            changed = [path for path in stamps if current[path] != stamps[path]]
+            stamps = current
+            start = time.perf_counter()
+            data = None
+            if script in changed:
+                with open(script, encoding='utf-8') as f:
+                    edited = f.read()
+                try:
+                    data = reload_data(script, source, edited)
+                except Exception as e:
+                    print(f"Rebuild failed: {type(e).__name__}: {e}")
+                    continue
+                if data is None:
+                    print(f"{os.path.basename(script)} changed; restarting...")
+                    server.close()
+                    os.execv(sys.executable, [sys.executable] + sys.argv)
+                source = edited
+            try:
+                if data:
+                    model.set(**data)
+                for path in changed:
+                    if path != script:
+                        sources[path]()
+                write_html(output, assets=assets, minify=minify, compress=compress)
+            except Exception as e:
+                print(f"Rebuild failed: {type(e).__name__}: {e}")
+                continue
+            server.reload()
+            saved = max((current[path][0] for path in changed if current[path]), default=time.time_ns())
+            print(f"{', '.join(os.path.basename(p) for p in changed)} changed: "
+                  f"rendered {', '.join(_rendered) or 'nothing'} in {(time.perf_counter() - start) * 1000:.0f} ms, "
+                  f"{(time.time_ns() - saved) / 1e6:.0f} ms after save")
+    except KeyboardInterrupt:
+        server.close()
+
+
 # ============================================================
 # MAIN
 # ============================================================
 
 if __name__ == "__main__":
+    import argparse
+
+    def solve_target(text):
+        """--solve METRIC=TARGET -> (metric, target)."""
+        metric, _, target = text.partition("=")
+        if metric not in SOLVER_METRICS:
+            raise argparse.ArgumentTypeError(f"bad {text!r}; expected METRIC=TARGET with METRIC in {', '.join(SOLVER_METRICS)}")
+        try:
+            value = float(target)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad {text!r}; TARGET must be a number") from None
+        if not 0 < value <= SOLVER_TARGET_MAX[metric]:
+            raise argparse.ArgumentTypeError(
+                f"bad {text!r}; a {metric} target must be above 0 and at most {SOLVER_TARGET_MAX[metric]:g}")
+        return metric, value
+
+    parser = argparse.ArgumentParser(description="Build the BOV web presentation.")
+    parser.add_argument("-o", "--output", default=OUTPUT_FILE, help="output HTML file")
+    parser.add_argument("--assets", choices=("inline", "external"), default="inline",
+                        help="inline: one self-contained file (for email); external: content-hashed asset files plus manifest.json")
+    parser.add_argument("--trials", type=int, default=MC_TRIALS, help="Monte Carlo trials for the risk section")
+    parser.add_argument("--seed", type=int, default=MC_SEED, help="Monte Carlo random seed")
+    parser.add_argument("--solve", action="append", type=solve_target, metavar="METRIC=TARGET",
+                        help=f"print the price that hits a target and exit; repeat for several constraints (metrics: {', '.join(SOLVER_METRICS)})")
+    parser.add_argument("--share-images", action="store_true",
+                        help="embed each repeated image once and fill in its other uses by script "
+                             "(smaller, but those images are blank where scripts do not run)")
+    parser.add_argument("--rent-roll", metavar="FILE", help="read the rent roll from a CSV/XLSX export")
+    parser.add_argument("--market-rent", choices=MARKET_RENT_METHODS,
+                        help="derive the rent roll's market rents from the rent comps with this estimate")
+    parser.add_argument("--comp-db", nargs="?", const=COMP_DB, metavar="PATH",
+                        help=f"select sale and rent comps from a SQLite comp store (default {COMP_DB})")
+    parser.add_argument("--comp-pool", metavar="FILE",
+                        help="select the sale comps from a large comp file (JSON, CSV or XLSX) by SALE_COMP_QUERY")
+    parser.add_argument("--import-sale-comps", action="append", metavar="FILE",
+                        help="bulk import sale comps (JSON, CSV or XLSX) into the comp store and exit")
+    parser.add_argument("--import-rent-comps", action="append", metavar="FILE",
+                        help="bulk import rent comps (JSON, CSV or XLSX) into the comp store and exit")
+    parser.add_argument("--minify", action="store_true", help="minify the HTML, CSS and inline JS")
+    parser.add_argument("--precompress", action="store_true",
+                        help="also write .gz and .br copies of the output for static hosts that serve them directly")
+    parser.add_argument("--sections", type=lambda s: [n.strip() for n in s.split(",") if n.strip()], metavar="NAME,...",
+                        help=f"re-render only these sections into the last build of the output (sections: {', '.join(SECTIONS)})")
+    parser.add_argument("--watch", action="store_true",
+                        help="after building, serve the output with live reload and rebuild when an input file changes")
+    parser.add_argument("--port", type=int, default=8000, help="port for --watch (default 8000)")
+    parser.add_argument("--batch", metavar="DATA_DIR",
+                        help="build a BOV for every property JSON file in DATA_DIR into OUT_DIR/<name>/index.html")
+    parser.add_argument("--out-dir", help="output directory for --batch (default: DATA_DIR/bov)")
+    parser.add_argument("--workers", type=int, help="worker processes for --batch (default: CPU count)")
+    args = parser.parse_args()
+    unknown = sorted(set(args.sections or ()) - set(SECTIONS))
+    if unknown:
+        parser.error(f"unknown --sections {', '.join(unknown)}; expected some of {', '.join(SECTIONS)}")
+    if args.watch and (args.batch or args.solve):
+        parser.error("--watch builds a single BOV; it cannot be combined with --batch or --solve")
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding='utf-8', line_buffering=True)
+
+    if args.import_sale_comps or args.import_rent_comps:
+        store = open_comp_store(args.comp_db or COMP_DB)
+        for path in args.import_sale_comps or ():
+            print(f"Imported {store.import_sale_comps(read_comp_file(path), path)} sale comps from {path}")
+        for path in args.import_rent_comps or ():
+            print(f"Imported {store.import_rent_comps(read_comp_file(path))} rent comps from {path}")
+        sys.exit(0)
+
+    if args.batch:
+        out_dir = args.out_dir or os.path.join(args.batch, "bov")
+        print(f"Building portfolio from {args.batch}...")
+        start = time.perf_counter()
+        settings = {"MC_TRIALS": args.trials, "MC_SEED": args.seed, "SHARE_IMAGES": args.share_images}
+        if args.market_rent:
+            settings["MARKET_RENT_METHOD"] = args.market_rent
+        results = build_portfolio(args.batch, out_dir, args.workers, args.assets, args.comp_db, args.sections,
+                                  args.minify, args.precompress, **settings)
+        for name, seconds, error in results:
+            if error:
+                print(f"  FAILED  {name}: {error}")
+            else:
+                print(f"  {seconds:6.2f}s {name}")
+        failed = sum(1 for r in results if r[2])
+        print(f"Built {len(results) - failed} of {len(results)} in {time.perf_counter() - start:.2f}s -> {out_dir}")
+        sys.exit(1 if failed else 0)
+
+    model.set(MC_TRIALS=args.trials, MC_SEED=args.seed, SHARE_IMAGES=args.share_images)
+    if args.rent_roll:
+        model.set(RENT_ROLL=read_rent_roll(args.rent_roll))
+    if (args.comp_db or args.comp_pool) and np is None:
+        parser.error("--comp-db and --comp-pool require NumPy")
+    if args.comp_db:
+        model.set(**comps_from_store(open_comp_store(args.comp_db)))
+    if args.comp_pool:
+        model.set(**comps_from_pool(args.comp_pool))
+    if args.market_rent:
+        model.set(MARKET_RENT_METHOD=args.market_rent)
+
+    if args.solve:
+        if np is None:
+            parser.error("--solve requires NumPy")
+        constraints = dict(args.solve)
+        best, binding, limits = max_price(**constraints)
+        for metric, limit in limits.items():
+            print(f"{SOLVER_METRICS[metric]} = {constraints[metric]:g}: {fmt_price(limit)} ({fmt_price(limit / PROPERTY['units'])}/unit)")
+        if len(limits) > 1:
+            print(f"Max price meeting all constraints: {fmt_price(best)} (bound by {binding})")
+        sys.exit(0)
+
+    print("Encoding images...")
+    model["images"]
+    print("Images encoded.")
     print("Building BOV presentation...")
-    html = build_html()
+    sizes = write_html(args.output, assets=args.assets, sections=args.sections,
+                       minify=args.minify, compress=args.precompress)
     
-    with open(OUTPUT_FILE, 'w', encoding='utf-8') as f:
-        f.write(html)
-    
-    size_kb = os.path.getsize(OUTPUT_FILE) / 1024
-    print(f"Generated: {OUTPUT_FILE}")
+    size_kb = os.path.getsize(args.output) / 1024
+    print(f"Generated: {args.output}")
     print(f"File size: {size_kb:.1f} KB")
+    if args.minify:
+        print(f"  minified: {sizes['raw'] / 1024:.1f} KB -> {sizes['minified'] / 1024:.1f} KB "
+              f"(saved {(sizes['raw'] - sizes['minified']) / 1024:.1f} KB)")
+    for suffix in (".gz", ".br"):
+        if suffix in sizes:
+            print(f"  {os.path.basename(args.output)}{suffix}: {sizes[suffix] / 1024:.1f} KB "
+                  f"(saved {(1 - sizes[suffix] / (size_kb * 1024)) * 100:.1f}%)")
     print("Done!")
+
+    if args.watch:
+        # Whole image folders, so a photo dropped in under a name the build uses is picked up.
+        folders = {}
+        for names, paths in ((("BRAND_SPECS",), [path for path, role in BRAND_SPECS.values()]),
+                             (("HERO_PHOTO", "GRID_PHOTOS"), [*GRID_PHOTOS, HERO_PHOTO])):
+            for path in paths:
+                folders.setdefault(os.path.dirname(os.path.abspath(path)), set()).update(names)
+        sources = {folder: functools.partial(model.touch, *sorted(names)) for folder, names in folders.items()}
+        if args.rent_roll:
+            sources[args.rent_roll] = lambda: model.set(RENT_ROLL=read_rent_roll(args.rent_roll))
+        if args.comp_db:
+            sources[args.comp_db] = lambda: model.set(**comps_from_store(open_comp_store(args.comp_db)))
+        if args.comp_pool:
+            sources[args.comp_pool] = lambda: model.set(**comps_from_pool(args.comp_pool))
+        watch(args.output, args.assets, sources, args.port, args.minify, args.precompress)
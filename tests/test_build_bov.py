@@ -0,0 +1,803 @@
+"""End-to-end checks that run build_bov.py as the command line does."""
+
+import json
+import os
+import shutil
+import subprocess
+import sys
+
+import pytest
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "build_bov.py")
+
+
+def run_bov(tmp_path, *args):
+    """Run a copy of the script in tmp_path, so its .bov_cache starts cold."""
+    script = tmp_path / "build_bov.py"
+    if not script.exists():
+        shutil.copy(SCRIPT, script)
+    env = {**os.environ, "BOV_BRAND_DIR": str(tmp_path / "branding"), "BOV_PHOTOS_DIR": str(tmp_path / "pictures")}
+    return subprocess.run([sys.executable, str(script), *args], cwd=tmp_path, env=env,
+                          capture_output=True, text=True, timeout=600)
+
+
+@pytest.fixture
+def photos(tmp_path):
+    """The photos and branding images the default build expects."""
+    Image = pytest.importorskip("PIL.Image")
+    (tmp_path / "pictures").mkdir()
+    for n in (3, 4, 5, 6):
+        Image.new("RGB", (1600, 1067), (40 * n, 90, 120)).save(tmp_path / "pictures" / f"image ({n}).jpg")
+    for folder, name in (("logos", "LAAA_Team_White"), ("headshots", "Glen_Scher"),
+                         ("headshots", "Filip_Niculete"), ("headshots", "Blake_Lewitt")):
+        (tmp_path / "branding" / folder).mkdir(parents=True, exist_ok=True)
+        Image.new("RGBA", (400, 400), (255, 255, 255, 128)).save(tmp_path / "branding" / folder / f"{name}.png")
+    return tmp_path
+
+
+def test_cold_cache_build_with_several_image_workers(photos):
+    result = run_bov(photos, "-o", str(photos / "index.html"))
+    assert result.returncode == 0, result.stderr
+    assert (photos / "index.html").stat().st_size > 0
+
+
+def test_repeated_images_are_embedded_in_full_unless_shared(photos):
+    import re
+
+    plain, shared = photos / "plain.html", photos / "shared.html"
+    for out, *flags in ((plain,), (shared, "--share-images")):
+        result = run_bov(photos, "-o", str(out), *flags)
+        assert result.returncode == 0, result.stderr
+    html = plain.read_text(encoding="utf-8")
+    imgs = re.findall(r"<img [^>]*>", html)
+    assert imgs and all(' src="data:' in img for img in imgs) and "data-asset-src" not in html
+    html = shared.read_text(encoding="utf-8")
+    assert "data-asset-src" in html and len(html) < plain.stat().st_size
+
+
+def test_solve_rejects_a_non_numeric_target(tmp_path):
+    pytest.importorskip("numpy")
+    result = run_bov(tmp_path, "--solve", "cap=abc")
+    assert result.returncode == 2
+    assert "argument --solve: bad 'cap=abc'" in result.stderr
+    assert "Traceback" not in result.stderr
+
+
+def test_solve_uses_the_rent_roll_file(tmp_path):
+    pytest.importorskip("numpy")
+
+    def solve_with(market_rent):
+        path = tmp_path / f"rent_roll_{market_rent}.csv"
+        rows = [f"#{101 + i},3 Bed / 2 Bath,1200,2500,{market_rent}" for i in range(20)]
+        path.write_text("unit,type,sf,current_rent,market_rent\n" + "\n".join(rows) + "\n")
+        result = run_bov(tmp_path, "--solve", "cap=0.05", "--rent-roll", str(path))
+        assert result.returncode == 0, result.stderr
+        return result.stdout
+
+    default = run_bov(tmp_path, "--solve", "cap=0.05").stdout
+    low, high = solve_with(3000), solve_with(4000)
+    assert len({default, low, high}) == 3
+
+
+def test_read_rent_roll_finds_the_header_and_reads_messy_cells(tmp_path):
+    bov = load_bov()
+    path = tmp_path / "export.csv"
+    path.write_text("Valley Property Management\nRent Roll as of 10/01/2025\n\n"
+                    "Unit #,Bd/Ba,Sq Ft,Actual Rent,Market\n"
+                    "101,3 Bed / 1.5 Bath,\"1,100\",\"$2,450.00\",\"$2,950\"\n"
+                    "102,3 Bed / 1.5 Bath,1100,,2950\n"
+                    ",,,,\n"
+                    "201,4 Bed / 2 Bath,1350,3200,\n"
+                    "Total,,3550,5650,5900\n")
+    rent_roll = bov.read_rent_roll(str(path))
+    assert [u["unit"] for u in rent_roll] == ["101", "102", "201"]
+    assert list(rent_roll)[0] == {"unit": "101", "type": "3 Bed / 1.5 Bath", "sf": 1100, "current_rent": 2450,
+                                  "market_rent": 2950}
+    assert rent_roll.summary["current_rent"] == 5650 and rent_roll.summary["market_rent"] == 5900
+    assert rent_roll.summary["by_type"]["3 Bed / 1.5 Bath"]["units"] == 2
+
+    path.write_text("apt,sqft,rent\n1,700,1500\n")
+    assert list(bov.read_rent_roll(str(path))) == [{"unit": "1", "type": "Unit", "sf": 700, "current_rent": 1500,
+                                                    "market_rent": 1500}]
+    path.write_text("unit,bedrooms,rent\n1,2,1500\n")
+    with pytest.raises(ValueError, match="no header row"):
+        bov.read_rent_roll(str(path))
+    path.write_text("unit,sf,rent\n1,700,call\n")
+    with pytest.raises(ValueError, match="unit 1"):
+        bov.read_rent_roll(str(path))
+
+
+def test_long_rent_roll_keeps_only_its_summary(tmp_path):
+    bov = load_bov()
+    path = tmp_path / "long.csv"
+    rows = [f"{i},{'3/2' if i % 2 else '4/2'},1000,{2000 + i},3000" for i in range(1, 8)]
+    path.write_text("unit,type,sf,rent,market rent\n" + "\n".join(rows) + "\n")
+    full, short = bov.read_rent_roll(str(path)), bov.read_rent_roll(str(path), max_rows=3)
+    assert full.detailed and not short.detailed and len(short) == 7
+    assert short.summary == full.summary == bov.summarize_rent_roll(list(full))
+    with pytest.raises(ValueError, match="more than 3 units"):
+        list(short)
+    remarketed = short.remarket({4: 3500})
+    assert remarketed.summary["by_type"]["4/2"]["market_rent"] == 3 * 3500
+    assert remarketed.summary["market_rent"] == 4 * 3000 + 3 * 3500
+    assert remarketed.summary["current_rent"] == full.summary["current_rent"]
+
+
+def test_xlsx_rent_roll_matches_the_csv(tmp_path):
+    bov = load_bov()
+    header = ["Unit", "Unit Type", "SF", "Current Rent", "Market Rent"]
+    rows = [["1", "3 Bed / 2 Bath", 1200, 2500, 3000], ["2", "3 Bed / 2 Bath", 1200, None, 3000]]
+    if bov._lazy_import("openpyxl") is None:
+        with pytest.raises(ImportError, match="requires openpyxl"):
+            bov.read_rent_roll(str(tmp_path / "roll.xlsx"))
+        return
+    import openpyxl
+
+    book = openpyxl.Workbook()
+    book.active.append(["Rent Roll"])
+    for row in [header] + rows:
+        book.active.append(row)
+    book.save(tmp_path / "roll.xlsx")
+    (tmp_path / "roll.csv").write_text("\n".join(",".join("" if c is None else str(c) for c in r)
+                                                 for r in [header] + rows) + "\n")
+    xlsx, csv = bov.read_rent_roll(str(tmp_path / "roll.xlsx")), bov.read_rent_roll(str(tmp_path / "roll.csv"))
+    assert list(xlsx) == list(csv) and xlsx.summary == csv.summary
+
+
+def load_bov():
+    """Import the script as a module, without running its command line."""
+    import importlib.util
+    spec = importlib.util.spec_from_file_location("build_bov", SCRIPT)
+    bov = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(bov)
+    return bov
+
+
+def test_variants_are_upright_and_keep_the_icc_profile(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    ImageCms = pytest.importorskip("PIL.ImageCms")
+    bov = load_bov()
+
+    icc = ImageCms.ImageCmsProfile(ImageCms.createProfile("sRGB")).tobytes()
+    exif = Image.Exif()
+    exif[0x0112] = 6  # orientation: rotate 90 degrees clockwise to display
+    photo = tmp_path / "portrait.jpg"
+    Image.new("RGB", (1200, 800), (200, 30, 30)).save(photo, exif=exif, icc_profile=icc)
+
+    width, height, mime_type, buf = bov._render_variant(str(photo), 400)
+    assert (width, height, mime_type) == (400, 600, "image/jpeg")
+    with Image.open(buf) as variant:
+        assert variant.size == (400, 600)
+        assert variant.info.get("icc_profile") == icc
+
+
+def test_manifest_keeps_same_named_images_apart(tmp_path):
+    bov = load_bov()
+    for folder, color in (("front", b"red"), ("rear", b"blue")):
+        (tmp_path / folder).mkdir()
+        (tmp_path / folder / "photo.jpg").write_bytes(b"\xff\xd8" + color)
+
+    manifest = {}
+    publish = bov._asset_publisher(str(tmp_path / "out"), manifest)
+    urls = [publish(bov.image_ref(str(tmp_path / folder / "photo.jpg"))) for folder in ("front", "rear")]
+    assert urls[0] != urls[1]
+    assert bov._manifest_assets(manifest) == {"front/photo.jpg": urls[0], "rear/photo.jpg": urls[1]}
+
+
+def test_image_cache_is_keyed_by_content_and_survives_a_restart(tmp_path):
+    import base64
+
+    bov = load_bov()
+    bov.CACHE_DIR = str(tmp_path / "cache")
+    (tmp_path / "a.png").write_bytes(b"\x89PNG same bytes")
+    (tmp_path / "b.png").write_bytes(b"\x89PNG same bytes")
+    a, b = bov.image_ref(str(tmp_path / "a.png")), bov.image_ref(str(tmp_path / "b.png"))
+    assert a.key == b.key and os.listdir(tmp_path / "cache" / "images") == [a.key + ".b64"]
+    assert bov.encode_image(str(tmp_path / "a.png")) == \
+        "data:image/png;base64," + base64.b64encode(b"\x89PNG same bytes").decode()
+    blob = tmp_path / "cache" / "images" / (a.key + ".b64")
+    stored = blob.stat().st_mtime_ns
+
+    again = load_bov()
+    again.CACHE_DIR = bov.CACHE_DIR
+    assert again.image_ref(str(tmp_path / "a.png")).key == a.key and blob.stat().st_mtime_ns == stored
+    (tmp_path / "a.png").write_bytes(b"\x89PNG other bytes")
+    assert again.image_ref(str(tmp_path / "a.png")).key != a.key
+
+
+def test_load_images_reports_every_failure_at_once(tmp_path):
+    Image = pytest.importorskip("PIL.Image")
+    bov = load_bov()
+    bov.CACHE_DIR = str(tmp_path / "cache")
+    for n in range(3):
+        Image.new("RGB", (300, 200), (60 * n, 90, 120)).save(tmp_path / f"ok{n}.jpg")
+    (tmp_path / "broken.jpg").write_bytes(b"not a jpeg")
+    specs = {f"ok{n}": (str(tmp_path / f"ok{n}.jpg"), "grid") for n in range(3)}
+    loaded = bov.load_images(specs, max_workers=3)
+    assert list(loaded) == list(specs) and all(img["width"] == 300 for img in loaded.values())
+
+    specs.update(missing=(str(tmp_path / "missing.jpg"), "grid"), broken=(str(tmp_path / "broken.jpg"), "grid"))
+    with pytest.raises(OSError) as failure:
+        bov.load_images(specs, max_workers=3)
+    message = str(failure.value)
+    assert message.startswith("2 image(s) could not be loaded:")
+    assert "missing: " + str(tmp_path / "missing.jpg") in message and "broken: " in message
+    assert "ok0" not in message
+
+
+def test_streamed_document_matches_the_in_memory_render(photos, monkeypatch):
+    monkeypatch.setenv("BOV_PHOTOS_DIR", str(photos / "pictures"))
+    monkeypatch.setenv("BOV_BRAND_DIR", str(photos / "branding"))
+    bov = load_bov()
+    bov.CACHE_DIR = str(photos / "cache")
+    bov.write_html(str(photos / "index.html"))
+    assert (photos / "index.html").read_bytes() == bov.build_html().encode("utf-8")
+
+
+def test_comp_pool_feeds_the_sales_section(photos):
+    pytest.importorskip("numpy")
+    rows = ["address,city,units,sf,year_built,sale_date,price,gross,noi,lat,lon"]
+    for i in range(40):  # a ring of comps, nearest first by index
+        rows.append(f"{100 + i} Pool St,Canoga Park,24,20000,1975,06/2025,5000000,500000,275000,"
+                    f"{34.233910 + 0.002 * (i + 1)},-118.601738")
+    rows.append("1 Incomplete St,Canoga Park,30,,1970,06/2025,5000000,,,34.23392,-118.60174")
+    (photos / "pool.csv").write_text("\n".join(rows) + "\n")
+    result = run_bov(photos, "--comp-pool", str(photos / "pool.csv"), "-o", str(photos / "index.html"))
+    assert result.returncode == 0, result.stderr
+    assert "skipped sale comp 1 Incomplete St" in result.stderr
+    html = (photos / "index.html").read_text(encoding="utf-8")
+    assert "100 Pool St" in html and "102 Pool St" in html and "103 Pool St" not in html
+
+
+def test_comp_store_import_and_query(tmp_path, capsys):
+    pytest.importorskip("numpy")
+    bov = load_bov()
+    store = bov.CompStore(str(tmp_path / "comps.sqlite"))
+    near = (34.2345, -118.6020)
+    sale = {"address": "1 Full St", "units": 24, "sf": 20000, "price": 5e6, "gross": 5e5, "noi": 2.75e5,
+            "sale_date": "06/2025", "coords": near}
+    assert store.import_sale_comps([sale, {**sale, "address": "2 Partial St", "noi": None}], "sales.csv") == 1
+    assert "sales.csv: skipped sale comp 2 Partial St: no noi" in capsys.readouterr().err
+    assert [c["address"] for c in store.sale_comps(k=3, units=(20, None))] == ["1 Full St"]
+
+    rent = {"sf": 500, "rent": 1800, "date": "05/2025", "coords": near}
+    store.import_rent_comps([{**rent, "address": "3 Studio St", "type": "Studio"},
+                             {**rent, "address": "4 Two Bed St", "type": "2/1"}])
+    assert [c["address"] for c in store.rent_comps(0)] == ["3 Studio St"]
+    assert [c["address"] for c in store.rent_comps(2)] == ["4 Two Bed St"]
+
+
+def test_calculator_matches_the_python_figures(tmp_path):
+    pytest.importorskip("numpy")
+    node = shutil.which("node")
+    if node is None:
+        pytest.skip("node is not installed")
+    bov = load_bov()
+
+    def underwrite(**inputs):
+        bov.model.set(**inputs)
+        d = bov.model["calculator_inputs"]
+        script = tmp_path / "calc.js"
+        script.write_text(bov._CALC_JS + f"console.log(JSON.stringify(bovUnderwrite({json.dumps(d)}, "
+                          f"{json.dumps(d['inputs'])})));")
+        result = subprocess.run([node, str(script)], capture_output=True, text=True, timeout=60)
+        assert result.returncode == 0, result.stderr
+        return json.loads(result.stdout)
+
+    for inputs in ({}, {"INTEREST_RATE": 0.06875, "LTV": 0.65, "AMORT_YEARS": 25, "VACANCY_RATE": 0.07},
+                   {"PROPERTY": {**bov.PROPERTY, "suggested_price": 4710000}, "MGMT_FEE_PCT": 0.055}):
+        out = underwrite(**inputs)
+        m = bov.model
+        schedule = m["loan_schedule"]
+        assert out["current_noi"] == bov.fmt_price(m["current_noi"])
+        assert out["market_noi"] == bov.fmt_price(m["market_noi"])
+        assert out["annual_debt_service"] == bov.fmt_price(m["annual_debt_service"])
+        assert out["market_cap"] == bov.fmt_pct(m["market_cap"])
+        assert out["market_coc"] == bov.fmt_pct(m["market_coc"])
+        assert out["market_dcr"] == f"{m['market_dcr']:.2f}x"
+        assert out["balloon"] == bov.fmt_price(schedule["balloon"][0])
+        assert out["paydown"] == bov.fmt_price(schedule["paydown"][0])
+
+
+def test_calculator_fields_hold_a_non_round_price(tmp_path):
+    import re
+
+    pytest.importorskip("numpy")
+    node = shutil.which("node")
+    if node is None:
+        pytest.skip("node is not installed")
+    bov = load_bov()
+    bov.model.set(PROPERTY={**bov.PROPERTY, "suggested_price": 4712345}, INTEREST_RATE=0.06875)
+    for name in bov.section_inputs("financials")[0]:
+        bov.model[name]
+    html = bov.build_financial_analysis()
+    assert "e+" not in html and 'value="4712345"' in html
+    fields = dict(re.findall(r'<input type="number" data-input="(\w+)" data-unit="%?" value="([^"]+)"', html))
+    units = dict(re.findall(r'<input type="number" data-input="(\w+)" data-unit="(%?)"', html))
+    # bovCalculator()'s read() of each field, then one recalculation.
+    read = ", ".join(f"{name}: " + (f"Number('{v}' + 'e-2')" if units[name] else
+                                     f"parseInt('{v}', 10)" if name == "amort" else f"Number('{v}')")
+                     for name, v in fields.items())
+    script = tmp_path / "calc.js"
+    script.write_text(bov._CALC_JS + f"console.log(JSON.stringify(bovUnderwrite("
+                      f"{json.dumps(bov.model['calculator_inputs'])}, {{{read}}})));")
+    result = subprocess.run([node, str(script)], capture_output=True, text=True, timeout=60)
+    assert result.returncode == 0, result.stderr
+    out = json.loads(result.stdout)
+    m = bov.model
+    assert out["price"] == bov.fmt_price(4712345) and out["interest_rate"] == "6.88%"
+    assert out["market_noi"] == bov.fmt_price(m["market_noi"])
+    assert out["annual_debt_service"] == bov.fmt_price(m["annual_debt_service"])
+    assert out["market_coc"] == bov.fmt_pct(m["market_coc"])
+    assert '<span data-calc="price_per_unit">' in html
+    shown = re.findall(r'data-calc="(\w+)">([^<]*)<', html)
+    assert len(shown) > 20 and all(out[key] == text for key, text in shown)
+
+
+def test_monte_carlo_is_reproducible_and_centered_on_the_inputs():
+    np = pytest.importorskip("numpy")
+    bov = load_bov()
+    first, again = bov.run_monte_carlo(2000, 7), bov.run_monte_carlo(2000, 7)
+    assert np.array_equal(first["noi"], again["noi"])
+    assert not np.array_equal(first["noi"], bov.run_monte_carlo(2000, 8)["noi"])
+
+    for vacancy, mgmt_fee in ((0.10, 0.06), (0.0, 0.0), (1.0, 1.0)):
+        bov.model.set(VACANCY_RATE=vacancy, MGMT_FEE_PCT=mgmt_fee)
+        result = bov.run_monte_carlo(2000, 7)
+        assert 0 <= result["vacancy"].min() and result["vacancy"].max() <= 1
+        assert 0 <= result["mgmt_fee"].min() and result["mgmt_fee"].max() <= 1
+        assert result["mgmt_fee"].mean() == pytest.approx(mgmt_fee, abs=0.006)
+        if vacancy == 0.10:
+            assert result["vacancy"].mean() == pytest.approx(vacancy, abs=0.002)
+    bov.model.set(VACANCY_RATE=0.10, MGMT_FEE_PCT=0.06)
+    for node in bov.section_inputs("risk")[0]:
+        bov.model[node]
+    assert "management fee 5.00%&ndash;7.00%" in bov.build_risk_analysis()
+
+
+def test_comp_stats_and_derived_market_rents():
+    pytest.importorskip("numpy")
+    bov = load_bov()
+    comps = [{"sf": sf, "rent": 2 * sf + 500, "date": "06/2025", "coords": bov.SUBJECT_COORDS}
+             for sf in range(1000, 2000, 100)]
+    comps[-1]["rent"] = 9000
+    stats = bov.comp_stats(comps[:-1], subject_sf=1250)
+    assert stats["slope"] == pytest.approx(2) and stats["intercept"] == pytest.approx(500)
+    assert stats["r2"] == pytest.approx(1) and stats["regression"] == pytest.approx(3000)
+    assert stats["weighted"] == pytest.approx(stats["mean"])
+    stats = bov.comp_stats(comps)
+    assert stats["count"] == 10 and stats["median"] == 2 * 1450 + 500 and stats["subject_sf"] == 1450
+    assert stats["trimmed_mean"] == pytest.approx(sum(2 * sf + 500 for sf in range(1100, 1900, 100)) / 8)
+
+    bov.model.set(MARKET_RENT_METHOD="median")
+    rents = bov.model["market_rents"]
+    for bedrooms, rent in rents.items():
+        assert rent % bov.MARKET_RENT_ROUND == 0
+        assert abs(rent - bov.model["rent_comp_stats"][bedrooms]["median"]) <= bov.MARKET_RENT_ROUND / 2
+    units = [u for u in bov.model["rent_roll"] if bov.bedrooms_of(u["type"]) in rents]
+    assert units and all(u["market_rent"] == rents[bov.bedrooms_of(u["type"])] for u in units)
+    with pytest.raises(ValueError, match="MARKET_RENT_METHOD"):
+        bov.model.set(MARKET_RENT_METHOD="mode")
+
+
+def test_overview_describes_the_rent_roll_and_comps():
+    bov = load_bov()
+    bov.model.set(RENT_ROLL=[{"unit": str(i), "type": "2 Bed / 1.5 Bath" if i < 4 else "Studio", "sf": 700 if i < 4 else 400,
+                              "current_rent": 1500, "market_rent": 1800} for i in range(6)],
+                  RENT_COMPS_3BR=[{**c, "rent": c["rent"] + 100} for c in bov.RENT_COMPS_3BR[:3]], RENT_COMPS_4BR=[])
+    for name in bov.narrative_figures.reads:
+        bov.model[name]
+    text = " ".join(bov.narrative("overview"))
+    assert "The unit mix includes 2 studio units at 400 SF and 4 two-bedroom/1.5-bath units at 700 SF, " \
+           "totaling 8 bedrooms and 8 bathrooms." in text
+    assert "comparable unrenovated three-bedroom units achieve $2,950-$3,050/month." in text
+
+
+def test_sensitivity_cube_agrees_with_the_pricing_matrix():
+    np = pytest.importorskip("numpy")
+    bov = load_bov()
+    cube = bov.model["sensitivity"]
+    assert cube["coc"].shape == (11, 6, 5, 3, 3)
+    prices, rates, grid = bov.sensitivity_slice(cube, "coc", "price", "rate", vacancy=bov.VACANCY_RATE)
+    column = list(rates).index(bov.INTEREST_RATE)
+    for row, p in zip(bov.model["pricing_matrix"], prices):
+        assert row["price"] == p
+        assert grid[list(prices).index(p), column] == pytest.approx(row["coc"])
+    _, _, dcr = bov.sensitivity_slice(cube, "dcr", "rate", "ltv")
+    assert dcr.shape == (6, 5)
+    assert np.all(np.diff(dcr, axis=0) < 0) and np.all(np.diff(dcr, axis=1) < 0)
+
+
+def test_irr_and_dcf_against_known_values():
+    np = pytest.importorskip("numpy")
+    bov = load_bov()
+    rates = bov.irr([[-100, 110, 0], [-1000, 100, 1100]])
+    assert rates[0] == pytest.approx(0.10) and rates[1] == pytest.approx(0.10)
+    assert bov.irr([-100, 39, 59, 55, 20]) == pytest.approx(0.2809484, abs=1e-6)
+    assert np.isnan(bov.irr([-100, -10, -10]))
+
+    dcf = bov.project_dcf([4_850_000], [0.055])
+    assert dcf["unlevered"].shape == (1, 1, bov.LOAN_TERM_YEARS + 1)
+    assert dcf["noi"][0] == pytest.approx(bov.current_noi)
+    flows = dcf["levered"][0, 0]
+    npv = sum(c / (1 + dcf["levered_irr"][0, 0]) ** t for t, c in enumerate(flows))
+    assert npv == pytest.approx(0, abs=1e-4)
+    assert dcf["equity_multiple"][0, 0] == pytest.approx(flows[1:].sum() / -flows[0])
+
+
+def test_amortization_balloon_and_paydown():
+    np = pytest.importorskip("numpy")
+    bov = load_bov()
+    schedule = bov.amortization([2_910_000, 1_000_000, 600_000], [0.0575, 0.065, 0.0], 30, 5)
+    assert schedule["balance"].shape == (3, 60)
+    assert np.allclose(schedule["paydown"] + schedule["balloon"], [2_910_000, 1_000_000, 600_000])
+    assert schedule["balloon"][2] == pytest.approx(600_000 * (1 - 60 / 360))
+
+    # month by month with the payment rounded nowhere
+    balance, payment = 1_000_000.0, bov.calc_monthly_payment(1_000_000, 0.065, 30)
+    for _ in range(60):
+        balance -= payment - balance * 0.065 / 12
+    assert schedule["payment"][1] == pytest.approx(payment)
+    assert schedule["balloon"][1] == pytest.approx(balance)
+
+    years = bov.yearly_summary(schedule, row=1)
+    assert len(years) == 5 and years[-1][4] == pytest.approx(balance)
+    assert sum(y[3] for y in years) == pytest.approx(schedule["paydown"][1])
+
+
+@pytest.mark.parametrize("target", ["cap=0", "dcr=-1.2", "coc=3", "irr=nan"])
+def test_solve_rejects_targets_out_of_range(tmp_path, target):
+    pytest.importorskip("numpy")
+    result = run_bov(tmp_path, "--solve", target)
+    assert result.returncode == 2
+    assert f"argument --solve: bad '{target}'" in result.stderr
+    assert "Traceback" not in result.stderr and "$" not in result.stdout
+
+
+def test_solved_prices_reproduce_their_targets():
+    pytest.importorskip("numpy")
+    bov = load_bov()
+    m = bov.model
+    for metric, target in (("cap", 0.05), ("cap_current", 0.045), ("grm", 13.5), ("dcr", 1.25), ("coc", 0.04),
+                           ("irr", 0.12), ("unlevered_irr", 0.08)):
+        solved = float(bov.solve_price(metric, target))
+        m.set(PROPERTY={**bov.PROPERTY, "suggested_price": solved})
+        if metric in ("irr", "unlevered_irr"):
+            dcf = bov.project_dcf([solved], [bov.EXIT_CAP])
+            achieved = dcf["levered_irr" if metric == "irr" else "unlevered_irr"][0, 0]
+        else:
+            achieved = m[{"cap": "market_cap", "cap_current": "current_cap", "grm": "market_grm",
+                          "dcr": "market_dcr", "coc": "market_coc"}[metric]]
+        assert achieved == pytest.approx(target), metric
+
+    best, binding, limits = bov.max_price(cap=0.05, dcr=1.25)
+    assert binding == "dcr" and best == min(limits.values())
+
+
+def test_graph_set_recomputes_only_what_changed():
+    bov = load_bov()
+    calls = []
+    namespace = {"a": 1, "b": 10}
+    g = bov.Graph(namespace)
+    g.define("double", lambda a: calls.append("double") or a * 2)
+    g.define("total", lambda double, b: calls.append("total") or double + b)
+    g.define("sign", lambda total: calls.append("sign") or total > 0)
+    g.define("b_only", lambda b: calls.append("b_only") or -b)
+
+    assert g["sign"] is True and g["total"] == 12
+    assert calls == ["double", "total", "sign"] and namespace["total"] == 12
+    calls.clear()
+    assert g.set(a=1) == {}
+    assert calls == []
+    assert g.set(a=2) == {"a": 2, "double": 4, "total": 14}
+    assert sorted(calls) == ["double", "sign", "total"] and "b_only" not in g.values
+    assert namespace["total"] == 14
+    with pytest.raises(KeyError):
+        g.set(total=0)
+
+
+def test_fragment_keys_hash_files_only_for_path_inputs(tmp_path, monkeypatch):
+    bov = load_bov()
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "12").mkdir()
+    (tmp_path / "12" / "2025").write_text("one")
+    photo = tmp_path / "hero.jpg"
+    photo.write_bytes(b"one")
+
+    def digest(value, files=False):
+        h = bov.hashlib.sha256()
+        bov._fingerprint(h, value, files)
+        return h.hexdigest()
+
+    before = digest({"as_of": "12/2025"}), digest(str(photo), files=True)
+    (tmp_path / "12" / "2025").write_text("two")
+    photo.write_bytes(b"two")
+    assert digest({"as_of": "12/2025"}) == before[0]
+    assert digest(str(photo), files=True) != before[1]
+
+    assert "HERO_PHOTO" in bov.section_inputs("cover")[1]
+    key = bov.fragment_key("cover")
+    assert bov.fragment_key("financials") != key and bov.fragment_key("cover") == key
+    bov.HERO_PHOTO = str(photo)
+    assert bov.fragment_key("cover") != key
+
+
+def test_fragment_keys_follow_constants_read_only_as_defaults():
+    bov = load_bov()
+    assert {"CLUSTER_CELL_PX", "CLUSTER_ZOOMS"} <= set(bov.section_inputs("sales")[1])
+    assert "COMP_RADIUS_MILES" in bov._default_names()["CompStore.sale_comps"]
+    key = bov.fragment_key("sales")
+    bov.CLUSTER_CELL_PX += 20
+    assert bov.fragment_key("sales") != key
+
+
+def test_importing_leaves_ast_unloaded_and_reload_data_applies_data_edits():
+    probe = ("import importlib.util, sys; spec = importlib.util.spec_from_file_location('build_bov', sys.argv[1]); "
+             "spec.loader.exec_module(importlib.util.module_from_spec(spec)); print('ast' in sys.modules)")
+    result = subprocess.run([sys.executable, "-c", probe, SCRIPT], capture_output=True, text=True, timeout=120)
+    assert result.stdout.strip() == "False", result.stderr
+
+    bov = load_bov()
+    with open(SCRIPT, encoding="utf-8") as f:
+        source = f.read()
+    assert "\nVACANCY_RATE = 0.03\n" in source
+    edited = source.replace("\nVACANCY_RATE = 0.03\n", "\nVACANCY_RATE = 0.05\n")
+    assert bov.reload_data(SCRIPT, source, edited) == {"VACANCY_RATE": 0.05}
+    assert bov.reload_data(SCRIPT, source, source.replace("def fmt_num(", "def fmt_number(")) is None
+
+
+def test_watch_rebuilds_when_a_photo_appears_in_a_watched_folder(tmp_path, monkeypatch):
+    import threading
+    import time
+
+    bov = load_bov()
+    monkeypatch.setattr(bov, "WATCH_INTERVAL", 0.02)
+    monkeypatch.setattr(bov, "WATCH_DEBOUNCE", 0.05)
+    folder = tmp_path / "pictures"
+    (folder / "grid").mkdir(parents=True)
+    (folder / "notes.txt").write_text("not a photo")
+    touched, builds = [], []
+
+    def write_html(path, **options):
+        builds.append(options)
+        raise KeyboardInterrupt  # ends watch() after its first rebuild
+
+    monkeypatch.setattr(bov, "write_html", write_html)
+    (tmp_path / "index.html").write_text("<html><body></body></html>")
+    thread = threading.Thread(target=bov.watch, args=(str(tmp_path / "index.html"), "inline",
+                                                      {str(folder): lambda: touched.append(True)}),
+                              kwargs={"port": 0, "compress": True}, daemon=True)
+    thread.start()
+    time.sleep(0.2)
+    (folder / "notes.txt").write_text("still not a photo")
+    time.sleep(0.2)
+    assert not touched
+    (folder / "grid" / "image (7).jpg").write_bytes(b"jpeg")
+    thread.join(10)
+    assert not thread.is_alive() and touched == [True]
+    assert builds == [{"assets": "inline", "minify": False, "compress": True}]
+
+
+def test_live_reload_server_injects_its_script_and_streams_builds(tmp_path):
+    import http.client
+    import urllib.request
+
+    bov = load_bov()
+    (tmp_path / "index.html").write_text("<html><body><p>BOV</p></body></html>")
+    server = bov.LiveReloadServer(str(tmp_path / "index.html"), port=0)
+    try:
+        with urllib.request.urlopen(server.url, timeout=10) as response:
+            page = response.read().decode("utf-8")
+        assert page.startswith("<html><body><p>BOV</p><script>") and bov.LIVE_RELOAD_PATH in page
+        assert (tmp_path / "index.html").read_text() == "<html><body><p>BOV</p></body></html>"
+
+        host, port = server.httpd.server_address[:2]
+        conn = http.client.HTTPConnection(host, port, timeout=10)
+        conn.request("GET", bov.LIVE_RELOAD_PATH)
+        stream = conn.getresponse()
+        assert stream.getheader("Content-Type") == "text/event-stream"
+        first = stream.readline()
+        assert first == f"data: {server.build_id}\n".encode() and stream.readline() == b"\n"
+        server.reload()
+        second = stream.readline()
+        assert second.startswith(b"data: ") and second != first
+        conn.close()
+    finally:
+        server.close()
+
+
+def test_minify_keeps_meaningful_whitespace_and_precompress_round_trips(tmp_path):
+    import gzip
+
+    bov = load_bov()
+    css = "/* cards */\n.card > p ,\n.card a:hover {\n  border: 1px solid #ccc;\n  width: calc(100% - 2rem);\n}\n"
+    assert bov.minify_css(css) == ".card>p,.card a:hover{border:1px solid #ccc;width:calc(100% - 2rem)}"
+    js = "function f(a) {\n    // double it\n    return a * 2\n}\n\nf(1)\n"
+    assert bov.minify_js(js) == "function f(a) {\nreturn a * 2\n}\nf(1)"
+    assert bov.minify_html("<div>\n    <p>Two  words</p>  \n\n  </div>") == "<div>\n<p>Two  words</p>\n</div>"
+
+    page = tmp_path / "index.html"
+    page.write_text("<p>rent roll</p>\n" * 2000)
+    sizes = bov.precompress(str(page))
+    assert gzip.decompress((tmp_path / "index.html.gz").read_bytes()) == page.read_bytes()
+    assert sizes[".gz"] == os.path.getsize(tmp_path / "index.html.gz") < page.stat().st_size
+    if bov.brotli is not None:
+        assert bov.brotli.decompress((tmp_path / "index.html.br").read_bytes()) == page.read_bytes()
+    else:
+        assert ".br" not in sizes and not (tmp_path / "index.html.br").exists()
+
+
+def test_minified_build_reports_the_unminified_size(photos, monkeypatch):
+    monkeypatch.setenv("BOV_PHOTOS_DIR", str(photos / "pictures"))
+    monkeypatch.setenv("BOV_BRAND_DIR", str(photos / "branding"))
+    bov = load_bov()
+    bov.CACHE_DIR = str(photos / "cache")
+    plain = bov.write_html(str(photos / "plain.html"))
+    small = bov.write_html(str(photos / "small.html"), minify=True)
+    assert small["raw"] == plain["raw"] == (photos / "plain.html").stat().st_size
+    assert small["minified"] == (photos / "small.html").stat().st_size < plain["raw"]
+
+
+def test_clusters_cover_every_point_once_and_nest_across_zooms():
+    import random
+
+    bov = load_bov()
+    rng = random.Random(7)
+    points = [bov.map_point((34.20 + rng.uniform(0, 0.004), -118.60 + rng.uniform(0, 0.004)), i, "t", "d")
+              for i in range(40)]
+    points += [bov.map_point((33.90 + rng.uniform(0, 0.004), -118.20 + rng.uniform(0, 0.004)), i, "t", "d")
+               for i in range(40, 70)]
+    points.append(bov.map_point((34.60, -119.10), 70, "t", "d"))
+    calls = []
+    levels = bov.cluster_zooms(points, lambda members: calls.append(members) or f"{len(members)} here")
+
+    assert list(levels) == list(bov.CLUSTER_ZOOMS)
+    previous = None
+    for zoom, entries in levels.items():
+        covered = sum(1 if isinstance(e, int) else e[2] for e in entries)
+        assert covered == len(points)
+        assert all(e[3] == f"{e[2]} here" for e in entries if not isinstance(e, int))
+        assert previous is None or len(entries) >= previous
+        previous = len(entries)
+    far = levels[min(levels)]
+    assert sorted(e[2] for e in far if not isinstance(e, int)) == [30, 40] and 70 in far
+    cluster = next(e for e in far if not isinstance(e, int) and e[2] == 30)
+    assert cluster[:2] == [round(sum(p[0] for p in points[40:70]) / 30, 6), round(sum(p[1] for p in points[40:70]) / 30, 6)]
+    assert sorted(map(len, calls)) == sorted(e[2] for entries in levels.values() for e in entries if not isinstance(e, int))
+
+    assert "zooms" not in bov.map_layer(points[:bov.CLUSTER_MIN_POINTS - 1], len, cls="sale")
+    assert bov.map_layer(points, len, cls="sale")["zooms"].keys() == levels.keys()
+
+
+def test_maps_are_drawn_from_one_data_object_each():
+    bov = load_bov()
+    comps = [bov.map_point((34.2 + i / 100, -118.6), i, f"Comp {i}", "<b>12</b> units</b>") for i in range(3)]
+    token = bov.map_script("saleMap", "sale-map", "20 units", [bov.map_layer(comps, len, cls="sale")], 13, 0.15)
+    script = bov._assets[int(bov._ASSET_TOKEN_RE.fullmatch(token).group(1))].text
+    assert script.startswith("bovMap.apply(null, [") and "</" not in script
+    map_id, data = json.loads(script[len("bovMap.apply(null, "):-len(");")])
+    assert map_id == "saleMap" and (data["zoom"], data["pad"]) == (13, 0.15)
+    assert data["subject"][:2] == list(bov.SUBJECT_COORDS) and data["subject"][4] == "20 units"
+    assert data["layers"] == [{"cls": "sale", "points": [list(p) for p in comps]}]
+
+    for name in bov.section_inputs("sales")[0]:
+        if name != "images":
+            bov.model[name]
+    html = bov.build_sale_comps()
+    scripts = [bov._assets[int(i)].text for i in bov._ASSET_TOKEN_RE.findall(html)]
+    calls = [s for s in scripts if s.startswith("bovMap.apply(")]
+    assert len(calls) == 1 and not any("L.marker" in s for s in scripts if "function bovMap" not in s)
+    points = json.loads(calls[0][len("bovMap.apply(null, "):-len(");")])[1]["layers"][0]["points"]
+    assert [p[2] for p in points] == [str(c["num"]) for c in bov.SALE_COMPS]
+
+
+def test_static_map_fits_every_pin_and_draws_clusters():
+    import re
+
+    bov = load_bov()
+    lat, lng = bov.SUBJECT_COORDS
+    comps = [bov.map_point((lat + 0.01 * i, lng - 0.015 * i), i, f"Comp {i}", "<b>1.2</b> mi") for i in (1, 2, 3)]
+    svg = bov.static_map([bov.map_layer(comps, len, cls="sale")], 0.1)
+    width, height = bov.STATIC_MAP_SIZE
+    assert svg.startswith('<svg class="map-static" viewBox="0 0 %d %d"' % (width, height))
+    assert svg.count('<g class="map-pin sale">') == 3 and svg.count("map-pin-subject") == 1
+    assert "<title>Comp 2:  1.2  mi</title>" in svg
+    for x, y in re.findall(r'<g class="map-pin[^"]*">(?:<title>[^<]*</title>)?<circle cx="([-\d.]+)" cy="([-\d.]+)"', svg):
+        assert bov.STATIC_MAP_MARGIN - 1 <= float(x) <= width - bov.STATIC_MAP_MARGIN + 1
+        assert bov.STATIC_MAP_MARGIN - 1 <= float(y) <= height - bov.STATIC_MAP_MARGIN + 1
+    assert 'class="map-ring"' in svg and re.search(r'<g class="map-scale">.*?>[\d.]+ mi</text></g>', svg)
+
+    crowd = [bov.map_point((lat + 0.0001 * (i % 10), lng + 0.0001 * (i // 10)), i, "t", "d") for i in range(60)]
+    far = bov.map_point((lat + 1.0, lng + 1.0), 60, "t", "d")
+    svg = bov.static_map([bov.map_layer(crowd + [far], lambda m: "cluster", cls="sale")], 0.1)
+    assert '<g class="map-pin sale map-cluster"><title>60 comps: cluster</title>' in svg
+    assert svg.count('<g class="map-pin sale">') == 1
+
+
+def test_batch_builds_a_property_with_its_own_keys(photos):
+    pytest.importorskip("numpy")
+    data = photos / "portfolio"
+    data.mkdir()
+    comp = {"city": "Reseda", "units": 12, "sf": 9000, "sale_date": "03/2025", "gross": 300000, "noi": 170000,
+            "dom": 30, "notes": ""}
+    (data / "sherman.json").write_text(json.dumps({
+        "PROPERTY": {"address": "100 Sherman Way", "city_state_zip": "Reseda, CA 91335",
+                     "full_address": "100 Sherman Way, Reseda, CA 91335", "year_built": 1988, "units": 12,
+                     "building_sf": 9600, "lot_acres": 0.4, "suggested_price": 2900000, "owner": "Sherman LLC"},
+        "SUBJECT_COORDS": [34.2011, -118.5353],
+        "RENT_ROLL": [{"unit": f"#{i}", "type": "2 Bed / 1 Bath", "sf": 800, "current_rent": 2100,
+                       "market_rent": 2400} for i in range(1, 13)],
+        "EXPENSES": {"Property Taxes": 34000, "Insurance": 9000, "Landscaping": 2400},
+        "SALE_COMPS": [{**comp, "num": 1, "address": "7 Vanowen St", "price": 2800000, "coords": [34.19, -118.53]},
+                       {**comp, "num": 2, "address": "9 Lindley Ave", "price": 3100000, "coords": [34.21, -118.52]}],
+        "RENT_COMPS_3BR": [{"num": 1, "address": "5 Wilbur Ave", "type": "3/2", "sf": 1100, "rent": 2900,
+                            "date": "04/2025", "coords": [34.2, -118.54]}],
+        "RENT_COMPS_4BR": [],
+        "VACANCY_RATE": 0.10,
+        "HERO_PHOTO": "../pictures/image (6).jpg",
+        "GRID_PHOTOS": ["../pictures/image (4).jpg", "../pictures/image (3).jpg"],
+    }))
+    result = run_bov(photos, "--batch", str(data), "--trials", "500", "--workers", "1")
+    assert result.returncode == 0, result.stdout + result.stderr
+    (data / "partial.json").write_text(json.dumps({"PROPERTY": {"address": "1 Partial St"}, "VACANCY_RATE": 0.05}))
+    result = run_bov(photos, "--batch", str(data), "--trials", "500", "--workers", "1", "--sections", "cover")
+    assert result.returncode == 1
+    assert "partial.json: missing SUBJECT_COORDS, RENT_ROLL, EXPENSES, SALE_COMPS" in result.stdout
+    assert not (data / "bov" / "partial").exists()
+    html = (data / "bov" / "sherman" / "index.html").read_text(encoding="utf-8")
+    assert "100 Sherman Way" in html and "Landscaping" in html
+    assert "The two comparable sales" in html and "9 Lindley Ave sale" in html
+    for text in ("Owensmouth", "Roscoe", "De Soto", "Canoga Park", "34-unit", "4-Bedroom Comparables", "Symetra"):
+        assert text not in html, text
+
+
+def test_small_comp_pool_fills_the_sales_narrative(photos):
+    pytest.importorskip("numpy")
+    rows = ["address,city,units,sf,year_built,sale_date,price,gross,noi,lat,lon",
+            "1 Near St,,24,20000,1975,04/2025,4800000,500000,275000,34.2345,-118.6020",
+            "2 Near St,,30,26000,1980,06/2025,6600000,640000,360000,34.2360,-118.6000",
+            "3 Small St,,8,6000,1960,06/2025,1500000,150000,80000,34.2350,-118.6010"]
+    (photos / "pool.csv").write_text("\n".join(rows) + "\n")
+    result = run_bov(photos, "--comp-pool", str(photos / "pool.csv"), "-o", str(photos / "index.html"))
+    assert result.returncode == 0, result.stderr
+    html = (photos / "index.html").read_text(encoding="utf-8")
+    assert "3 Small St" not in html and "20951 Roscoe" not in html
+    assert "The two comparable sales" in html
+    assert "The 2 Near St sale at $6,600,000 ($220,000/unit) for a 30-unit property" in html
+    assert "the 1 Near St sale sets a baseline of approximately $200,000/unit" in html
+    assert "Comparable sales, 24+ units, closed 04/2025&ndash;06/2025." in html
+
+
+def test_comp_store_queries_walk_an_index(tmp_path):
+    pytest.importorskip("numpy")
+    bov = load_bov()
+    store = bov.CompStore(str(tmp_path / "comps.sqlite"))
+    sale = {"first": 1, "last": 2, "units_min": 20, "units_max": None, "built_min": None, "built_max": None,
+            "since": 202501}
+    rent = {"first": 1, "last": 2, "bedrooms": 3, "since": None}
+    indexes = {row[0] for row in store.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"sale_comps_cell_month", "sale_comps_cell_units", "rent_comps_bedrooms_cell_month"} <= indexes
+    for sql, params, index in ((bov._SALE_COMP_SQL, sale, "sale_comps_cell_"),
+                               (bov._RENT_COMP_SQL, rent, "rent_comps_bedrooms_cell_month")):
+        plan = " ".join(row[-1] for row in store.conn.execute("EXPLAIN QUERY PLAN " + sql, params))
+        assert "USING INDEX " + index in plan, plan
+
+
+def test_comp_store_with_fewer_comps_than_the_query_asks_for(photos):
+    pytest.importorskip("numpy")
+    db = str(photos / "comps.sqlite")
+    sales = [{"address": f"{n} Store St", "city": "Winnetka", "units": 24, "sf": 20000, "price": 5e6 + n * 1e5,
+              "gross": 5e5, "noi": 2.75e5, "sale_date": "06/2025", "coords": [34.2345 + n / 1000, -118.6020]}
+             for n in (1, 2)]
+    rents = [{"address": f"{n} Lease Ave", "type": f"{beds}/2", "sf": 1200, "rent": 3000 + beds * 100,
+              "date": "05/2025", "coords": [34.2345, -118.6020 + n / 1000]} for n, beds in ((1, 3), (2, 4), (3, 4))]
+    (photos / "sales.json").write_text(json.dumps(sales))
+    (photos / "rents.json").write_text(json.dumps(rents))
+    result = run_bov(photos, "--comp-db", db, "--import-sale-comps", str(photos / "sales.json"),
+                     "--import-rent-comps", str(photos / "rents.json"))
+    assert result.returncode == 0, result.stderr
+    result = run_bov(photos, "--comp-db", db, "-o", str(photos / "index.html"))
+    assert result.returncode == 0, result.stderr
+    html = (photos / "index.html").read_text(encoding="utf-8")
+    assert "The two comparable sales" in html and "2 Store St sale at $5,200,000" in html
+    assert "20951 Roscoe" not in html